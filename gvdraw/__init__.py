@@ -1,4 +1,22 @@
+import os
 import logging
 FMT="%(asctime)s.%(msecs)01d %(name)s@%(lineno)d [%(levelname)s]: %(message)s"
 DATEFMT = "%m-%d %H:%M:%S"
 logging.basicConfig(level=logging.INFO, format=FMT, datefmt=DATEFMT)
+
+
+def _version() -> str:
+    """版本号只记在仓库根目录的 VERSION 中: 已安装时取包的元数据, 源码目录中直接读文件"""
+    try:
+        from importlib.metadata import version
+
+        return version("gvdraw")
+    except ImportError:
+        # 没有 importlib.metadata, 或者未安装 (PackageNotFoundError 是 ImportError 的子类)
+        pass
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "VERSION")
+    with open(path, encoding="utf8") as f:
+        return f.read().strip()
+
+
+__version__ = _version()
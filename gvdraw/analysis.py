@@ -0,0 +1,322 @@
+"""状态机的静态检查.
+
+状态按下标编号, 边存成 CSR 形式的两个整数数组 (offsets, targets),
+所有检查都是 BFS 或 Tarjan, 与状态数和转移数成线性.
+
+层级的处理与 transitions 一致:
+
+- 进入复合状态即进入其 initial 子状态 (逐层向下), 没有 initial 时停在
+  复合状态本身. 停下的状态称为 "落点".
+- 处于子状态时, 祖先上定义的转移同样可用. 图中为每个状态加一条指向
+  父状态的边表示这一点.
+
+检查项:
+
+- unreachable: 从初始状态出发到不了的状态
+- dead end: 可以停留, 没有 final 标记, 自身和祖先都没有离开的转移
+- cycles: 非平凡的强连通分量 (多于一个状态, 或有自环)
+- stuck: 可达且可以停留, 但到不了任何 final 状态; 没有 final 状态时
+  以 dead end 作为终点
+- guard-only cycles: 只由带 conditions / unless 的转移构成的环
+"""
+
+import json
+import logging
+from array import array
+from dataclasses import asdict, dataclass, field
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from gvdraw.machine import MachineSpec
+
+logger = logging.getLogger(__name__)
+
+NO_STATE = -1
+
+
+@dataclass
+class Adjacency:
+    """CSR 邻接表: 结点 i 的后继为 targets[offsets[i]:offsets[i + 1]]"""
+
+    offsets: array
+    targets: array
+
+    @classmethod
+    def build(cls, count: int, edges: Sequence[Tuple[int, int]]) -> "Adjacency":
+        """计数排序, 线性时间"""
+        offsets = array("i", bytes(4 * (count + 1)))
+        for tail, _ in edges:
+            offsets[tail + 1] += 1
+        for idx in range(count):
+            offsets[idx + 1] += offsets[idx]
+        fill = array("i", offsets)
+        targets = array("i", bytes(4 * len(edges)))
+        for tail, head in edges:
+            targets[fill[tail]] = head
+            fill[tail] += 1
+        return cls(offsets, targets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def reversed(self) -> "Adjacency":
+        offsets, targets = self.offsets, self.targets
+        return Adjacency.build(
+            len(self),
+            [
+                (targets[pos], tail)
+                for tail in range(len(self))
+                for pos in range(offsets[tail], offsets[tail + 1])
+            ],
+        )
+
+
+def reachable(adj: Adjacency, starts: Iterable[int]) -> bytearray:
+    """BFS, 返回每个结点是否可达"""
+    offsets, targets = adj.offsets, adj.targets
+    seen = bytearray(len(adj))
+    queue = list()
+    for start in starts:
+        if not seen[start]:
+            seen[start] = 1
+            queue.append(start)
+    for node in queue:
+        for pos in range(offsets[node], offsets[node + 1]):
+            head = targets[pos]
+            if not seen[head]:
+                seen[head] = 1
+                queue.append(head)
+    return seen
+
+
+def strongly_connected(adj: Adjacency) -> List[List[int]]:
+    """非递归的 Tarjan, 只返回非平凡的强连通分量"""
+    offsets, targets = adj.offsets, adj.targets
+    count = len(adj)
+    index = array("i", [NO_STATE]) * count
+    low = array("i", bytes(4 * count))
+    on_stack = bytearray(count)
+    stack: List[int] = list()
+    components: List[List[int]] = list()
+    counter = 0
+    for root in range(count):
+        if index[root] != NO_STATE:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        # (结点, 下一条待处理的边)
+        work = [(root, offsets[root])]
+        while work:
+            node, pos = work[-1]
+            if pos < offsets[node + 1]:
+                work[-1] = (node, pos + 1)
+                head = targets[pos]
+                if index[head] == NO_STATE:
+                    index[head] = low[head] = counter
+                    counter += 1
+                    stack.append(head)
+                    on_stack[head] = 1
+                    work.append((head, offsets[head]))
+                elif on_stack[head] and index[head] < low[node]:
+                    low[node] = index[head]
+                continue
+            work.pop()
+            if work and low[node] < low[work[-1][0]]:
+                low[work[-1][0]] = low[node]
+            if low[node] != index[node]:
+                continue
+            component = list()
+            while True:
+                member = stack.pop()
+                on_stack[member] = 0
+                component.append(member)
+                if member == node:
+                    break
+            loop = node in targets[offsets[node]:offsets[node + 1]]
+            if len(component) > 1 or loop:
+                components.append(component[::-1])
+    return components
+
+
+@dataclass
+class MachineGraph:
+    """MachineSpec 的整数下标形式"""
+
+    names: List[str]
+    parent: array
+    # 父状态总在子状态之前
+    order: List[int]
+    # 进入该状态后实际停下的状态
+    landing: array
+    final: bytearray
+    # 可以停留的状态: 叶子, 以及转移或初始状态直接落在其上的复合状态
+    resting: bytearray
+    # 自身定义了离开的转移
+    exits: bytearray
+    starts: List[int]
+    # 转移 (终点为落点) 加上子状态到父状态的边
+    forward: Adjacency
+    # 只含带条件的转移
+    guarded: Adjacency
+
+    @classmethod
+    def from_spec(cls, spec: MachineSpec) -> "MachineGraph":
+        names = [state.name for state in spec.states]
+        index = {name: idx for idx, name in enumerate(names)}
+        count = len(names)
+        parent = array("i", [NO_STATE]) * count
+        final = bytearray(count)
+        for idx, state in enumerate(spec.states):
+            if state.parent is not None:
+                parent[idx] = index[state.parent]
+            final[idx] = state.final
+        # 父状态在前的顺序
+        order = [idx for idx in range(count) if parent[idx] == NO_STATE]
+        for idx in order:
+            order.extend(index[child] for child in spec.states[idx].children)
+
+        # 落点: 沿 initial 向下, 子状态先算好, 父状态直接取用
+        landing = array("i", range(count))
+        for idx in reversed(order):
+            state = spec.states[idx]
+            if state.initial and state.children:
+                child = index.get(spec.separator.join((state.name, state.initial)))
+                if child is not None:
+                    landing[idx] = landing[child]
+
+        resting = bytearray(not state.children for state in spec.states)
+        exits = bytearray(count)
+        edges = [(idx, parent[idx]) for idx in range(count) if parent[idx] != NO_STATE]
+        guarded = list()
+        for tran in spec.transitions:
+            source, dest = index[tran.source], landing[index[tran.dest]]
+            resting[dest] = 1
+            edges.append((source, dest))
+            if tran.conditions or tran.unless:
+                guarded.append((source, dest))
+            if not tran.internal and tran.source != tran.dest:
+                exits[source] = 1
+
+        if spec.initial is not None and spec.initial in index:
+            starts = [landing[index[spec.initial]]]
+        else:
+            # 没有记录初始状态 (json0 / drawio), 从自身和后代都没有入边的顶层状态出发
+            entered = bytearray(count)
+            for tran in spec.transitions:
+                entered[index[tran.dest]] = 1
+            for idx in reversed(order):
+                if entered[idx] and parent[idx] != NO_STATE:
+                    entered[parent[idx]] = 1
+            starts = [
+                landing[idx]
+                for idx in range(count)
+                if parent[idx] == NO_STATE and not entered[idx]
+            ]
+            if not starts and count:
+                starts = [landing[0]]
+        for idx in starts:
+            resting[idx] = 1
+        return cls(
+            names,
+            parent,
+            order,
+            landing,
+            final,
+            resting,
+            exits,
+            starts,
+            Adjacency.build(count, edges),
+            Adjacency.build(count, guarded),
+        )
+
+
+@dataclass
+class Report:
+    states: int
+    transitions: int
+    starts: List[str] = field(default_factory=list)
+    unreachable: List[str] = field(default_factory=list)
+    dead_ends: List[str] = field(default_factory=list)
+    cycles: List[List[str]] = field(default_factory=list)
+    # stuck 的终点: final 状态, 没有时为 dead end
+    targets: str = "final"
+    stuck: List[str] = field(default_factory=list)
+    guard_cycles: List[List[str]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not (
+            self.unreachable or self.dead_ends or self.stuck or self.guard_cycles
+        )
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False, indent=2)
+
+    def format(self, limit: Optional[int] = 20) -> str:
+        """文本报告, 每项最多列出 ``limit`` 个"""
+
+        def listing(title: str, items: list) -> List[str]:
+            lines = [f"{title}: {len(items)}"]
+            for item in items[:limit]:
+                text = " -> ".join(item) if isinstance(item, list) else item
+                lines.append(f"  {text}")
+            if limit is not None and len(items) > limit:
+                lines.append(f"  ... {len(items) - limit} more")
+            return lines
+
+        lines = [
+            f"{self.states} states, {self.transitions} transitions, "
+            f"start: {', '.join(self.starts) or '-'}"
+        ]
+        lines += listing("unreachable", self.unreachable)
+        lines += listing("dead ends", self.dead_ends)
+        lines += listing("cycles", self.cycles)
+        lines += listing(f"cannot reach a {self.targets} state", self.stuck)
+        lines += listing("guard-only cycles", self.guard_cycles)
+        return "\n".join(lines)
+
+
+def analyze(spec: MachineSpec) -> Report:
+    graph = MachineGraph.from_spec(spec)
+    names, parent, landing = graph.names, graph.parent, graph.landing
+    count = len(names)
+    report = Report(count, len(spec.transitions))
+    report.starts = [names[idx] for idx in graph.starts]
+
+    seen = reachable(graph.forward, graph.starts)
+    report.unreachable = [names[idx] for idx in range(count) if not seen[idx]]
+
+    # 按父状态在前的顺序扫一遍即可继承祖先的转移
+    leaving = bytearray(graph.exits)
+    for idx in graph.order:
+        if parent[idx] != NO_STATE and leaving[parent[idx]]:
+            leaving[idx] = 1
+    resting = graph.resting
+    dead = [
+        idx
+        for idx in range(count)
+        if resting[idx] and not leaving[idx] and not graph.final[idx]
+    ]
+    report.dead_ends = [names[idx] for idx in dead]
+
+    report.cycles = [
+        [names[idx] for idx in component]
+        for component in strongly_connected(graph.forward)
+    ]
+
+    targets = [idx for idx in range(count) if graph.final[idx]]
+    if not targets:
+        report.targets, targets = "dead-end", dead
+    done = reachable(graph.forward.reversed(), targets)
+    report.stuck = [
+        names[idx]
+        for idx in range(count)
+        if seen[idx] and resting[idx] and not done[idx]
+    ]
+
+    report.guard_cycles = [
+        [names[idx] for idx in component]
+        for component in strongly_connected(graph.guarded)
+    ]
+    return report
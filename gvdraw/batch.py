@@ -0,0 +1,145 @@
+"""一次 graphviz 调用布局多个图.
+
+dot 可以从同一个输入里读入多个图, 并依次输出每个图的布局. 对大量
+小状态机, 耗时主要在进程启动上, 把它们拼起来分块交给 graphviz, 再
+把输出的多个 json0 文档拆回各自的结果.
+
+某一块失败 (退出码非零, 或输出的文档个数不对) 时把这一块对半拆开
+重试, 直到定位到出错的那个图, 其余的图不受影响.
+"""
+
+import os
+import json
+import time
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import graphviz
+
+from gvdraw.engine import ENGINES, layout_machine, machine_dot
+from gvdraw.machine import MachineSpec, extract_machine
+from gvdraw.profiles import LayoutRun, Thresholds, resolve_profile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 64
+
+
+@dataclass
+class BatchResult:
+    """一个图的布局结果, 失败时 xdot 为空, error 为对应的异常"""
+
+    xdot: Optional[dict] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def split_documents(text: str) -> List[dict]:
+    """依次解析首尾相接的多个 json 文档"""
+    decoder = json.JSONDecoder()
+    documents, idx = list(), 0
+    while True:
+        while idx < len(text) and text[idx].isspace():
+            idx += 1
+        if idx == len(text):
+            return documents
+        document, idx = decoder.raw_decode(text, idx)
+        documents.append(document)
+
+
+def pipe_many(sources: Sequence[str], prog: str = "dot") -> List[dict]:
+    """一次调用 graphviz 布局 sources 中的所有图"""
+    output = graphviz.Source("\n".join(sources), engine=prog).pipe(
+        format="json0", encoding="utf8", quiet=True
+    )
+    documents = split_documents(output)
+    if len(documents) != len(sources):
+        raise ValueError(f"graphviz 输出了 {len(documents)} 个布局, 期望 {len(sources)} 个")
+    return documents
+
+
+def layout_chunk(sources: Sequence[str], prog: str = "dot") -> List[BatchResult]:
+    try:
+        return [BatchResult(xdot=xdot) for xdot in pipe_many(sources, prog)]
+    except (subprocess.CalledProcessError, ValueError) as e:
+        if len(sources) == 1:
+            return [BatchResult(error=e)]
+        logger.info(f"{len(sources)} 个图中有布局失败的, 拆开重试")
+    middle = len(sources) // 2
+    return layout_chunk(sources[:middle], prog) + layout_chunk(sources[middle:], prog)
+
+
+def layout_many(
+    sources: Sequence[str],
+    prog: str = "dot",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    jobs: Optional[int] = None,
+) -> List[BatchResult]:
+    """布局多个 DOT 源码, 结果与 sources 一一对应.
+
+    每 ``chunk_size`` 个图调用一次 graphviz, 各块在 ``jobs`` 个线程中
+    并行 (默认为 CPU 个数), 线程只是等待子进程, 不受 GIL 限制.
+    """
+    chunks = [
+        sources[start:start + chunk_size]
+        for start in range(0, len(sources), chunk_size)
+    ]
+    jobs = min(jobs or os.cpu_count() or 1, len(chunks) or 1)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(lambda chunk: layout_chunk(chunk, prog), chunks)
+    return [result for chunk in results for result in chunk]
+
+
+def layout_machines(
+    machines: Sequence,
+    prog: str = "dot",
+    specs: Optional[Sequence[MachineSpec]] = None,
+    rankdir: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    jobs: Optional[int] = None,
+    profile: Optional[str] = None,
+    thresholds: Optional[Thresholds] = None,
+) -> List[BatchResult]:
+    """批量版的 ``engine.layout_machine``.
+
+    按档位选出的程序分组调用 graphviz; 记录的耗时为所在组的平均值.
+    """
+    results: List[BatchResult] = [BatchResult() for _ in machines]
+    groups: Dict[str, List[Tuple[int, str, LayoutRun]]] = dict()
+    for idx, machine in enumerate(machines):
+        try:
+            spec = specs[idx] if specs else extract_machine(machine)
+            chosen = resolve_profile(
+                profile, len(spec.states), len(spec.transitions), thresholds, prog
+            )
+            if chosen.prog in ENGINES:
+                results[idx].xdot = layout_machine(
+                    machine, chosen.prog, spec, rankdir, profile, thresholds
+                )
+                continue
+            graph = machine_dot(machine, rankdir, spec)
+            graph.attr(**chosen.graph_attr)
+            run = LayoutRun(
+                chosen.name, chosen.prog, len(spec.states), len(spec.transitions)
+            )
+            groups.setdefault(chosen.prog, list()).append((idx, graph.source, run))
+        except Exception as e:
+            results[idx].error = e
+
+    for group_prog, members in groups.items():
+        start = time.perf_counter()
+        sources = [source for _, source, _ in members]
+        batch = layout_many(sources, group_prog, chunk_size, jobs)
+        seconds = (time.perf_counter() - start) / len(members)
+        for (idx, _, run), result in zip(members, batch):
+            if result.ok:
+                run.seconds = seconds
+                run.record(result.xdot)
+            results[idx] = result
+    return results
@@ -0,0 +1,135 @@
+import logging
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_PREFIX = "bundles-"
+DEFAULT_BUNDLE_RADIUS = 64
+DEFAULT_BUNDLE_SIZE = 2
+# 分支长度最多占整条边的比例
+MAX_BRANCH_RATIO = 0.5
+
+
+@dataclass
+class Bundle:
+    """多条路径相近的边合并成的一个 drawio edge cell.
+
+    主干从汇合点通往公共端点, 其余端点以短分支的形式画在同一条折线里:
+    ``source -> J -> e2 -> J -> e3 -> J -> target``. 成员转移写在
+    cell 的 transitions 属性里, xml2src 读回时展开.
+    """
+
+    cell_id: str
+    source: str
+    target: str
+    points: List[Tuple[int, int]] = field(default_factory=list)
+    members: List[str] = field(default_factory=list)
+    # 成员转移的 id, label, 两端和条件, 由 Layout.bundle 填写
+    transitions: List[dict] = field(default_factory=list)
+
+
+def border_points(
+    center: np.ndarray, half: np.ndarray, toward: np.ndarray
+) -> np.ndarray:
+    """从矩形中心指向 ``toward`` 的射线与矩形边框的交点"""
+    delta = toward - center
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = np.min(np.abs(half / delta), axis=1)
+    scale = np.where(np.isfinite(scale), np.minimum(scale, 1.0), 0.0)
+    return center + delta * scale[:, None]
+
+
+def junctions(ends: np.ndarray, hub: np.ndarray, radius: float) -> np.ndarray:
+    """汇合点: 从分散端点的质心朝公共端点走 ``radius`` 远"""
+    delta = hub - ends
+    dist = np.hypot(delta[:, 0], delta[:, 1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(dist > 0, radius / dist, 0.0)
+    return ends + delta * np.minimum(ratio, MAX_BRANCH_RATIO)[:, None]
+
+
+def group(keys: np.ndarray, min_size: int) -> List[np.ndarray]:
+    """按 key 分组, 返回成员数不少于 ``min_size`` 的各组下标"""
+    if not len(keys):
+        return list()
+    _, inverse, counts = np.unique(
+        keys, axis=0, return_inverse=True, return_counts=True
+    )
+    inverse = inverse.reshape(-1)
+    order = np.argsort(inverse, kind="stable")
+    groups = np.split(order, np.cumsum(counts)[:-1])
+    return [g for g in groups if len(g) >= min_size]
+
+
+def bundle_edges(
+    cells: Sequence[Tuple[str, float, float, float, float]],
+    edges: Sequence[Tuple[str, str, str]],
+    radius: float = DEFAULT_BUNDLE_RADIUS,
+    min_size: int = DEFAULT_BUNDLE_SIZE,
+) -> Tuple[List[Bundle], List[int]]:
+    """把路径相近的边合并成 bundle.
+
+    :param cells: (cell_id, x, y, width, height) 的节点几何
+    :param edges: (cell_id, source, target) 的边
+    :return: 合并后的 bundle 以及未被合并的边的下标
+    """
+    index: Dict[str, int] = {cell[0]: idx for idx, cell in enumerate(cells)}
+    geometry = np.array([cell[1:] for cell in cells], dtype=float).reshape(-1, 4)
+    half = geometry[:, 2:] / 2
+    centers = geometry[:, :2] + half
+
+    src = np.array([index.get(e[1], -1) for e in edges], dtype=np.int64)
+    dst = np.array([index.get(e[2], -1) for e in edges], dtype=np.int64)
+    candidates = (src >= 0) & (dst >= 0) & (src != dst)
+    merged = np.zeros(len(edges), dtype=bool)
+    bundles: List[Bundle] = list()
+
+    # 第一轮按 (终点, 起点所在网格) 合并扇入, 第二轮按 (起点, 终点所在网格) 合并扇出
+    for hub_side, far_side in ((dst, src), (src, dst)):
+        pending = np.flatnonzero(candidates & ~merged)
+        if not len(pending):
+            break
+        cell = np.floor(centers[far_side[pending]] / radius).astype(np.int64)
+        keys = np.column_stack([hub_side[pending], cell])
+        groups = [pending[g] for g in group(keys, min_size)]
+        if not groups:
+            continue
+
+        members = np.concatenate(groups)
+        owner = np.repeat(np.arange(len(groups)), [len(g) for g in groups])
+        far = centers[far_side[members]]
+        sums = np.zeros((len(groups), 2))
+        np.add.at(sums, owner, far)
+        spread = sums / np.array([len(g) for g in groups])[:, None]
+        hub_ids = hub_side[[g[0] for g in groups]]
+        joints = junctions(spread, centers[hub_ids], radius)
+        branch_ends = border_points(
+            far, half[far_side[members]], joints[owner]
+        ).round().astype(int).tolist()
+        joints = joints.round().astype(int).tolist()
+        merged[members] = True
+
+        offset = 0
+        fan_in = hub_side is dst
+        for gid, g in enumerate(groups):
+            joint = tuple(joints[gid])
+            points: List[Tuple[int, int]] = [joint]
+            for end in branch_ends[offset + 1:offset + len(g)]:
+                points.append(tuple(end))
+                points.append(joint)
+            offset += len(g)
+            first, hub = edges[g[0]], cells[hub_ids[gid]][0]
+            bundles.append(
+                Bundle(
+                    BUNDLE_PREFIX + str(len(bundles)),
+                    source=first[1] if fan_in else hub,
+                    target=hub if fan_in else first[2],
+                    points=points,
+                    members=[edges[idx][0] for idx in g],
+                )
+            )
+
+    logger.info(f"edge bundling: {int(merged.sum())} edges => {len(bundles)} bundles")
+    return bundles, np.flatnonzero(~merged).tolist()
@@ -0,0 +1,79 @@
+#! /usr/bin/env python
+"""``gvdraw`` 命令, 目前只有 analyze 子命令"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+from typing import Optional
+
+from gvdraw.analysis import analyze
+from gvdraw.ir import IR_SUFFIX, GraphIR
+from gvdraw.machine import MachineSpec, extract_machine
+
+logger = logging.getLogger(__name__)
+
+JSON_SUFFIXES = (".json", ".json0")
+XML_SUFFIXES = (".xml", ".drawio")
+
+
+def load_spec(src: str, machine_name: Optional[str] = None) -> MachineSpec:
+    """按扩展名读取: transitions 源码, json0, drawio xml 或 IR"""
+    _, ext = os.path.splitext(src)
+    if ext == ".py":
+        from gvdraw.trans2xml import find_machine, load_module
+
+        return extract_machine(find_machine(load_module(src), machine_name))
+    if ext == IR_SUFFIX:
+        return GraphIR.load(src).to_spec()
+    if ext in XML_SUFFIXES:
+        from gvdraw.xml2src import XMLLayout
+
+        return XMLLayout.load(src).to_ir().to_spec()
+    if ext in JSON_SUFFIXES:
+        from gvdraw.json2xml import Layout
+
+        with open(src, "r", encoding="utf8") as f:
+            return Layout(json.load(f)).to_ir().to_spec()
+    raise ValueError(f"无法识别的输入 {src}")
+
+
+def analyze_command(args: argparse.Namespace) -> int:
+    failed = False
+    for src in args.src:
+        report = analyze(load_spec(src, args.machine))
+        failed = failed or not report.ok
+        if args.json:
+            print(report.to_json())
+        else:
+            print(f"== {src}")
+            print(report.format(None if args.limit <= 0 else args.limit))
+    return int(args.strict and failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="gvdraw")
+    commands = parser.add_subparsers(dest="command", required=True)
+    parser_analyze = commands.add_parser(
+        "analyze",
+        help="检查不可达, 无出路, 到不了 final 的状态以及环",
+    )
+    parser_analyze.add_argument(
+        "src", nargs="+", help=f"transitions 源码 (.py), json0, drawio xml 或 {IR_SUFFIX}"
+    )
+    parser_analyze.add_argument("--machine", help="模块中 machine 的变量名")
+    parser_analyze.add_argument("--json", action="store_true", help="输出 JSON")
+    parser_analyze.add_argument(
+        "--limit", type=int, default=20, help="每项最多列出的个数, 0 为不限"
+    )
+    parser_analyze.add_argument(
+        "--strict", action="store_true", help="发现问题时以非零状态退出"
+    )
+    parser_analyze.set_defaults(handler=analyze_command)
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""按顶层状态拆开布局, 再拼成一张图.
+
+dot 的耗时随图的规模超线性增长, 一个巨大的复合状态机只能用一个核.
+这里按顶层状态把 spec 拆成若干部分 (顶层的简单状态合为一部分), 每部分
+在单独的进程里布局, 再用货架算法把各部分的外框拼到一页上, 最后补画
+跨部分的转移 (直线). 结果仍是一份 json0, ``json2xml.Layout`` 可以直接
+渲染.
+"""
+
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from gvdraw.engine import DEFAULT_RANKDIR, layout_spec
+from gvdraw.layered import (
+    Box,
+    Point,
+    GRAPH_STYLE,
+    POINTS_PER_INCH,
+    border,
+    center,
+    text_size,
+)
+from gvdraw.machine import MachineSpec
+from gvdraw.packing import shelf_pack
+from gvdraw.profiles import RUN_KEY, LayoutRun, Thresholds
+
+logger = logging.getLogger(__name__)
+
+# 取值为单个坐标的属性, 平移时一并处理
+POINT_ATTRS = ("pos", "lp", "xlp", "head_lp", "tail_lp")
+
+
+def split_spec(spec: MachineSpec) -> Tuple[List[MachineSpec], List[int]]:
+    """按顶层状态拆分 spec, 返回各部分以及跨部分的转移在 spec 中的下标"""
+    states = spec.state_map()
+    tops: Dict[str, str] = dict()
+
+    def top_of(name: str) -> str:
+        path = list()
+        while name not in tops and states[name].parent is not None:
+            path.append(name)
+            name = states[name].parent
+        top = tops.get(name, name)
+        for visited in path + [name]:
+            tops[visited] = top
+        return top
+
+    parts: List[MachineSpec] = list()
+    owner: Dict[str, int] = dict()
+    loose: Optional[int] = None
+    for state in spec.states:
+        if state.parent is not None:
+            continue
+        if state.children:
+            owner[state.name] = len(parts)
+            parts.append(MachineSpec(spec.separator))
+            continue
+        if loose is None:
+            loose = len(parts)
+            parts.append(MachineSpec(spec.separator))
+        owner[state.name] = loose
+
+    for state in spec.states:
+        part = parts[owner[top_of(state.name)]]
+        part.states.append(state)
+        if state.name == spec.initial:
+            part.initial = state.name
+    cross = list()
+    for idx, tran in enumerate(spec.transitions):
+        source, dest = owner[top_of(tran.source)], owner[top_of(tran.dest)]
+        if source == dest:
+            parts[source].transitions.append(tran)
+        else:
+            cross.append(idx)
+    return parts, cross
+
+
+def layout_part(
+    args: Tuple[MachineSpec, str, str, Optional[str], Optional[Thresholds]]
+) -> dict:
+    return layout_spec(*args)
+
+
+def shift_points(value: str, dx: float, dy: float) -> str:
+    """平移以空格分隔的坐标, 保留样条中 ``e,`` / ``s,`` 前缀"""
+    result = list()
+    for token in value.split():
+        prefix = ""
+        if token[:2] in ("e,", "s,"):
+            prefix, token = token[:2], token[2:]
+        x, y = token.split(",")[:2]
+        result.append(f"{prefix}{float(x) + dx:.2f},{float(y) + dy:.2f}")
+    return " ".join(result)
+
+
+def shift_bb(value: str, dx: float, dy: float) -> str:
+    llx, lly, urx, ury = (float(v) for v in value.split(","))
+    return f"{llx + dx:.2f},{lly + dy:.2f},{urx + dx:.2f},{ury + dy:.2f}"
+
+
+def is_subgraph(obj: dict) -> bool:
+    return "bb" in obj
+
+
+def object_box(obj: dict) -> Box:
+    """对象在 json0 坐标系中的外框, x/y 为左下角"""
+    if is_subgraph(obj):
+        llx, lly, urx, ury = (float(v) for v in obj["bb"].split(","))
+        return Box(obj["name"], "", urx - llx, ury - lly, llx, lly)
+    cx, cy = (float(v) for v in obj["pos"].split(","))
+    width = float(obj["width"]) * POINTS_PER_INCH
+    height = float(obj["height"]) * POINTS_PER_INCH
+    return Box(obj["name"], "", width, height, cx - width / 2, cy - height / 2)
+
+
+def straight_edge(gvid: int, tail: dict, head: dict, label: str) -> dict:
+    """跨部分的转移: 两端外框之间的直线, 写成 B 样条控制点"""
+    src, dst = object_box(tail), object_box(head)
+    (ax, ay), (bx, by) = border(src, center(dst)), border(dst, center(src))
+    controls: List[Point] = [
+        (ax + (bx - ax) * t / 3, ay + (by - ay) * t / 3) for t in range(4)
+    ]
+    return dict(
+        _gvid=gvid,
+        tail=tail["_gvid"],
+        head=head["_gvid"],
+        label=label,
+        lp=f"{(ax + bx) / 2:.2f},{(ay + by) / 2:.2f}",
+        pos=" ".join(f"{x:.2f},{y:.2f}" for x, y in controls),
+        color="black",
+    )
+
+
+def compose(
+    layouts: Sequence[dict], spec: MachineSpec, cross: Sequence[int], title: str
+) -> dict:
+    """把各部分的 json0 拼成一份, _gvid 按 json0 的约定重新编号.
+
+    各部分中的对象和边直接修改后复用, 不再复制.
+    """
+    page = Box("", title)
+    offsets = list()
+    for xdot in layouts:
+        llx, lly, urx, ury = (float(v) for v in xdot["bb"].split(","))
+        page.children.append(Box("", "", urx - llx, ury - lly))
+        offsets.append((llx, lly))
+    shelf_pack(page)
+
+    # 所有部分的 cluster 在前, 节点在后
+    cluster_count = sum(
+        is_subgraph(obj) for xdot in layouts for obj in xdot["objects"]
+    )
+    clusters, nodes, edges = list(), list(), list()
+    for xdot, box, (llx, lly) in zip(layouts, page.children, offsets):
+        dx, dy = box.x - llx, page.height - box.y - box.height - lly
+        gvids = dict()
+        for obj in xdot["objects"]:
+            if is_subgraph(obj):
+                gvids[obj["_gvid"]] = len(clusters)
+                clusters.append(obj)
+            else:
+                gvids[obj["_gvid"]] = cluster_count + len(nodes)
+                nodes.append(obj)
+        edge_gvids = {
+            edg["_gvid"]: len(edges) + idx
+            for idx, edg in enumerate(xdot.get("edges", []))
+        }
+        for obj in xdot["objects"]:
+            obj["_gvid"] = gvids[obj["_gvid"]]
+            for key in ("nodes", "subgraphs"):
+                if key in obj:
+                    obj[key] = [gvids[gvid] for gvid in obj[key]]
+            if "edges" in obj:
+                obj["edges"] = [edge_gvids[gvid] for gvid in obj["edges"]]
+            if "bb" in obj:
+                obj["bb"] = shift_bb(obj["bb"], dx, dy)
+            for key in POINT_ATTRS:
+                if key in obj:
+                    obj[key] = shift_points(obj[key], dx, dy)
+        for edg in xdot.get("edges", []):
+            edg["_gvid"] = edge_gvids[edg["_gvid"]]
+            edg["tail"], edg["head"] = gvids[edg["tail"]], gvids[edg["head"]]
+            for key in POINT_ATTRS:
+                if key in edg:
+                    edg[key] = shift_points(edg[key], dx, dy)
+            edges.append(edg)
+
+    # 复合状态在 dot 的结果中是 cluster_X_root 里名为 X 的 point 节点,
+    # 在进程内引擎的结果中是 cluster_X
+    objects = clusters + nodes
+    names = {obj["name"]: obj for obj in objects}
+
+    def endpoint(name: str) -> dict:
+        return names.get(name) or names["cluster_" + name]
+
+    for idx in cross:
+        tran = spec.transitions[idx]
+        edges.append(
+            straight_edge(
+                len(edges), endpoint(tran.source), endpoint(tran.dest), tran.trigger
+            )
+        )
+
+    width, lheight = text_size(title)
+    # 图的其它属性 (directed, rankdir, ...) 沿用第一部分的
+    graph = {
+        key: value
+        for key, value in (layouts[0] if layouts else dict()).items()
+        if key not in ("objects", "edges", RUN_KEY)
+    }
+    graph.update(
+        name=title,
+        label=title,
+        bb=f"0,0,{page.width:.2f},{page.height:.2f}",
+        lp=f"{page.width / 2:.2f},{page.height - lheight / 2:.2f}",
+        lwidth=f"{width / POINTS_PER_INCH:.2f}",
+        lheight=f"{lheight / POINTS_PER_INCH:.2f}",
+        _subgraph_cnt=len(clusters),
+        objects=objects,
+        edges=edges,
+    )
+    for key, value in GRAPH_STYLE.items():
+        graph.setdefault(key, value)
+    return graph
+
+
+def split_layout(
+    spec: MachineSpec,
+    prog: str = "dot",
+    rankdir: str = DEFAULT_RANKDIR,
+    title: str = "State Machine",
+    jobs: Optional[int] = None,
+    profile: Optional[str] = None,
+    thresholds: Optional[Thresholds] = None,
+) -> dict:
+    """按顶层状态拆开, 在 ``jobs`` 个进程中分别布局后拼成一份 json0.
+
+    ``profile`` 为 auto 时按每一部分的规模分别选择档位.
+    """
+    parts, cross = split_spec(spec)
+    tasks = [(part, prog, rankdir, profile, thresholds) for part in parts]
+    start = time.perf_counter()
+    if len(tasks) < 2 or jobs == 1:
+        layouts = [layout_part(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            layouts = list(executor.map(layout_part, tasks))
+    logger.info(
+        f"{len(parts)} parts, {len(spec.transitions) - len(cross)} local "
+        f"and {len(cross)} cross transitions"
+    )
+    runs = [xdot[RUN_KEY] for xdot in layouts]
+    xdot = compose(layouts, spec, cross, title)
+    run = LayoutRun(
+        "+".join(sorted(set(r["profile"] for r in runs))),
+        "+".join(sorted(set(r["prog"] for r in runs))),
+        len(spec.states),
+        len(spec.transitions),
+        time.perf_counter() - start,
+    )
+    run.record(xdot)[RUN_KEY]["parts"] = runs
+    return xdot
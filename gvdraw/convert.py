@@ -0,0 +1,108 @@
+"""纯内存的转换接口.
+
+这里的函数不读写文件, 不修改传入的 machine, 也不依赖模块级的可变状态,
+可以在多个线程里同时调用.
+"""
+
+import json
+import logging
+from typing import Optional
+
+from gvdraw.bundle import DEFAULT_BUNDLE_RADIUS
+from gvdraw.compose import split_layout
+from gvdraw.engine import DEFAULT_RANKDIR, layout_machine
+from gvdraw.json2xml import Layout, dot2json, merge_labels
+from gvdraw.machine import extract_machine, machine_graph
+from gvdraw.profiles import Thresholds
+from gvdraw.relayout import boxes_from_ir, relayout
+from gvdraw.xml2src import XMLLayout
+
+logger = logging.getLogger(__name__)
+
+
+def json_to_drawio(
+    xdot: dict,
+    generic: bool = False,
+    bundle: bool = False,
+    bundle_radius: float = DEFAULT_BUNDLE_RADIUS,
+) -> str:
+    """graphviz json0 => drawio xml"""
+    layout = Layout(xdot, generic=generic)
+    if bundle:
+        layout.bundle(bundle_radius)
+    return layout.render()
+
+
+def dot_to_drawio(
+    source: str,
+    reduce: bool = False,
+    ghosts: str = "none",
+    generic: bool = False,
+    bundle: bool = False,
+    bundle_radius: float = DEFAULT_BUNDLE_RADIUS,
+    prog: str = "dot",
+    profile: Optional[str] = None,
+    thresholds: Optional[Thresholds] = None,
+    measure: bool = False,
+) -> str:
+    """DOT 源码 => drawio xml, 参数含义与 json2xml 的命令行一致"""
+    xdot, removed = dot2json(
+        source,
+        reduce=reduce,
+        prog=prog,
+        profile=profile,
+        thresholds=thresholds,
+        measure=measure,
+    )
+    layout = Layout(xdot, generic=generic)
+    if ghosts != "none":
+        layout.add_ghosts(removed, hidden=ghosts == "hidden")
+    if bundle:
+        layout.bundle(bundle_radius)
+    return layout.render()
+
+
+def machine_to_json(machine, prog: str = "dot") -> dict:
+    """布局 machine, 并把带条件和回调的 label 合并进布局结果"""
+    target = machine_graph(machine).pipe(format="json0", engine=prog)
+    label = machine_graph(machine, True, True).pipe(format="json0", engine=prog)
+    return merge_labels(json.loads(target), json.loads(label))
+
+
+def machine_to_drawio(
+    machine,
+    prog: str = "dot",
+    split: bool = False,
+    jobs: Optional[int] = None,
+    profile: Optional[str] = None,
+    thresholds: Optional[Thresholds] = None,
+    previous: Optional[str] = None,
+) -> str:
+    """machine => drawio xml.
+
+    只布局一次, 用来取几何; 状态和转移直接从 machine 中取出.
+    ``prog`` 可以是 graphviz 的程序名, 也可以是进程内的引擎 (见 gvdraw.engine).
+    ``split`` 时按顶层状态拆开, 在 ``jobs`` 个进程中分别布局后再拼到一起.
+    ``profile`` 为 gvdraw.profiles 中的档位或 auto, 给出时忽略 ``prog``.
+    ``previous`` 为上一次生成的 drawio xml, 给出时沿用其中的位置做增量布局,
+    忽略其它布局参数.
+    """
+    spec = extract_machine(machine)
+    rankdir = machine.machine_attributes.get("rankdir", DEFAULT_RANKDIR)
+    if previous is not None:
+        boxes = boxes_from_ir(XMLLayout(previous).to_ir())
+        xdot = relayout(spec, boxes, rankdir, machine.title)
+    elif split:
+        xdot = split_layout(
+            spec, prog, rankdir, machine.title, jobs, profile, thresholds
+        )
+    else:
+        xdot = layout_machine(
+            machine, prog=prog, spec=spec, profile=profile, thresholds=thresholds
+        )
+    return Layout(xdot, spec=spec).render()
+
+
+def drawio_to_source(xml: str) -> str:
+    """drawio xml => 状态和转移的源码"""
+    return XMLLayout(xml).unmarshal()
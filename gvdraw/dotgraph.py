@@ -0,0 +1,322 @@
+import re
+import logging
+import graphviz
+from graphviz import nohtml
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+KEYWORDS = ("strict", "graph", "digraph", "subgraph", "node", "edge")
+
+TOKEN = re.compile(
+    r"""
+    (?:\s+|//[^\n]*|/\*.*?\*/|(?m:^\#[^\n]*))*
+    (?:(?P<op>->|--|[{}\[\];,=:+])
+    |(?P<qstr>"(?:[^"\\]|\\.)*")
+    |(?P<id>[A-Za-z_\x80-\U0010ffff][\w\x80-\U0010ffff]*|-?(?:\.\d+|\d+(?:\.\d*)?))
+    |(?P<html><)
+    |(?P<end>\Z))
+    """,
+    re.S | re.X,
+)
+
+Attrs = Dict[str, str]
+
+
+class Token(str):
+    """Identifier token; ``quoted`` marks values that came from a "string"."""
+
+    quoted: bool = False
+
+
+def tokenize(source: str) -> Iterator[Union[Token, str]]:
+    pos, end = 0, len(source)
+    while pos < end:
+        m = TOKEN.match(source, pos)
+        if not m:
+            raise SyntaxError(f"unexpected {source[pos:pos + 20]!r} @{pos}")
+        kind = m.lastgroup
+        if kind == "end":
+            return
+        if kind == "html":
+            depth, stop = 0, m.start(kind)
+            while stop < end:
+                if source[stop] == "<":
+                    depth += 1
+                elif source[stop] == ">":
+                    depth -= 1
+                    if not depth:
+                        break
+                stop += 1
+            yield Token(source[m.start(kind):stop + 1])
+            pos = stop + 1
+            continue
+        pos = m.end()
+        if kind == "op":
+            yield m.group(kind)
+        elif kind == "qstr":
+            token = Token(m.group(kind)[1:-1])
+            token.quoted = True
+            yield token
+        else:
+            yield Token(m.group(kind))
+
+
+@dataclass
+class DotNode:
+    name: str
+    attrs: Attrs = field(default_factory=dict)
+
+
+@dataclass
+class DotEdge:
+    tail: str
+    head: str
+    attrs: Attrs = field(default_factory=dict)
+    tailport: str = ""
+    headport: str = ""
+
+
+@dataclass
+class DotAttrs:
+    kind: Optional[str]
+    attrs: Attrs = field(default_factory=dict)
+
+
+Statement = Union[DotNode, DotEdge, DotAttrs, "DotGraph"]
+
+
+@dataclass
+class DotGraph:
+    name: Optional[str] = None
+    directed: bool = True
+    strict: bool = False
+    body: List[Statement] = field(default_factory=list)
+
+    @property
+    def nodes(self) -> List[str]:
+        """所有节点, 按首次出现的顺序"""
+        seen: Dict[str, None] = dict()
+        for stmt in self.walk():
+            if isinstance(stmt, DotNode):
+                seen.setdefault(stmt.name)
+            elif isinstance(stmt, DotEdge):
+                seen.setdefault(stmt.tail)
+                seen.setdefault(stmt.head)
+        return list(seen)
+
+    @property
+    def edges(self) -> List[DotEdge]:
+        return [stmt for stmt in self.walk() if isinstance(stmt, DotEdge)]
+
+    def walk(self) -> Iterator[Statement]:
+        for stmt in self.body:
+            yield stmt
+            if isinstance(stmt, DotGraph):
+                yield from stmt.walk()
+
+    def remove_edges(self, edges: List[DotEdge]):
+        drop = set(id(e) for e in edges)
+        self.body = [stmt for stmt in self.body if id(stmt) not in drop]
+        for stmt in self.body:
+            if isinstance(stmt, DotGraph):
+                stmt.remove_edges(edges)
+
+    def build(self, graph: Optional[graphviz.Digraph] = None) -> graphviz.Digraph:
+        if graph is None:
+            cls = graphviz.Digraph if self.directed else graphviz.Graph
+            graph = cls(self.name, strict=self.strict)
+        for stmt in self.body:
+            if isinstance(stmt, DotAttrs):
+                graph.attr(stmt.kind, _attributes=_attrs(stmt.attrs))
+            elif isinstance(stmt, DotNode):
+                graph.node(_id(stmt.name), _attributes=_attrs(stmt.attrs))
+            elif isinstance(stmt, DotEdge):
+                graph.edge(
+                    _port(stmt.tail, stmt.tailport),
+                    _port(stmt.head, stmt.headport),
+                    _attributes=_attrs(stmt.attrs),
+                )
+            else:
+                with graph.subgraph(name=stmt.name) as sub:
+                    stmt.build(sub)
+        return graph
+
+    @property
+    def source(self) -> str:
+        return self.build().source
+
+
+def _id(value: str) -> str:
+    if isinstance(value, Token) and value.quoted and value.startswith("<"):
+        return nohtml(value)
+    return value
+
+
+def _attrs(attrs: Attrs) -> Attrs:
+    return {k: _id(v) for k, v in attrs.items()}
+
+
+def _port(name: str, port: str) -> str:
+    return f"{name}:{port}" if port else name
+
+
+class DotParser:
+    def __init__(self, source: str):
+        # 末尾的 None 作为哨兵, 省去越界检查
+        self.tokens: List[Optional[str]] = list(tokenize(source)) + [None, None]
+        self.pos = 0
+        self.directed = True
+
+    def take(self) -> str:
+        token = self.tokens[self.pos]
+        if token is None:
+            raise SyntaxError("unexpected end of DOT source")
+        self.pos += 1
+        return token
+
+    def expect(self, op: str):
+        token = self.take()
+        if token != op or isinstance(token, Token):
+            raise SyntaxError(f"expect {op!r}, got {token!r}")
+
+    def is_op(self, op: str, offset: int = 0) -> bool:
+        token = self.tokens[self.pos + offset]
+        return token.__class__ is str and token == op
+
+    def is_edgeop(self) -> bool:
+        token = self.tokens[self.pos]
+        return token.__class__ is str and (token == "->" or token == "--")
+
+    def is_keyword(self, keyword: str, offset: int = 0) -> bool:
+        token = self.tokens[self.pos + offset]
+        return (
+            token.__class__ is Token
+            and not token.quoted
+            and token.lower() == keyword
+        )
+
+    def ident(self) -> Token:
+        token = self.take()
+        if token.__class__ is not Token:
+            raise SyntaxError(f"expect ID, got {token!r}")
+        # "a" + "b" 字符串拼接
+        while self.is_op("+"):
+            self.take()
+            tail = self.ident()
+            token = Token(token + tail)
+            token.quoted = True
+        return token
+
+    def parse(self) -> DotGraph:
+        graph = DotGraph()
+        if self.is_keyword("strict"):
+            self.take()
+            graph.strict = True
+        kind = self.ident().lower()
+        if kind not in ("graph", "digraph"):
+            raise SyntaxError(f"expect graph or digraph, got {kind!r}")
+        graph.directed = self.directed = kind == "digraph"
+        if not self.is_op("{"):
+            graph.name = self.ident()
+        self.expect("{")
+        self.statements(graph)
+        return graph
+
+    def statements(self, graph: DotGraph):
+        while not self.is_op("}"):
+            if self.is_op(";"):
+                self.pos += 1
+                continue
+            self.statement(graph)
+        self.take()
+
+    def statement(self, graph: DotGraph):
+        token = self.tokens[self.pos]
+        if token.__class__ is Token and not token.quoted and token.lower() in KEYWORDS:
+            keyword = token.lower()
+            if keyword in ("graph", "node", "edge") and self.is_op("[", 1):
+                self.pos += 1
+                graph.body.append(DotAttrs(keyword, self.attr_list()))
+                return
+        if self.peek_subgraph():
+            ends = [self.subgraph(graph)]
+        elif self.is_op("=", 1):
+            key = self.ident()
+            self.pos += 1
+            graph.body.append(DotAttrs(None, {key: self.ident()}))
+            return
+        else:
+            name, port = self.node_id()
+            if not self.is_edgeop():
+                attrs = self.attr_list() if self.is_op("[") else dict()
+                graph.body.append(DotNode(name, attrs))
+                return
+            ends = [(name, port)]
+
+        while self.is_edgeop():
+            self.pos += 1
+            if self.peek_subgraph():
+                ends.append(self.subgraph(graph))
+            else:
+                ends.append(self.node_id())
+        attrs = self.attr_list() if self.is_op("[") else dict()
+        if len(ends) == 2 and ends[0].__class__ is tuple and ends[1].__class__ is tuple:
+            (tail, tailport), (head, headport) = ends
+            graph.body.append(DotEdge(tail, head, attrs, tailport, headport))
+            return
+        for tails, heads in zip(ends, ends[1:]):
+            for tail, tailport in _endpoints(tails):
+                for head, headport in _endpoints(heads):
+                    graph.body.append(
+                        DotEdge(tail, head, dict(attrs), tailport, headport)
+                    )
+
+    def peek_subgraph(self) -> bool:
+        return self.is_keyword("subgraph") or self.is_op("{")
+
+    def subgraph(self, parent: DotGraph) -> DotGraph:
+        sub = DotGraph(directed=self.directed)
+        if self.is_keyword("subgraph"):
+            self.pos += 1
+            if not self.is_op("{"):
+                sub.name = self.ident()
+        self.expect("{")
+        self.statements(sub)
+        parent.body.append(sub)
+        return sub
+
+    def node_id(self) -> Tuple[str, str]:
+        name, port = self.ident(), ""
+        while self.is_op(":"):
+            self.pos += 1
+            port = f"{port}:{self.ident()}" if port else self.ident()
+        return name, port
+
+    def attr_list(self) -> Attrs:
+        attrs: Attrs = dict()
+        while self.is_op("["):
+            self.pos += 1
+            while not self.is_op("]"):
+                if self.is_op(",") or self.is_op(";"):
+                    self.pos += 1
+                    continue
+                key = self.ident()
+                if self.is_op("="):
+                    self.pos += 1
+                    attrs[key] = self.ident()
+                else:
+                    attrs[key] = Token("true")
+            self.take()
+        return attrs
+
+
+def _endpoints(end: Union[Tuple[str, str], DotGraph]) -> List[Tuple[str, str]]:
+    if isinstance(end, DotGraph):
+        return [(name, "") for name in end.nodes]
+    return [end]
+
+
+def parse_dot(source: str) -> DotGraph:
+    return DotParser(source).parse()
@@ -23,6 +23,11 @@ def inch2pixel(size: Union[float, str]) -> int:
     return int(float(size) * DEFAULT_DPI)
 
 
+def point2pixel(points: Union[float, str]) -> int:
+    """graphviz 的 point (1/72 inch) => 像素"""
+    return int(round(float(points) * DEFAULT_DPI / GRAPHVIZ_DEFAULT_DPI))
+
+
 def dpi72todpi96(pixels: str) -> int:
     return int(pixels) * 4 // 3
     
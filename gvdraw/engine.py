@@ -0,0 +1,159 @@
+"""布局引擎的选择.
+
+``prog`` 为 graphviz 的程序名 (dot, neato, ...) 时调用外部的 graphviz;
+为 ``ENGINES`` 中的名字时在进程内布局, 不启动任何子进程.
+
+交给 graphviz 的状态节点带有 gvdraw.metrics 算出的固定尺寸, dot 不再
+自己测量文字.
+"""
+
+import json
+import time
+import logging
+from typing import Callable, Dict, Optional
+
+import graphviz
+
+from gvdraw.layered import POINTS_PER_INCH, layered_layout
+from gvdraw.packing import packed_layout
+from gvdraw.machine import MachineSpec, extract_machine, machine_graph
+from gvdraw.metrics import NEWLINE, node_size
+from gvdraw.profiles import LayoutRun, Thresholds, resolve_profile
+
+logger = logging.getLogger(__name__)
+
+ENGINES: Dict[str, Callable[..., dict]] = {
+    "layered": layered_layout,
+    "packed": packed_layout,
+}
+
+DEFAULT_RANKDIR = "LR"
+
+
+def is_in_process(prog: str) -> bool:
+    return prog in ENGINES
+
+
+def size_attrs(label: str) -> Dict[str, str]:
+    """label 对应的节点尺寸, 写成 graphviz 的属性"""
+    width, height = node_size(label + NEWLINE)
+    return dict(
+        width=f"{width / POINTS_PER_INCH:.4f}",
+        height=f"{height / POINTS_PER_INCH:.4f}",
+        fixedsize="true",
+    )
+
+
+def spec_graph(spec: MachineSpec, rankdir: str = DEFAULT_RANKDIR) -> graphviz.Digraph:
+    """按 transitions 的约定把 spec 写成 DOT, 供 graphviz 布局"""
+    graph = graphviz.Digraph(
+        "State Machine",
+        graph_attr=dict(rankdir=rankdir, compound="true"),
+        node_attr=dict(shape="rectangle", style="rounded,filled", fillcolor="white"),
+    )
+    states = spec.state_map()
+
+    def add(container: graphviz.Digraph, names):
+        for name in names:
+            state = states[name]
+            if not state.children:
+                container.node(
+                    name, label=state.label + "\\l", **size_attrs(state.label)
+                )
+                continue
+            with container.subgraph(
+                name="cluster_" + name,
+                graph_attr=dict(label=state.label + "\\l", rank="source"),
+            ) as sub:
+                with sub.subgraph(
+                    name="cluster_" + name + "_root",
+                    graph_attr=dict(label="", color="None", rank="min"),
+                ) as root:
+                    root.node(name, shape="point", fillcolor="black", width="0.1")
+                add(sub, state.children)
+
+    add(graph, [s.name for s in spec.states if s.parent is None])
+    for tran in spec.transitions:
+        attrs = dict(label=tran.trigger)
+        if states[tran.dest].children and not tran.source.startswith(tran.dest):
+            attrs["lhead"] = "cluster_" + tran.dest
+        graph.edge(tran.source, tran.dest, **attrs)
+    return graph
+
+
+def layout_spec(
+    spec: MachineSpec,
+    prog: str = "dot",
+    rankdir: str = DEFAULT_RANKDIR,
+    profile: Optional[str] = None,
+    thresholds: Optional[Thresholds] = None,
+) -> dict:
+    chosen = resolve_profile(
+        profile, len(spec.states), len(spec.transitions), thresholds, prog
+    )
+    start = time.perf_counter()
+    if is_in_process(chosen.prog):
+        xdot = ENGINES[chosen.prog](spec, rankdir=rankdir)
+    else:
+        graph = spec_graph(spec, rankdir)
+        graph.attr(**chosen.graph_attr)
+        xdot = json.loads(graph.pipe(format="json0", engine=chosen.prog))
+    run = LayoutRun(
+        chosen.name,
+        chosen.prog,
+        len(spec.states),
+        len(spec.transitions),
+        time.perf_counter() - start,
+    )
+    return run.record(xdot)
+
+
+def layout_machine(
+    machine,
+    prog: str = "dot",
+    spec: Optional[MachineSpec] = None,
+    rankdir: Optional[str] = None,
+    profile: Optional[str] = None,
+    thresholds: Optional[Thresholds] = None,
+) -> dict:
+    """布局 machine, 返回 json0; ``rankdir`` 为空时沿用 machine 的设置.
+
+    ``profile`` 为 gvdraw.profiles 中的档位或 auto, 给出时忽略 ``prog``.
+    """
+    rankdir = rankdir or machine.machine_attributes.get("rankdir", DEFAULT_RANKDIR)
+    spec = spec or extract_machine(machine)
+    chosen = resolve_profile(
+        profile, len(spec.states), len(spec.transitions), thresholds, prog
+    )
+    start = time.perf_counter()
+    if is_in_process(chosen.prog):
+        xdot = ENGINES[chosen.prog](spec, rankdir=rankdir, title=machine.title)
+    else:
+        graph = machine_dot(machine, rankdir, spec)
+        graph.attr(**chosen.graph_attr)
+        xdot = json.loads(graph.pipe(format="json0", engine=chosen.prog))
+    run = LayoutRun(
+        chosen.name,
+        chosen.prog,
+        len(spec.states),
+        len(spec.transitions),
+        time.perf_counter() - start,
+    )
+    return run.record(xdot)
+
+
+def machine_dot(
+    machine, rankdir: Optional[str] = None, spec: Optional[MachineSpec] = None
+) -> graphviz.Digraph:
+    """交给 graphviz 布局的 DOT, 与 transitions 自己画出的图一致.
+
+    给出 ``spec`` 时叶子状态带上固定尺寸.
+    """
+    graph = machine_graph(machine)
+    graph.attr(
+        rankdir=rankdir or machine.machine_attributes.get("rankdir", DEFAULT_RANKDIR)
+    )
+    for state in spec.states if spec is not None else []:
+        if not state.children:
+            graph.node(state.name, **size_attrs(state.label))
+    return graph
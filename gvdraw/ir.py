@@ -0,0 +1,424 @@
+"""状态图的紧凑中间表示.
+
+json2xml, xml2src 和 sketchpad 各自有一套节点/边模型, 三者之间原先只能
+通过 json0 或 drawio xml 文本交换数据. ``GraphIR`` 用定长数组保存状态树、
+转移表和可选的几何信息, 字符串统一放进字符串表, 可以序列化成带版本号
+的二进制格式, 读取时只需要几次 ``array.frombytes``.
+
+二进制格式 (小端)::
+
+    magic "GVIR" | version u16 | flags u16 | initial i32 | title i32
+    字符串表: u32 个数 | u32 字节数 | 以 NUL 分隔的 utf8
+    之后依次是 ``GraphIR.sections()`` 中的各列, 每列为 u32 字节数 + 内容
+
+几何信息使用 drawio 的像素坐标: 左上角为原点, (x, y, width, height)
+为绝对坐标.
+"""
+
+import sys
+import struct
+import logging
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from gvdraw.dpi import DEFAULT_DPI, GRAPHVIZ_DEFAULT_DPI
+from gvdraw.machine import MachineSpec, StateSpec, TransitionSpec
+
+logger = logging.getLogger(__name__)
+
+IR_SUFFIX = ".gvir"
+IR_MAGIC = b"GVIR"
+IR_VERSION = 1
+IR_HEADER = struct.Struct("<4sHHii")
+SECTION_SIZE = struct.Struct("<I")
+
+FLAG_GEOMETRY = 0x1
+STATE_SEP = "."
+NO_STATE = -1
+
+Geometry = Tuple[float, float, float, float]
+
+
+class StringTable:
+    """字符串驻留表, 相同的字符串只保存一次"""
+
+    def __init__(self, strings: Iterable[str] = ()):
+        self.strings: List[str] = list()
+        self._index: Optional[Dict[str, int]] = dict()
+        for string in strings:
+            self.intern(string)
+
+    @property
+    def index(self) -> Dict[str, int]:
+        # 从文件读入时只有在需要新增字符串时才建索引
+        if self._index is None:
+            self._index = {string: idx for idx, string in enumerate(self.strings)}
+        return self._index
+
+    def intern(self, string: str) -> int:
+        index = self.index
+        idx = index.get(string)
+        if idx is None:
+            idx = index[string] = len(self.strings)
+            self.strings.append(string)
+        return idx
+
+    def __getitem__(self, idx: int) -> str:
+        return self.strings[idx]
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def dumps(self) -> bytes:
+        if any("\0" in string for string in self.strings):
+            raise ValueError("IR 中的字符串不能包含 NUL")
+        return "\0".join(self.strings).encode("utf8")
+
+    @classmethod
+    def loads(cls, blob: bytes, count: int) -> "StringTable":
+        table = cls()
+        table.strings = blob.decode("utf8").split("\0") if count else list()
+        table._index = None
+        return table
+
+
+@dataclass
+class Ragged:
+    """变长列表的列存: 第 i 项为 ``values[offsets[i]:offsets[i + 1]]``"""
+
+    offsets: array = field(default_factory=lambda: array("I", [0]))
+    values: array = field(default_factory=lambda: array("i"))
+
+    def append(self, items: Iterable[int]):
+        self.values.extend(items)
+        self.offsets.append(len(self.values))
+
+    def __getitem__(self, idx: int) -> List[int]:
+        return self.values[self.offsets[idx]:self.offsets[idx + 1]].tolist()
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+@dataclass
+class GraphIR:
+    strings: StringTable = field(default_factory=StringTable)
+    title: int = NO_STATE
+    initial: int = NO_STATE
+    # 状态, 父状态总在子状态之前
+    parent: array = field(default_factory=lambda: array("i"))
+    name: array = field(default_factory=lambda: array("i"))
+    label: array = field(default_factory=lambda: array("i"))
+    on_enter: Ragged = field(default_factory=Ragged)
+    on_exit: Ragged = field(default_factory=Ragged)
+    # 每个状态 4 项: x, y, width, height; 没有几何信息时为空
+    geometry: array = field(default_factory=lambda: array("d"))
+    # 画布的 width, height; 为空时取所有状态的外接矩形
+    canvas: array = field(default_factory=lambda: array("d"))
+    # 转移
+    source: array = field(default_factory=lambda: array("i"))
+    dest: array = field(default_factory=lambda: array("i"))
+    trigger: array = field(default_factory=lambda: array("i"))
+    conditions: Ragged = field(default_factory=Ragged)
+    unless: Ragged = field(default_factory=Ragged)
+    _states: Optional[Dict[str, int]] = field(default=None, repr=False)
+
+    @property
+    def state_count(self) -> int:
+        return len(self.name)
+
+    @property
+    def transition_count(self) -> int:
+        return len(self.source)
+
+    @property
+    def has_geometry(self) -> bool:
+        return bool(self.state_count) and len(self.geometry) == 4 * self.state_count
+
+    def state_index(self, name: str) -> int:
+        if self._states is None:
+            self._states = {
+                self.strings[n]: idx for idx, n in enumerate(self.name)
+            }
+        return self._states[name]
+
+    def state_name(self, idx: int) -> str:
+        return self.strings[self.name[idx]]
+
+    def short_name(self, idx: int) -> str:
+        return self.state_name(idx).rsplit(STATE_SEP, 1)[-1]
+
+    def state_label(self, idx: int) -> str:
+        return self.strings[self.label[idx]]
+
+    def callbacks(self, column: Ragged, idx: int) -> List[str]:
+        return [self.strings[s] for s in column[idx]]
+
+    def bounds(self, idx: int) -> Geometry:
+        x, y, width, height = self.geometry[4 * idx:4 * idx + 4]
+        return x, y, width, height
+
+    def children(self) -> List[List[int]]:
+        result: List[List[int]] = [list() for _ in range(self.state_count)]
+        for idx, parent in enumerate(self.parent):
+            if parent != NO_STATE:
+                result[parent].append(idx)
+        return result
+
+    def add_state(
+        self,
+        name: str,
+        label: Optional[str] = None,
+        parent: int = NO_STATE,
+        on_enter: Sequence[str] = (),
+        on_exit: Sequence[str] = (),
+        geometry: Optional[Geometry] = None,
+    ) -> int:
+        if parent != NO_STATE and parent >= self.state_count:
+            raise ValueError(f"{name} 的父状态 {parent} 还没有加入")
+        intern = self.strings.intern
+        idx = self.state_count
+        self.parent.append(parent)
+        self.name.append(intern(name))
+        self.label.append(intern(name.rsplit(STATE_SEP, 1)[-1] if label is None else label))
+        self.on_enter.append(intern(f) for f in on_enter)
+        self.on_exit.append(intern(f) for f in on_exit)
+        if geometry is not None:
+            self.geometry.extend(geometry)
+        if self._states is not None:
+            self._states[name] = idx
+        return idx
+
+    def add_transition(
+        self,
+        source: int,
+        dest: int,
+        trigger: str,
+        conditions: Sequence[str] = (),
+        unless: Sequence[str] = (),
+    ) -> int:
+        intern = self.strings.intern
+        self.source.append(source)
+        self.dest.append(dest)
+        self.trigger.append(intern(trigger))
+        self.conditions.append(intern(c) for c in conditions)
+        self.unless.append(intern(u) for u in unless)
+        return self.transition_count - 1
+
+    @classmethod
+    def from_spec(
+        cls, spec: MachineSpec, geometry: Optional[Dict[str, Geometry]] = None
+    ) -> "GraphIR":
+        """MachineSpec => IR; ``geometry`` 以状态全名为 key"""
+        ir = cls()
+        ir._states = dict()
+        # spec 中的状态按层排列, 父状态一定先出现
+        for state in spec.states:
+            ir.add_state(
+                state.name.replace(spec.separator, STATE_SEP),
+                state.label,
+                NO_STATE if state.parent is None else ir.state_index(
+                    state.parent.replace(spec.separator, STATE_SEP)
+                ),
+                state.on_enter,
+                state.on_exit,
+                geometry[state.name] if geometry else None,
+            )
+        for tran in spec.transitions:
+            ir.add_transition(
+                ir.state_index(tran.source.replace(spec.separator, STATE_SEP)),
+                ir.state_index(tran.dest.replace(spec.separator, STATE_SEP)),
+                tran.trigger,
+                tran.conditions,
+                tran.unless,
+            )
+        if spec.initial is not None:
+            ir.initial = ir.state_index(spec.initial.replace(spec.separator, STATE_SEP))
+        return ir
+
+    def to_spec(self) -> MachineSpec:
+        spec = MachineSpec(
+            STATE_SEP, None if self.initial == NO_STATE else self.state_name(self.initial)
+        )
+        children = self.children()
+        for idx in range(self.state_count):
+            parent = self.parent[idx]
+            spec.states.append(
+                StateSpec(
+                    self.state_name(idx),
+                    self.state_label(idx),
+                    self.callbacks(self.on_enter, idx),
+                    self.callbacks(self.on_exit, idx),
+                    None if parent == NO_STATE else self.state_name(parent),
+                    children=[self.state_name(c) for c in children[idx]],
+                )
+            )
+        for idx in range(self.transition_count):
+            spec.transitions.append(
+                TransitionSpec(
+                    self.state_name(self.source[idx]),
+                    self.state_name(self.dest[idx]),
+                    self.strings[self.trigger[idx]],
+                    self.callbacks(self.conditions, idx),
+                    self.callbacks(self.unless, idx),
+                )
+            )
+        return spec
+
+    def to_xdot(self) -> dict:
+        """IR => graphviz json0.
+
+        复合状态输出为 cluster, 其余为节点, label 采用 transitions 的格式,
+        json2xml 读回后几何信息不变. 需要 IR 带有几何信息.
+        """
+        if not self.has_geometry:
+            raise ValueError("IR 没有几何信息, 需要先布局")
+        children = self.children()
+        compound = [idx for idx in range(self.state_count) if children[idx]]
+        simple = [idx for idx in range(self.state_count) if not children[idx]]
+        gvids = {idx: gvid for gvid, idx in enumerate(compound + simple)}
+        if len(self.canvas) == 2:
+            right, bottom = self.canvas
+        else:
+            right = max((x + w for x, _, w, _ in map(self.bounds, gvids)), default=0)
+            bottom = max((y + h for _, y, _, h in map(self.bounds, gvids)), default=0)
+
+        # json0 以 point 为单位, y 轴向上, 节点的 pos 为中心点
+        pt = GRAPHVIZ_DEFAULT_DPI / DEFAULT_DPI
+        objects = list()
+        for idx in compound:
+            x, y, width, height = self.bounds(idx)
+            objects.append(
+                dict(
+                    _gvid=gvids[idx],
+                    name="cluster_" + self.state_name(idx),
+                    label=self.xdot_label(idx),
+                    bb=",".join(
+                        f"{v * pt:.15g}"
+                        for v in (x, bottom - y - height, x + width, bottom - y)
+                    ),
+                    nodes=[gvids[c] for c in children[idx] if not children[c]],
+                    subgraphs=[gvids[c] for c in children[idx] if children[c]],
+                )
+            )
+        for idx in simple:
+            x, y, width, height = self.bounds(idx)
+            # json2xml 以 int(inch * 96) 取整, 多加半个像素避免浮点误差
+            cx, cy = (x + width / 2) * pt, (bottom - y - height / 2) * pt
+            objects.append(
+                dict(
+                    _gvid=gvids[idx],
+                    name=self.state_name(idx),
+                    label=self.xdot_label(idx),
+                    pos=f"{cx:.15g},{cy:.15g}",
+                    width=repr((width + 0.5) / DEFAULT_DPI),
+                    height=repr((height + 0.5) / DEFAULT_DPI),
+                    shape="rectangle",
+                )
+            )
+        edges = list()
+        for idx in range(self.transition_count):
+            label = self.strings[self.trigger[idx]]
+            guards = self.callbacks(self.conditions, idx)
+            guards += ["!" + u for u in self.callbacks(self.unless, idx)]
+            if guards:
+                label += " [" + " & ".join(guards) + "]"
+            edges.append(
+                dict(
+                    _gvid=idx,
+                    tail=gvids[self.source[idx]],
+                    head=gvids[self.dest[idx]],
+                    label=label,
+                )
+            )
+        title = "" if self.title == NO_STATE else self.strings[self.title]
+        return dict(
+            name=title,
+            bb=f"0,0,{right * pt:.15g},{bottom * pt:.15g}",
+            objects=objects,
+            edges=edges,
+        )
+
+    def xdot_label(self, idx: int) -> str:
+        label = self.state_label(idx)
+        on_enter = self.callbacks(self.on_enter, idx)
+        on_exit = self.callbacks(self.on_exit, idx)
+        if on_enter:
+            label += r"\l- enter:\l  + " + r"\l  + ".join(on_enter)
+        if on_exit:
+            label += r"\l- exit:\l  + " + r"\l  + ".join(on_exit)
+        return label + r"\l"
+
+    def sections(self) -> List[array]:
+        return [
+            self.parent,
+            self.name,
+            self.label,
+            self.on_enter.offsets,
+            self.on_enter.values,
+            self.on_exit.offsets,
+            self.on_exit.values,
+            self.geometry,
+            self.canvas,
+            self.source,
+            self.dest,
+            self.trigger,
+            self.conditions.offsets,
+            self.conditions.values,
+            self.unless.offsets,
+            self.unless.values,
+        ]
+
+    def dumps(self) -> bytes:
+        flags = FLAG_GEOMETRY if self.has_geometry else 0
+        chunks = [IR_HEADER.pack(IR_MAGIC, IR_VERSION, flags, self.initial, self.title)]
+        blob = self.strings.dumps()
+        chunks += [SECTION_SIZE.pack(len(self.strings)), SECTION_SIZE.pack(len(blob)), blob]
+        for column in self.sections():
+            if sys.byteorder == "big":
+                column = array(column.typecode, column)
+                column.byteswap()
+            data = column.tobytes()
+            chunks += [SECTION_SIZE.pack(len(data)), data]
+        return b"".join(chunks)
+
+    @classmethod
+    def loads(cls, data: bytes) -> "GraphIR":
+        view = memoryview(data)
+        magic, version, _, initial, title = IR_HEADER.unpack_from(view)
+        if magic != IR_MAGIC:
+            raise ValueError("不是 GVIR 文件")
+        if version != IR_VERSION:
+            raise ValueError(f"不支持的 IR 版本 {version}, 当前版本 {IR_VERSION}")
+        offset = IR_HEADER.size
+
+        def section() -> memoryview:
+            nonlocal offset
+            (size,) = SECTION_SIZE.unpack_from(view, offset)
+            offset += SECTION_SIZE.size
+            chunk = view[offset:offset + size]
+            if len(chunk) != size:
+                raise ValueError("IR 数据被截断")
+            offset += size
+            return chunk
+
+        (count,) = SECTION_SIZE.unpack_from(view, offset)
+        offset += SECTION_SIZE.size
+        ir = cls(StringTable.loads(bytes(section()), count), title, initial)
+        for column in ir.sections():
+            # 默认构造的 offsets 里已经有一个 0
+            del column[:]
+            column.frombytes(section())
+            if sys.byteorder == "big":
+                column.byteswap()
+        return ir
+
+    def save(self, filename: str):
+        with open(filename, "wb") as f:
+            f.write(self.dumps())
+
+    @classmethod
+    def load(cls, filename: str) -> "GraphIR":
+        with open(filename, "rb") as f:
+            return cls.loads(f.read())
@@ -3,13 +3,46 @@
 import argparse
 import logging
 import json
-from gvdraw.dpi import size_padding, position_paddiing, inch2pixel
+import time
+import os
+import re
+import html
+import graphviz
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from gvdraw.dpi import (
+    size_padding,
+    position_paddiing,
+    inch2pixel,
+    point2pixel,
+    GRAPHVIZ_DEFAULT_DPI,
+)
+from gvdraw.dotgraph import DotEdge, parse_dot
+from gvdraw.reduction import reduce_edges
+from gvdraw.bundle import (
+    Bundle,
+    bundle_edges,
+    DEFAULT_BUNDLE_RADIUS,
+    DEFAULT_BUNDLE_SIZE,
+)
 
 import logging
 from typing import List, Optional, Set, Union, Dict, Tuple
 from dataclasses import InitVar, field, fields, dataclass, asdict
-from jinja2 import Environment, FileSystemLoader
-from gvdraw.dpi import size_padding, position_paddiing, inch2pixel
+from gvdraw.templates import get_template
+from gvdraw.machine import MachineSpec, StateSpec, TransitionSpec, machine_graph
+from gvdraw.ir import GraphIR, IR_SUFFIX, NO_STATE
+from gvdraw.metrics import apply_sizes
+from gvdraw.watch import watch, write_if_changed
+from gvdraw.profiles import (
+    PROFILE_CHOICES,
+    LayoutRun,
+    Thresholds,
+    apply_profile,
+    count_json0,
+    resolve_profile,
+)
 
 
 def strip_label(label: str):
@@ -24,10 +57,18 @@ DEFAULT_CLUSTER_SHAPE = "rounded=0"
 DEFAULT_PARENT_NODE = "1"
 NODE_PREFIX = "nodes-"
 EDGE_PREFIX = "edges-"
+DEFAULT_EDGE_STYLE = "orthogonalEdgeStyle"
+# graphviz 的 splines 取这些值时边为直线, drawio 中不再正交路由
+STRAIGHT_SPLINES = frozenset(["line", "false"])
+STRAIGHT_EDGE_STYLE = "none"
+GHOST_PREFIX = "ghosts-"
 NEWLINE = "\\l"
+GRAPHVIZ_NEWLINE = re.compile(r"\\[nlr]")
 ENTER_TAG = "- enter:"
 EXIT_TAG = "- exit:"
 ON_CONNECTOR = "+"
+# 像素坐标, 左上角为原点
+Point = Tuple[int, int]
 
 
 def node_cell_id_offset(cell_id: str) -> str:
@@ -38,11 +79,30 @@ def edge_cell_id_offset(offset, cell_id: str) -> str:
     return str(int(cell_id) + offset)
 
 
-env = Environment(loader=FileSystemLoader("templates/"))
-layout_factory = env.get_template("Layout.xml")
-node_factory = env.get_template("Node.xml")
-edge_factory = env.get_template("Edge.xml")
-cluster_factory = env.get_template("Cluster.xml")
+LAYOUT_TEMPLATE = "Layout.xml"
+NODE_TEMPLATE = "Node.xml"
+EDGE_TEMPLATE = "Edge.xml"
+GHOST_TEMPLATE = "GhostEdge.xml"
+GENERIC_NODE_TEMPLATE = "GenericNode.xml"
+GENERIC_EDGE_TEMPLATE = "GenericEdge.xml"
+BUNDLE_TEMPLATE = "Bundle.xml"
+
+# 布局/绘制相关的 graphviz 属性, 通用模式下不带入 drawio
+GRAPHVIZ_ATTRS = frozenset(
+    """
+    _gvid _subgraph_cnt _draw_ _ldraw_ _hdraw_ _tdraw_ _hldraw_ _tldraw_
+    xdotversion name label pos width height bb lp xlp lwidth lheight head_lp
+    tail_lp head tail nodes edges subgraphs directed strict fontname fontsize
+    fontcolor color fillcolor style shape penwidth peripheries margin fixedsize
+    rank rankdir compound labeljust labelloc arrowhead arrowtail arrowsize dir
+    constraint weight minlen splines nodesep ranksep
+    """.split()
+)
+# graphviz 属性名 => drawio 自带的属性名
+DRAWIO_ATTRS = {"URL": "link", "href": "link", "tooltip": "tooltip", "id": "dot_id"}
+XML_NAME = re.compile(r"^[A-Za-z_][\w.-]*$")
+# 并行渲染时每个 worker 分到的块数
+CHUNKS_PER_JOB = 4
 
 
 @dataclass
@@ -136,16 +196,21 @@ class Node:
     parent: str = DEFAULT_PARENT_NODE
     on_enter: List[str] = field(init=False)
     on_exit: List[str] = field(init=False)
-
-    def __post_init__(self, xdot):
-        x_, y_ = xdot["pos"].split(",")
-        self.x_pos = position_paddiing(x_)
-        self.y_pos = position_paddiing(y_)
+    state: InitVar[Optional[StateSpec]] = None
+
+    def __post_init__(self, xdot, state):
+        # pos 是以 point 为单位的中心点, 换算成像素坐标下的左下角
+        x_, y_ = (float(v) for v in xdot["pos"].split(","))
+        half_width = float(xdot["width"]) * GRAPHVIZ_DEFAULT_DPI / 2
+        half_height = float(xdot["height"]) * GRAPHVIZ_DEFAULT_DPI / 2
+        self.x_pos = position_paddiing(point2pixel(x_ - half_width))
+        self.y_pos = position_paddiing(point2pixel(y_ - half_height))
         self.cell_id = NODE_PREFIX + str(xdot["_gvid"])
         self.width = inch2pixel(xdot["width"])
         self.height = inch2pixel(xdot["height"])
-        self.name = sanitize_statename(xdot["name"])
-        self.label, self.on_enter, self.on_exit = StateLabel(xdot["label"]).parse()
+        self.name, self.label, self.on_enter, self.on_exit = state_attributes(
+            xdot, state
+        )
         self.shape = (
             DEFAULT_NODE_SHAPE
             if xdot.get("shape", "retangle") == "rectangle"
@@ -158,7 +223,7 @@ class Node:
 
     def render(self) -> str:
         attrs = asdict(self)
-        return node_factory.render(**attrs)
+        return get_template(NODE_TEMPLATE).render(**attrs)
 
     @property
     def is_cluster(self) -> bool:
@@ -177,17 +242,18 @@ class Node:
 class Cluster(Node):
     shape: str = DEFAULT_CLUSTER_SHAPE
 
-    def __post_init__(self, xdot):
+    def __post_init__(self, xdot, state):
         x_start, y_start, x_end, y_end = (float(x) for x in xdot["bb"].split(","))
         self.width, self.height = (
-            size_padding(x_end - x_start),
-            size_padding(y_end - y_start),
+            size_padding(point2pixel(x_end - x_start)),
+            size_padding(point2pixel(y_end - y_start)),
         )
-        self.x_pos = position_paddiing(x_start)
-        self.y_pos = position_paddiing(y_start)
+        self.x_pos = position_paddiing(point2pixel(x_start))
+        self.y_pos = position_paddiing(point2pixel(y_start))
         self.cell_id = NODE_PREFIX + str(xdot["_gvid"])
-        self.name = sanitize_statename(xdot["name"])
-        self.label, self.on_enter, self.on_exit = StateLabel(xdot["label"]).parse()
+        self.name, self.label, self.on_enter, self.on_exit = state_attributes(
+            xdot, state
+        )
 
     def vflip(self, vcanvas: float):
         self.y_pos = vcanvas - (self.y_pos + self.height)
@@ -200,7 +266,7 @@ class Cluster(Node):
 
 @dataclass
 class Root(Cluster):
-    def __post_init__(self, xdot):
+    def __post_init__(self, xdot, state):
         pass
 
     @property
@@ -208,16 +274,51 @@ class Root(Cluster):
         return True
 
 
-def obj2node(obj: dict) -> Node:
+def state_attributes(
+    xdot: dict, state: Optional[StateSpec] = None
+) -> Tuple[str, str, List[str], List[str]]:
+    """状态的 (name, label, on_enter, on_exit), 有 spec 时不再解析 label"""
+    if state is None:
+        return (sanitize_statename(xdot["name"]), *StateLabel(xdot["label"]).parse())
+    *_, name = state.name.split(STATE_SEP)
+    return name, state.label, state.on_enter.copy(), state.on_exit.copy()
+
+
+def obj2node(obj: dict, state: Optional[StateSpec] = None) -> Node:
     if is_cluster_root(obj["name"]):
         logging.info(f"{obj['_gvid']} : Root")
-        return Root(obj)
+        return Root(obj, state=state)
     elif is_cluster(obj["name"]):
         logging.info(f"{obj['_gvid']} : Cluster")
-        return Cluster(obj)
+        return Cluster(obj, state=state)
     else:
         logging.info(f"{obj['_gvid']} : Node")
-        return Node(obj)
+        return Node(obj, state=state)
+
+
+def state_of(name: str) -> str:
+    """json0 对象名对应的状态全名, cluster 去掉前缀"""
+    if is_cluster(name) and not is_cluster_root(name):
+        return name[len("cluster_"):]
+    return name
+
+
+def parse_point(pos: str) -> Point:
+    """point 单位的 "x,y" => 像素, y 仍向上"""
+    x, y = pos.split(",")[-2:]
+    return point2pixel(x), point2pixel(y)
+
+
+def parse_spline(pos: str) -> Tuple[List[Point], Optional[Point]]:
+    """边的 pos => (B 样条控制点, 箭头尖端), 多段时只取第一段"""
+    spline: List[Point] = list()
+    arrow = None
+    for item in pos.split(";")[0].split():
+        if item.startswith("e,"):
+            arrow = parse_point(item)
+        elif not item.startswith("s,"):
+            spline.append(parse_point(item))
+    return spline, arrow
 
 
 @dataclass
@@ -229,18 +330,51 @@ class Edge:
     target: str = field(init=False)
     conditions: List[str] = field(init=False)
     unless: List[str] = field(init=False)
-    edge_style: str = "orthogonalEdgeStyle"
-
-    def __post_init__(self, xdot):
+    edge_style: str = DEFAULT_EDGE_STYLE
+    # graphviz 给出的路径, 像素坐标, 只用于 SVG 预览, drawio 自己连线
+    spline: List[Point] = field(init=False, repr=False)
+    arrow: Optional[Point] = field(init=False, repr=False)
+    label_pos: Optional[Point] = field(init=False, repr=False)
+    transition: InitVar[Optional[TransitionSpec]] = None
+
+    def __post_init__(self, xdot, transition):
         self.cell_id = EDGE_PREFIX + str(xdot["_gvid"])
         self.source = NODE_PREFIX + str(xdot["tail"])
         self.target = NODE_PREFIX + str(xdot["head"])
-        self.label, self.conditions, self.unless = TransitionLabel(
-            xdot["label"]
-        ).parse()
+        self.spline, self.arrow = parse_spline(xdot.get("pos", ""))
+        self.label_pos = parse_point(xdot["lp"]) if "lp" in xdot else None
+        if transition is None:
+            self.label, self.conditions, self.unless = TransitionLabel(
+                xdot["label"]
+            ).parse()
+            return
+        self.label = transition.trigger
+        self.conditions = transition.conditions.copy()
+        self.unless = transition.unless.copy()
+
+    def vflip(self, vcanvas: float):
+        self.spline = [(x, vcanvas - y) for x, y in self.spline]
+        if self.arrow is not None:
+            self.arrow = (self.arrow[0], vcanvas - self.arrow[1])
+        if self.label_pos is not None:
+            self.label_pos = (self.label_pos[0], vcanvas - self.label_pos[1])
+        return self
 
     def render(self) -> str:
-        return edge_factory.render(**asdict(self))
+        return get_template(EDGE_TEMPLATE).render(**asdict(self))
+
+
+@dataclass
+class GhostEdge:
+    """被传递约简去掉的边, 布局之后以虚线或隐藏的形式补画"""
+
+    cell_id: str
+    source: str
+    target: str
+    hidden: bool = False
+
+    def render(self) -> str:
+        return get_template(GHOST_TEMPLATE).render(**asdict(self))
 
 
 @dataclass
@@ -253,16 +387,44 @@ class Layout:
     title: str = field(init=False)
     nodes: List[Node] = field(init=False)
     edges: List[Edge] = field(init=False)
-
-    def __post_init__(self, xdot):
-        self.nodes, self.edges = list(), list()
+    ghosts: List[GhostEdge] = field(init=False)
+    bundles: List[Bundle] = field(init=False)
+    # 已经并入 bundle 的边, 渲染时不再单独输出
+    merged: Set[str] = field(init=False)
+    cells: Dict[str, str] = field(init=False, repr=False)
+    generic: InitVar[bool] = False
+    spec: InitVar[Optional[MachineSpec]] = None
+
+    def __post_init__(self, xdot, generic, spec):
+        self.nodes, self.edges, self.ghosts = list(), list(), list()
+        self.bundles, self.merged = list(), set()
+        self.cells = {
+            obj["name"]: NODE_PREFIX + str(obj["_gvid"]) for obj in xdot["objects"]
+        }
         self.title = xdot["name"]
         x_start, y_start, x_end, y_end = (float(x) for x in xdot["bb"].split(","))
         self.width, self.height = (
-            size_padding(x_end - x_start),
-            size_padding(y_end - y_start),
+            size_padding(point2pixel(x_end - x_start)),
+            size_padding(point2pixel(y_end - y_start)),
         )
         self.x_pos, self.y_pos = 0, 0
+        edge_style = (
+            STRAIGHT_EDGE_STYLE
+            if xdot.get("splines") in STRAIGHT_SPLINES
+            else DEFAULT_EDGE_STYLE
+        )
+
+        if generic:
+            self.nodes = [
+                GenericNode(obj).vflip(self.height)
+                for obj in xdot["objects"]
+                if "pos" in obj or ("bb" in obj and is_cluster(obj["name"]))
+            ]
+            self.edges = [GenericEdge(edg) for edg in xdot.get("edges", [])]
+            return
+        if spec is not None:
+            self.join_spec(xdot, spec, edge_style)
+            return
 
         for obj in xdot["objects"]:
             node = obj2node(obj)
@@ -271,18 +433,303 @@ class Layout:
             self.nodes.append(node.vflip(self.height))
 
         for edg in xdot["edges"]:
-            edge = Edge(edg)
-            self.edges.append(edge)
-
-    def render(self) -> str:
+            edge = Edge(edg, edge_style=edge_style)
+            self.edges.append(edge.vflip(self.height))
+
+    def join_spec(
+        self, xdot: dict, spec: MachineSpec, edge_style: str = DEFAULT_EDGE_STYLE
+    ):
+        """几何取自 graphviz 布局, 状态和转移取自 spec, 以状态全名关联"""
+        states = spec.state_map()
+        gvids: Dict[str, int] = dict()
+        for obj in xdot["objects"]:
+            if is_cluster_root(obj["name"]) or obj.get("shape") == "point":
+                continue
+            name = state_of(obj["name"])
+            state = states.get(name)
+            if state is None:
+                logging.warning(f"{obj['name']} 不是 machine 中的状态")
+                continue
+            gvids[name] = obj["_gvid"]
+            self.nodes.append(obj2node(obj, state).vflip(self.height))
+
+        # 布局给出的路径按两端的状态对应到转移上, 同一对状态之间按顺序取
+        names = {obj["_gvid"]: state_of(obj["name"]) for obj in xdot["objects"]}
+        routes: Dict[Tuple[str, str], List[dict]] = dict()
+        for edg in reversed(xdot.get("edges", [])):
+            key = (names.get(edg["tail"]), names.get(edg["head"]))
+            routes.setdefault(key, list()).append(edg)
+
+        for idx, tran in enumerate(spec.transitions):
+            if tran.source not in gvids or tran.dest not in gvids:
+                logging.warning(f"transition {tran.source} -> {tran.dest} 没有对应的节点")
+                continue
+            xdot_edge = dict(_gvid=idx, tail=gvids[tran.source], head=gvids[tran.dest])
+            route = routes.get((tran.source, tran.dest))
+            if route:
+                geometry = route.pop()
+                xdot_edge.update(
+                    (key, geometry[key]) for key in ("pos", "lp") if key in geometry
+                )
+            edge = Edge(xdot_edge, edge_style=edge_style, transition=tran)
+            self.edges.append(edge.vflip(self.height))
+
+    @classmethod
+    def from_ir(cls, ir: GraphIR) -> "Layout":
+        return cls(ir.to_xdot(), spec=ir.to_spec())
+
+    def to_ir(self) -> GraphIR:
+        """导出状态、转移和几何信息; ghost 边不导出, 并入 bundle 的边照常导出"""
+        if any(isinstance(node, GenericNode) for node in self.nodes):
+            raise ValueError("通用模式的布局没有状态和转移, 不能导出 IR")
+        names = {
+            cell_id: state_of(name)
+            for name, cell_id in self.cells.items()
+            if not is_cluster_root(name)
+        }
+        ir = GraphIR()
+        ir.title = ir.strings.intern(self.title)
+        ir.canvas.extend((self.width, self.height))
+        nodes = {names[node.cell_id]: node for node in self.nodes}
+        added: Dict[str, int] = dict()
+
+        def add(name: str) -> int:
+            # 保持原有顺序, 只在父状态还没加入时先加父状态
+            if name in added:
+                return added[name]
+            parent, _, _ = name.rpartition(STATE_SEP)
+            parent_idx = add(parent) if parent in nodes else NO_STATE
+            node = nodes[name]
+            added[name] = ir.add_state(
+                name,
+                node.label,
+                parent_idx,
+                node.on_enter,
+                node.on_exit,
+                (node.x_pos, node.y_pos, node.width, node.height),
+            )
+            return added[name]
+
+        for name in nodes:
+            add(name)
+        for edge in self.edges:
+            ir.add_transition(
+                ir.state_index(names[edge.source]),
+                ir.state_index(names[edge.target]),
+                edge.label,
+                edge.conditions,
+                edge.unless,
+            )
+        return ir
+
+    def add_ghosts(self, edges: List[DotEdge], hidden: bool = False):
+        for idx, edg in enumerate(edges, len(self.ghosts)):
+            source, target = self.cells.get(edg.tail), self.cells.get(edg.head)
+            if not (source and target):
+                logging.warning(f"ghost edge {edg.tail} -> {edg.head} 没有对应的节点")
+                continue
+            self.ghosts.append(
+                GhostEdge(GHOST_PREFIX + str(idx), source, target, hidden)
+            )
+
+    def bundle(
+        self,
+        radius: float = DEFAULT_BUNDLE_RADIUS,
+        min_size: int = DEFAULT_BUNDLE_SIZE,
+    ):
+        """把路径相近的边合并成较少的 edge cell.
+
+        成员转移随 bundle 写进 drawio, 由 xml2src 展开; self.edges 保持
+        不变, to_ir 仍导出全部转移.
+        """
+        cells = [
+            (n.cell_id, n.x_pos, n.y_pos, n.width, n.height) for n in self.nodes
+        ]
+        edges = [(e.cell_id, e.source, e.target) for e in self.edges]
+        bundles, _ = bundle_edges(cells, edges, radius, min_size)
+        by_id = {edge.cell_id: edge for edge in self.edges}
+        for bundle in bundles:
+            bundle.transitions = [bundle_member(by_id[m]) for m in bundle.members]
+            self.merged.update(bundle.members)
+        self.bundles.extend(bundles)
+
+    def render(self, jobs: int = 1) -> str:
         params = dict()
         params["x_pos"] = self.x_pos
         params["y_pos"] = self.y_pos
         params["width"] = self.width
         params["height"] = self.height
-        params["nodes"] = "".join([node.render() for node in self.nodes])
-        params["edges"] = "".join([edge.render() for edge in self.edges])
-        return layout_factory.render(**params)
+        edges = [edge for edge in self.edges if edge.cell_id not in self.merged]
+        edges += self.bundles + self.ghosts
+        if jobs > 1:
+            nodes, edges = render_parallel([self.nodes, edges], jobs)
+            params["nodes"], params["edges"] = nodes, edges
+        else:
+            params["nodes"] = render_cells(self.nodes)
+            params["edges"] = render_cells(edges)
+        return get_template(LAYOUT_TEMPLATE).render(**params)
+
+
+def bundle_member(edge) -> dict:
+    """bundle 的 transitions 属性中的一项, 通用模式的边没有条件, 带原有属性"""
+    member = dict(id=edge.cell_id, label=edge.label, source=edge.source)
+    member["target"] = edge.target
+    for key in ("conditions", "unless"):
+        if getattr(edge, key, None):
+            member[key] = getattr(edge, key)
+    if getattr(edge, "attrs", None):
+        member["attrs"] = dict(edge.attrs)
+    return member
+
+
+def render_cell(cell) -> str:
+    if isinstance(cell, Bundle):
+        transitions = json.dumps(cell.transitions, ensure_ascii=False)
+        return get_template(BUNDLE_TEMPLATE).render(
+            **asdict(cell), transitions_json=transitions
+        )
+    return cell.render()
+
+
+def render_cells(cells: list) -> str:
+    return "".join([render_cell(cell) for cell in cells])
+
+
+def render_parallel(groups: List[list], jobs: int) -> List[str]:
+    """把每组 cell 切块, 在多个进程里渲染成 XML 片段, 再按原顺序拼接.
+
+    worker 由 fork 创建, 直接继承父进程中的 cell, 任务只传下标范围,
+    父进程不再逐个 pickle cell. 不支持 fork 的平台退回单进程渲染.
+    """
+    if "fork" not in multiprocessing.get_all_start_methods():
+        logging.warning("当前平台不支持 fork, 按单进程渲染")
+        return [render_cells(cells) for cells in groups]
+    total = sum(len(cells) for cells in groups)
+    size = max(1, -(-total // (jobs * CHUNKS_PER_JOB)))
+    ranges = [
+        (gid, start, start + size)
+        for gid, cells in enumerate(groups)
+        for start in range(0, len(cells), size)
+    ]
+    results = [list() for _ in groups]
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=inherit_cells,
+        initargs=(groups,),
+    ) as executor:
+        for (gid, *_), fragment in zip(ranges, executor.map(render_range, ranges)):
+            results[gid].append(fragment)
+    return ["".join(fragments) for fragments in results]
+
+
+# worker 进程从父进程继承的 cell, 只在 worker 中由 inherit_cells 设置
+_inherited: List[list] = list()
+
+
+def inherit_cells(groups: List[list]):
+    global _inherited
+    _inherited = groups
+
+
+def render_range(task: Tuple[int, int, int]) -> str:
+    gid, start, stop = task
+    return render_cells(_inherited[gid][start:stop])
+
+
+def generic_label(label: str, name: str) -> str:
+    """graphviz 的 \\N 与换行转义 => drawio html label"""
+    label = label.replace("\\N", name)
+    lines = [html.escape(line) for line in GRAPHVIZ_NEWLINE.split(label)]
+    while len(lines) > 1 and not lines[-1]:
+        lines.pop()
+    return "<br>".join(lines)
+
+
+def generic_attrs(xdot: dict) -> Dict[str, str]:
+    """DOT 属性转成 drawio object 的属性.
+
+    多个 DOT 属性映射到同一个 drawio 属性时取 DRAWIO_ATTRS 中靠前的 (URL 优先于 href),
+    映射来的属性不会被同名的自定义属性覆盖.
+    """
+    attrs = dict()
+    for key, value in xdot.items():
+        if key in GRAPHVIZ_ATTRS or key in DRAWIO_ATTRS or not isinstance(value, str):
+            continue
+        if XML_NAME.match(key):
+            attrs[key] = value
+    mapped = dict()
+    for key, name in DRAWIO_ATTRS.items():
+        if isinstance(xdot.get(key), str):
+            mapped.setdefault(name, xdot[key])
+    attrs.update(mapped)
+    return attrs
+
+
+@dataclass
+class GenericNode:
+    """通用模式下的节点或 cluster: 不解析状态机的命名和 label 约定.
+
+    几何换算与 Node, Cluster 相同: point 换算成像素, 再由 vflip 翻转 y 轴.
+    """
+
+    xdot: InitVar[dict]
+    cell_id: str = field(init=False)
+    name: str = field(init=False)
+    label: str = field(init=False)
+    x_pos: float = field(init=False)
+    y_pos: float = field(init=False)
+    width: float = field(init=False)
+    height: float = field(init=False)
+    container: bool = field(init=False)
+    attrs: Dict[str, str] = field(init=False)
+    parent: str = DEFAULT_PARENT_NODE
+
+    def __post_init__(self, xdot: dict):
+        self.cell_id = NODE_PREFIX + str(xdot["_gvid"])
+        self.name = xdot["name"]
+        self.label = generic_label(xdot.get("label", "\\N"), self.name)
+        self.attrs = generic_attrs(xdot)
+        self.container = "bb" in xdot
+        if self.container:
+            x_start, y_start, x_end, y_end = (float(x) for x in xdot["bb"].split(","))
+            self.width = size_padding(point2pixel(x_end - x_start))
+            self.height = size_padding(point2pixel(y_end - y_start))
+        else:
+            x_, y_ = (float(v) for v in xdot["pos"].split(","))
+            x_start = x_ - float(xdot["width"]) * GRAPHVIZ_DEFAULT_DPI / 2
+            y_start = y_ - float(xdot["height"]) * GRAPHVIZ_DEFAULT_DPI / 2
+            self.width = inch2pixel(xdot["width"])
+            self.height = inch2pixel(xdot["height"])
+        self.x_pos = position_paddiing(point2pixel(x_start))
+        self.y_pos = position_paddiing(point2pixel(y_start))
+
+    def vflip(self, vcanvas: float):
+        self.y_pos = vcanvas - (self.y_pos + self.height)
+        return self
+
+    def render(self) -> str:
+        return get_template(GENERIC_NODE_TEMPLATE).render(**self.__dict__)
+
+
+@dataclass
+class GenericEdge:
+    xdot: InitVar[dict]
+    cell_id: str = field(init=False)
+    label: str = field(init=False)
+    source: str = field(init=False)
+    target: str = field(init=False)
+    attrs: Dict[str, str] = field(init=False)
+
+    def __post_init__(self, xdot: dict):
+        self.cell_id = EDGE_PREFIX + str(xdot["_gvid"])
+        self.source = NODE_PREFIX + str(xdot["tail"])
+        self.target = NODE_PREFIX + str(xdot["head"])
+        self.label = generic_label(xdot.get("label", ""), "")
+        self.attrs = generic_attrs(xdot)
+
+    def render(self) -> str:
+        return get_template(GENERIC_EDGE_TEMPLATE).render(**self.__dict__)
 
 
 @dataclass
@@ -292,41 +739,163 @@ class State:
     substates: List["State"] = field(default_factory=list)
 
 
+def merge_labels(target: dict, label: dict) -> dict:
+    """把带条件和回调的 label 合并进不带这些信息的布局结果"""
+    for dest, src in zip(target["objects"], label["objects"]):
+        dest["label"] = src["label"]
+    for dest, src in zip(target.get("edges", []), label.get("edges", [])):
+        dest["label"] = src["label"]
+    return target
+
+
 def draw2json(machine, filename: str):
-    model = machine.model
-    machine.show_conditions = False
-    machine.show_state_attributes = False
-    model.get_graph().draw(f"{filename}.json0", prog="dot")
-    model.get_graph().draw(f"{filename}.png", prog="dot")
-    machine.show_conditions = True
-    machine.show_state_attributes = True
-    model.get_graph().draw(f".{filename}.json0", prog="dot")
+    """布局结果写入 json0, 预览图直接由布局结果生成 SVG, 不再调用一次 dot"""
+    from gvdraw.svg import SVG_SUFFIX, save_svg
+
+    graph = machine_graph(machine)
+    graph.draw(f"{filename}.json0", prog="dot")
+    machine_graph(machine, True, True).draw(f".{filename}.json0", prog="dot")
     with open(f"{filename}.json0", "r+") as t:
         with open(f".{filename}.json0", "r") as f:
-            target = json.loads(t.read())
-            label = json.loads(f.read())
-            for dest, src in zip(target["objects"], label["objects"]):
-                dest["label"] = src["label"]
-            for dest, src in zip(target["edges"], label["edges"]):
-                dest["label"] = src["label"]
+            target = merge_labels(json.loads(t.read()), json.loads(f.read()))
         t.seek(0)
         t.truncate(0)
         t.write(json.dumps(target, indent=4))
+    save_svg(Layout(target), f"{filename}{SVG_SUFFIX}")
+
+
+def dot2json(
+    source: str,
+    reduce: bool = False,
+    prog: str = "dot",
+    profile: Optional[str] = None,
+    thresholds: Optional[Thresholds] = None,
+    measure: bool = False,
+) -> Tuple[dict, List[DotEdge]]:
+    """布局 DOT 源码, 返回 json0 以及被传递约简去掉的边.
+
+    ``profile`` 为 gvdraw.profiles 中的档位或 auto, 给出时忽略 ``prog``.
+    ``measure`` 时先用 gvdraw.metrics 算出节点尺寸并固定下来.
+    """
+    removed: List[DotEdge] = list()
+    graph = parse_dot(source) if reduce or profile or measure else None
+    if measure:
+        apply_sizes(graph)
+    if reduce:
+        edges = graph.edges
+        keep = reduce_edges([(edg.tail, edg.head) for edg in edges])
+        removed = [edg for edg, kept in zip(edges, keep) if not kept]
+        graph.remove_edges(removed)
+    if graph is not None:
+        chosen = resolve_profile(
+            profile, len(graph.nodes), len(graph.edges), thresholds, prog
+        )
+        source = apply_profile(graph, chosen).source
+    else:
+        chosen = resolve_profile(None, 0, 0, prog=prog)
+    start = time.perf_counter()
+    result = graphviz.Source(source, engine=chosen.prog).pipe(format="json0")
+    xdot = json.loads(result.decode("utf8"))
+    nodes, edges_count = count_json0(xdot)
+    run = LayoutRun(
+        chosen.name, chosen.prog, nodes, edges_count, time.perf_counter() - start
+    )
+    return run.record(xdot), removed
+
+
+def convert_file(src: str, args: argparse.Namespace):
+    filebasename, ext = os.path.splitext(src)
+    logging.info(f"{src} => {filebasename}.xml")
+    removed: List[DotEdge] = list()
+    if ext == IR_SUFFIX:
+        layout = Layout.from_ir(GraphIR.load(src))
+    else:
+        with open(f"{src}", "r") as f:
+            if ext in (".dot", ".gv"):
+                xdot, removed = dot2json(
+                    f.read(),
+                    reduce=args.reduce,
+                    profile=args.profile,
+                    thresholds=args.thresholds,
+                    measure=args.measure,
+                )
+            else:
+                xdot = json.loads(f.read())
+        layout = Layout(xdot, generic=args.generic)
+    if args.ir and ext != IR_SUFFIX:
+        layout.to_ir().save(f"{filebasename}{IR_SUFFIX}")
+    if args.ghosts != "none":
+        layout.add_ghosts(removed, hidden=args.ghosts == "hidden")
+    if args.bundle:
+        layout.bundle(args.bundle_radius)
+    result = layout.render(jobs=args.jobs)
+    logging.debug(f"{result}")
+    write_if_changed(f"{filebasename}.xml", result)
+    if args.svg:
+        if args.generic:
+            logging.warning(f"通用模式不支持 SVG 预览, 跳过 {src}")
+            return
+        from gvdraw.svg import SVG_SUFFIX, save_svg
+
+        save_svg(layout, f"{filebasename}{SVG_SUFFIX}")
 
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("src")
+    parser.add_argument("src", nargs="+")
+    parser.add_argument(
+        "--reduce", action="store_true", help="布局前先做传递约简 (仅 DOT 输入)"
+    )
+    parser.add_argument(
+        "--ghosts",
+        choices=("none", "dashed", "hidden"),
+        default="none",
+        help="补画被约简掉的边",
+    )
+    parser.add_argument(
+        "--generic", action="store_true", help="通用 DOT 图, 不按状态机约定解析"
+    )
+    parser.add_argument(
+        "--bundle", action="store_true", help="合并路径相近的边"
+    )
+    parser.add_argument("--jobs", type=int, default=1, help="并行渲染的进程数")
+    parser.add_argument(
+        "--bundle-radius", type=float, default=DEFAULT_BUNDLE_RADIUS
+    )
+    parser.add_argument(
+        "--ir", action="store_true", help=f"同时导出 {IR_SUFFIX} 中间表示"
+    )
+    parser.add_argument(
+        "--profile",
+        choices=PROFILE_CHOICES,
+        help="布局档位 (仅 DOT 输入), auto 按图的规模选择; 默认为 dot 的默认设置",
+    )
+    parser.add_argument(
+        "--thresholds",
+        type=Thresholds.parse,
+        default=Thresholds(),
+        help="auto 的阈值, 如 balanced=300/1000,fast=2000/6000 (节点数/边数)",
+    )
+    parser.add_argument(
+        "--measure",
+        action="store_true",
+        help="按内置的字宽表算出节点尺寸并固定, dot 不再测量文字 (仅 DOT 输入)",
+    )
+    parser.add_argument(
+        "--svg",
+        action="store_true",
+        help="同时由布局结果直接写出 .svg 预览, 不经过 drawio 或 graphviz",
+    )
+    parser.add_argument(
+        "--watch", action="store_true", help="监视输入文件, 变化后重新生成"
+    )
     args = parser.parse_args()
-    filebasename, *_ = args.src.split(".json0")
-    logging.info(f"{args.src} => {filebasename}.xml")
-    with open(f"{args.src}", "r") as f:
-        xdot = json.loads(f.read())
-        layout = Layout(xdot)
-        logging.info(f"{layout.render()}")
-        with open(f"{filebasename}.xml", "w") as toxml:
-            toxml.write(layout.render())
-
+    if args.generic and args.ir:
+        parser.error("--ir 只支持状态机, 不能与 --generic 同时使用")
+    for src in args.src:
+        convert_file(src, args)
+    if args.watch:
+        watch({src: partial(convert_file, args=args) for src in args.src})
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,549 @@
+"""进程内的分层 (Sugiyama) 布局.
+
+对 20~200 个状态的状态机, 调用 dot 的开销主要在进程启动和 DOT/JSON
+的序列化上. 这里直接在 python 里完成布局, 输出与 ``dot -Tjson0`` 形状
+相同的 json0, ``json2xml.Layout`` 和 ``sketchpad.LayoutImportVisitor``
+都可以直接读取.
+
+复合状态自底向上递归布局: 先布局子状态得到尺寸, 再把子状态当作普通
+节点参与父状态内部的分层. 跨层级的转移被提升到两端状态的最近公共祖先
+内部参与分层, 路由时再连回真实的端点.
+
+与 dot 输出的差异: 不生成 ``cluster_X_root`` 和其中的 point 节点,
+指向复合状态的边直接以 cluster 的 _gvid 作为 tail/head.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from gvdraw.machine import MachineSpec
+from gvdraw.metrics import NEWLINE, Size, node_size, text_size
+
+logger = logging.getLogger(__name__)
+
+Point = Tuple[float, float]
+
+POINTS_PER_INCH = 72
+CLUSTER_MARGIN = 8
+NODESEP = 18
+RANKSEP = 36
+# graphviz 的 rankdir 取值; LayeredGraph 按 TB 排布, 其余方向由它转置或镜像得到
+RANKDIRS = ("TB", "LR", "BT", "RL")
+ORDER_SWEEPS = 24
+POSITION_SWEEPS = 8
+
+GRAPH_STYLE = dict(color="black", fillcolor="white", style="solid")
+NODE_STYLE = dict(
+    color="black", fillcolor="white", style="rounded,filled", peripheries="1"
+)
+
+
+def count_inversions(values: Sequence[int]) -> int:
+    """values 中逆序对的个数, 用树状数组计数"""
+    if not values:
+        return 0
+    size = max(values) + 2
+    tree = [0] * (size + 1)
+    inversions = 0
+    for seen, value in enumerate(values):
+        # 已经出现且大于 value 的个数
+        idx, smaller = value + 1, 0
+        while idx > 0:
+            smaller += tree[idx]
+            idx -= idx & -idx
+        inversions += seen - smaller
+        idx = value + 1
+        while idx <= size:
+            tree[idx] += 1
+            idx += idx & -idx
+    return inversions
+
+
+@dataclass
+class LayeredGraph:
+    """一个层级内部的分层布局, 坐标系为 TB: 层沿 y 向下排列"""
+
+    sizes: List[Size]
+    edges: List[Tuple[int, int]]
+    labels: List[Size] = field(default_factory=list)
+    nodesep: float = NODESEP
+    ranksep: float = RANKSEP
+    # 以下为布局结果
+    centers: List[Point] = field(init=False)
+    routes: List[List[Point]] = field(init=False)
+    width: float = field(init=False)
+    height: float = field(init=False)
+
+    def __post_init__(self):
+        n = len(self.sizes)
+        if not self.labels:
+            self.labels = [(0.0, 0.0)] * len(self.edges)
+        arcs, self.reversed = self.acyclic(n)
+        rank = self.rank(n, arcs)
+        layers, chains = self.expand(n, rank, arcs)
+        self.order(layers)
+        self.position(layers, chains)
+
+    def acyclic(self, n: int) -> Tuple[List[Tuple[int, int]], List[bool]]:
+        """DFS 找回边并反转, 自环不参与分层"""
+        succ: List[List[int]] = [list() for _ in range(n)]
+        for idx, (u, v) in enumerate(self.edges):
+            if u != v:
+                succ[u].append(idx)
+        state = [0] * n
+        back = [False] * len(self.edges)
+        for root in range(n):
+            if state[root]:
+                continue
+            state[root] = 1
+            stack = [(root, iter(succ[root]))]
+            while stack:
+                node, it = stack[-1]
+                for idx in it:
+                    head = self.edges[idx][1]
+                    if state[head] == 1:
+                        back[idx] = True
+                    elif not state[head]:
+                        state[head] = 1
+                        stack.append((head, iter(succ[head])))
+                        break
+                else:
+                    state[node] = 2
+                    stack.pop()
+        arcs = [
+            (v, u) if back[idx] else (u, v)
+            for idx, (u, v) in enumerate(self.edges)
+        ]
+        return arcs, back
+
+    def rank(self, n: int, arcs: List[Tuple[int, int]]) -> List[int]:
+        """最长路径分层, 再把没有入边的节点下移贴近它的后继"""
+        succ: List[List[int]] = [list() for _ in range(n)]
+        indegree = [0] * n
+        for u, v in arcs:
+            if u != v:
+                succ[u].append(v)
+                indegree[v] += 1
+        rank = [0] * n
+        queue = [v for v in range(n) if not indegree[v]]
+        sources = set(queue)
+        for u in queue:
+            for v in succ[u]:
+                rank[v] = max(rank[v], rank[u] + 1)
+                indegree[v] -= 1
+                if not indegree[v]:
+                    queue.append(v)
+        for u in sources:
+            if succ[u]:
+                rank[u] = min(rank[v] for v in succ[u]) - 1
+        lowest = min(rank, default=0)
+        return [r - lowest for r in rank]
+
+    def expand(
+        self, n: int, rank: List[int], arcs: List[Tuple[int, int]]
+    ) -> Tuple[List[List[int]], List[List[int]]]:
+        """跨越多层的边拆成虚节点链, 返回每层的节点和每条边经过的节点"""
+        self.rank_of = list(rank)
+        self.node_sizes = list(self.sizes)
+        chains: List[List[int]] = list()
+        for u, v in arcs:
+            chain = [u]
+            for r in range(rank[u] + 1, rank[v]):
+                self.rank_of.append(r)
+                self.node_sizes.append((0.0, 0.0))
+                chain.append(len(self.node_sizes) - 1)
+            chain.append(v)
+            chains.append(chain)
+        depth = max(self.rank_of, default=-1) + 1
+        layers: List[List[int]] = [list() for _ in range(depth)]
+        for node, r in enumerate(self.rank_of):
+            layers[r].append(node)
+        self.up: List[List[int]] = [list() for _ in self.node_sizes]
+        self.down: List[List[int]] = [list() for _ in self.node_sizes]
+        for chain in chains:
+            for a, b in zip(chain, chain[1:]):
+                if a != b:
+                    self.down[a].append(b)
+                    self.up[b].append(a)
+        return layers, chains
+
+    def crossings(self, layers: List[List[int]], pos: List[int]) -> int:
+        total = 0
+        for layer in layers[:-1]:
+            pairs = sorted(
+                (pos[a], pos[b]) for a in layer for b in self.down[a]
+            )
+            total += count_inversions([b for _, b in pairs])
+        return total
+
+    def order(self, layers: List[List[int]]):
+        """重心法上下交替扫描, 保留交叉最少的顺序"""
+        pos = [0] * len(self.node_sizes)
+        for layer in layers:
+            for idx, node in enumerate(layer):
+                pos[node] = idx
+        best, best_layers = self.crossings(layers, pos), [list(l) for l in layers]
+        for sweep in range(ORDER_SWEEPS):
+            if not best:
+                break
+            downward = sweep % 2 == 0
+            sequence = layers[1:] if downward else layers[-2::-1]
+            for layer in sequence:
+                def barycenter(node: int) -> float:
+                    adjacent = self.up[node] if downward else self.down[node]
+                    if not adjacent:
+                        return pos[node]
+                    return sum(pos[a] for a in adjacent) / len(adjacent)
+
+                layer.sort(key=barycenter)
+                for idx, node in enumerate(layer):
+                    pos[node] = idx
+            count = self.crossings(layers, pos)
+            if count < best:
+                best, best_layers = count, [list(l) for l in layers]
+        layers[:] = best_layers
+        self.crossing_count = best
+
+    def position(self, layers: List[List[int]], chains: List[List[int]]):
+        sizes = self.node_sizes
+        x = [0.0] * len(sizes)
+
+        def gap(a: int, b: int) -> float:
+            return (sizes[a][0] + sizes[b][0]) / 2 + self.nodesep
+
+        for layer in layers:
+            for a, b in zip(layer, layer[1:]):
+                x[b] = x[a] + gap(a, b)
+
+        # 向相邻层邻居的平均位置靠拢, 同时保持层内顺序和最小间距
+        for sweep in range(POSITION_SWEEPS):
+            downward = sweep % 2 == 0
+            for layer in layers if downward else layers[::-1]:
+                desired = list()
+                for node in layer:
+                    adjacent = self.up[node] if downward else self.down[node]
+                    adjacent = adjacent or self.down[node] or self.up[node]
+                    desired.append(
+                        sum(x[a] for a in adjacent) / len(adjacent)
+                        if adjacent
+                        else x[node]
+                    )
+                left = list(desired)
+                for i in range(1, len(layer)):
+                    left[i] = max(left[i], left[i - 1] + gap(layer[i - 1], layer[i]))
+                right = list(desired)
+                for i in range(len(layer) - 2, -1, -1):
+                    right[i] = min(right[i], right[i + 1] - gap(layer[i], layer[i + 1]))
+                placed = [(l + r) / 2 for l, r in zip(left, right)]
+                for i in range(1, len(layer)):
+                    placed[i] = max(placed[i], placed[i - 1] + gap(layer[i - 1], layer[i]))
+                for node, value in zip(layer, placed):
+                    x[node] = value
+
+        lefts = [x[n] - sizes[n][0] / 2 for layer in layers for n in layer]
+        shift = -min(lefts, default=0.0)
+        self.width = max(
+            (x[n] + sizes[n][0] / 2 + shift for layer in layers for n in layer),
+            default=0.0,
+        )
+
+        # 层间距再加上跨过这一层间隙的边标签高度
+        label_gap = [0.0] * len(layers)
+        for (u, _), chain, label in zip(self.edges, chains, self.labels):
+            for a in chain[:-1]:
+                r = self.rank_of[a]
+                label_gap[r] = max(label_gap[r], label[1])
+        y, top = [0.0] * len(sizes), 0.0
+        for r, layer in enumerate(layers):
+            height = max((sizes[n][1] for n in layer), default=0.0)
+            for node in layer:
+                y[node] = top + height / 2
+            top += height + self.ranksep + label_gap[r]
+        self.height = max(top - self.ranksep - (label_gap[-1] if layers else 0), 0.0)
+
+        points = [(x[n] + shift, y[n]) for n in range(len(sizes))]
+        self.centers = points[: len(self.sizes)]
+        self.routes = list()
+        for idx, chain in enumerate(chains):
+            route = [points[n] for n in chain[1:-1]]
+            self.routes.append(route[::-1] if self.reversed[idx] else route)
+
+
+@dataclass
+class Box:
+    """布局中的一个状态, 坐标为左上角, y 向下, 单位 point"""
+
+    name: str
+    label: str
+    width: float = 0.0
+    height: float = 0.0
+    x: float = 0.0
+    y: float = 0.0
+    children: List["Box"] = field(default_factory=list)
+    compound: bool = False
+
+
+class MachineLayout:
+    """MachineSpec => json0"""
+
+    # 与 graphviz 一致, cluster 的 nodes 包含所有后代节点
+    NESTED_NODES = True
+
+    def __init__(
+        self, spec: MachineSpec, rankdir: str = "LR", title: str = "State Machine"
+    ):
+        self.spec = spec
+        self.rankdir = rankdir.upper()
+        if self.rankdir not in RANKDIRS:
+            raise ValueError(f"rankdir 只能是 {', '.join(RANKDIRS)}: {rankdir}")
+        self.title = title
+        states = spec.state_map()
+        self.boxes: Dict[str, Box] = dict()
+        self.routes: Dict[int, List[Point]] = dict()
+        self.crossing_count = 0
+        self.lifted = self.lift(states)
+        roots = [s.name for s in spec.states if s.parent is None]
+        self.root = self.build(None, roots, states)
+        self.place(self.root, 0.0, 0.0)
+
+    def ancestors(self, name: str, states) -> List[Optional[str]]:
+        path: List[Optional[str]] = [name]
+        while path[-1] is not None:
+            path.append(states[path[-1]].parent)
+        return path[::-1]
+
+    def lift(self, states) -> Dict[Optional[str], List[Tuple[int, str, str]]]:
+        """把每条转移放进两端最近公共祖先的内部, 端点提升为该祖先的直接子状态"""
+        lifted: Dict[Optional[str], List[Tuple[int, str, str]]] = dict()
+        for idx, tran in enumerate(self.spec.transitions):
+            src = self.ancestors(tran.source, states)
+            dst = self.ancestors(tran.dest, states)
+            depth = 0
+            while (
+                depth + 1 < min(len(src), len(dst))
+                and src[depth + 1] == dst[depth + 1]
+                and src[depth + 1] not in (tran.source, tran.dest)
+            ):
+                depth += 1
+            tail = src[depth + 1] if depth + 1 < len(src) else tran.source
+            head = dst[depth + 1] if depth + 1 < len(dst) else tran.dest
+            lifted.setdefault(src[depth], list()).append((idx, tail, head))
+        return lifted
+
+    def transpose(self, size: Size) -> Size:
+        return size if self.rankdir in ("TB", "BT") else (size[1], size[0])
+
+    def orient(self, point: Point, width: float, height: float) -> Point:
+        """LayeredGraph 中 TB 方向的坐标 => rankdir 方向, width, height 为转换后的尺寸"""
+        x, y = self.transpose(point)
+        if self.rankdir == "RL":
+            x = width - x
+        elif self.rankdir == "BT":
+            y = height - y
+        return x, y
+
+    def build(self, name: Optional[str], children: List[str], states) -> Box:
+        label = "" if name is None else states[name].label
+        box = Box(name or "", label, compound=name is not None)
+        for child in children:
+            if states[child].children:
+                sub = self.build(child, states[child].children, states)
+            else:
+                width, height = node_size(states[child].label + NEWLINE)
+                sub = Box(child, states[child].label, width, height)
+            self.boxes[child] = sub
+            box.children.append(sub)
+
+        index = {child.name: idx for idx, child in enumerate(box.children)}
+        local = self.lifted.get(name, [])
+        graph = LayeredGraph(
+            [self.transpose((b.width, b.height)) for b in box.children],
+            [(index[tail], index[head]) for _, tail, head in local],
+            [
+                self.transpose(text_size(self.spec.transitions[idx].trigger))
+                for idx, _, _ in local
+            ],
+        )
+        label_height = text_size(label)[1] if label else 0.0
+        offset = (CLUSTER_MARGIN, CLUSTER_MARGIN + label_height)
+        width, height = self.transpose((graph.width, graph.height))
+        for child, center in zip(box.children, graph.centers):
+            cx, cy = self.orient(center, width, height)
+            child.x = cx - child.width / 2 + offset[0]
+            child.y = cy - child.height / 2 + offset[1]
+        for (idx, _, _), route in zip(local, graph.routes):
+            self.routes[idx] = [
+                (x + offset[0], y + offset[1])
+                for x, y in (self.orient(p, width, height) for p in route)
+            ]
+        box.width = max(width, text_size(label)[0]) + 2 * CLUSTER_MARGIN
+        box.height = height + 2 * CLUSTER_MARGIN + label_height
+        self.crossing_count += graph.crossing_count
+        return box
+
+    def place(self, box: Box, dx: float, dy: float):
+        """子状态坐标由相对父状态改为绝对坐标, 路由点一并平移"""
+        stack = [(box, dx, dy)]
+        while stack:
+            box, dx, dy = stack.pop()
+            for child in box.children:
+                child.x += dx
+                child.y += dy
+                stack.append((child, child.x, child.y))
+            for idx, _, _ in self.lifted.get(box.name or None, []):
+                self.routes[idx] = [(x + dx, y + dy) for x, y in self.routes[idx]]
+
+    def route(self, idx: int) -> List[Point]:
+        tran = self.spec.transitions[idx]
+        src, dst = self.boxes[tran.source], self.boxes[tran.dest]
+        middle = self.routes.get(idx, [])
+        if src is dst and not middle:
+            # 自环画在节点右侧
+            x, y = src.x + src.width, src.y + src.height / 2
+            return [(x, y - 6), (x + 18, y - 12), (x + 18, y + 12), (x, y + 6)]
+        start = border(src, middle[0] if middle else center(dst))
+        end = border(dst, middle[-1] if middle else center(src))
+        return [start] + middle + [end]
+
+    def xdot(self) -> dict:
+        height = self.root.height
+        clusters: List[Box] = list()
+        nodes: List[Box] = list()
+
+        # 层级可能很深, 不用递归
+        stack = [self.root]
+        while stack:
+            box = stack.pop()
+            for child in box.children:
+                (clusters if child.compound else nodes).append(child)
+            stack.extend(c for c in reversed(box.children) if c.compound)
+        gvids = {box.name: idx for idx, box in enumerate(clusters + nodes)}
+
+        # 子 cluster 总在父 cluster 之后, 倒序即可自底向上汇总
+        leaves: Dict[str, List[int]] = dict()
+        for box in reversed(clusters):
+            result = leaves[box.name] = list()
+            for child in box.children:
+                if child.compound:
+                    if self.NESTED_NODES:
+                        result += leaves[child.name]
+                else:
+                    result.append(gvids[child.name])
+
+        def flip(point: Point) -> str:
+            return f"{point[0]:.2f},{height - point[1]:.2f}"
+
+        def bb(box: Box) -> str:
+            return (
+                f"{box.x:.2f},{height - box.y - box.height:.2f},"
+                f"{box.x + box.width:.2f},{height - box.y:.2f}"
+            )
+
+        def label_attrs(box: Box) -> dict:
+            width, lheight = text_size(box.label)
+            return dict(
+                lp=flip((box.x + box.width / 2, box.y + CLUSTER_MARGIN + lheight / 2)),
+                lwidth=f"{width / POINTS_PER_INCH:.2f}",
+                lheight=f"{lheight / POINTS_PER_INCH:.2f}",
+            )
+
+        objects = list()
+        for box in clusters:
+            objects.append(
+                dict(
+                    _gvid=gvids[box.name],
+                    name="cluster_" + box.name,
+                    label=box.label + NEWLINE,
+                    bb=bb(box),
+                    rank="source",
+                    rankdir=self.rankdir,
+                    compound="true",
+                    directed="true",
+                    strict="false",
+                    nodes=leaves[box.name],
+                    subgraphs=[gvids[c.name] for c in box.children if c.compound],
+                    edges=list(),
+                    **GRAPH_STYLE,
+                    **label_attrs(box),
+                )
+            )
+        for box in nodes:
+            objects.append(
+                dict(
+                    _gvid=gvids[box.name],
+                    name=box.name,
+                    label=box.label + NEWLINE,
+                    pos=flip(center(box)),
+                    width=f"{box.width / POINTS_PER_INCH:.4f}",
+                    height=f"{box.height / POINTS_PER_INCH:.4f}",
+                    shape="rectangle",
+                    **NODE_STYLE,
+                )
+            )
+        edges = list()
+        for idx, tran in enumerate(self.spec.transitions):
+            points = self.route(idx)
+            # 折线写成 graphviz 的三次 B 样条控制点
+            controls = [points[0]]
+            for (ax, ay), (bx, by) in zip(points, points[1:]):
+                controls += [
+                    (ax + (bx - ax) / 3, ay + (by - ay) / 3),
+                    (ax + 2 * (bx - ax) / 3, ay + 2 * (by - ay) / 3),
+                    (bx, by),
+                ]
+            mid = len(points) // 2
+            (ax, ay), (bx, by) = points[mid - 1], points[mid]
+            edges.append(
+                dict(
+                    _gvid=idx,
+                    tail=gvids[tran.source],
+                    head=gvids[tran.dest],
+                    label=tran.trigger,
+                    lp=flip(((ax + bx) / 2, (ay + by) / 2)),
+                    pos=" ".join(flip(p) for p in controls),
+                    color="black",
+                )
+            )
+        width, lheight = text_size(self.title)
+        return dict(
+            name=self.title,
+            directed="true",
+            strict="false",
+            compound="true",
+            rankdir=self.rankdir,
+            label=self.title,
+            bb=f"0,0,{self.root.width:.2f},{height:.2f}",
+            lp=flip((self.root.width / 2, lheight / 2)),
+            lwidth=f"{width / POINTS_PER_INCH:.2f}",
+            lheight=f"{lheight / POINTS_PER_INCH:.2f}",
+            _subgraph_cnt=len(clusters),
+            objects=objects,
+            edges=edges,
+            **GRAPH_STYLE,
+        )
+
+
+def center(box: Box) -> Point:
+    return box.x + box.width / 2, box.y + box.height / 2
+
+
+def border(box: Box, toward: Point) -> Point:
+    """从 box 中心指向 ``toward`` 的射线与边框的交点"""
+    cx, cy = center(box)
+    dx, dy = toward[0] - cx, toward[1] - cy
+    scales = [
+        abs(half / delta)
+        for half, delta in ((box.width / 2, dx), (box.height / 2, dy))
+        if delta
+    ]
+    scale = min(scales + [1.0])
+    return cx + dx * scale, cy + dy * scale
+
+
+def layered_layout(
+    spec: MachineSpec, rankdir: str = "LR", title: str = "State Machine"
+) -> dict:
+    layout = MachineLayout(spec, rankdir=rankdir, title=title)
+    logger.debug(f"layered layout: {layout.crossing_count} crossings")
+    return layout.xdot()
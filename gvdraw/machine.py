@@ -0,0 +1,142 @@
+import threading
+import logging
+import graphviz
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# transitions 在第一次生成 markup 时才会填充缓存, 这一步需要串行
+_markup_lock = threading.Lock()
+
+
+class MachineView:
+    """只读地覆盖 machine 的绘图开关, 其余属性全部转发给 machine 本身.
+
+    transitions 的 Graph 在生成 label 时读取 ``show_conditions`` 和
+    ``show_state_attributes``, 通过这个视图传入即可, 不必改写 machine.
+    """
+
+    def __init__(
+        self, machine, show_conditions: bool, show_state_attributes: bool
+    ):
+        self._machine = machine
+        self.show_conditions = show_conditions
+        self.show_state_attributes = show_state_attributes
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._machine, name)
+
+    def __call__(self, *args, **kwargs):
+        return self._machine(*args, **kwargs)
+
+
+def machine_graph(
+    machine, show_conditions: bool = False, show_state_attributes: bool = False
+) -> graphviz.Digraph:
+    """生成 machine 的 graphviz 图, 不修改 machine 的任何属性"""
+    view = MachineView(machine, show_conditions, show_state_attributes)
+    with _markup_lock:
+        graph = machine.graph_cls(view).get_graph()
+    return graph
+
+
+@dataclass
+class StateSpec:
+    name: str
+    label: str
+    on_enter: List[str] = field(default_factory=list)
+    on_exit: List[str] = field(default_factory=list)
+    parent: Optional[str] = None
+    initial: Optional[str] = None
+    children: List[str] = field(default_factory=list)
+    final: bool = False
+
+    @property
+    def is_compound(self) -> bool:
+        return bool(self.children)
+
+
+@dataclass
+class TransitionSpec:
+    source: str
+    dest: str
+    trigger: str
+    conditions: List[str] = field(default_factory=list)
+    unless: List[str] = field(default_factory=list)
+    internal: bool = False
+
+
+@dataclass
+class MachineSpec:
+    """从 machine 直接取出的状态树和转移, 全名以 ``separator`` 连接"""
+
+    separator: str
+    initial: Optional[str] = None
+    states: List[StateSpec] = field(default_factory=list)
+    transitions: List[TransitionSpec] = field(default_factory=list)
+
+    def state_map(self) -> Dict[str, StateSpec]:
+        return {state.name: state for state in self.states}
+
+
+def _callbacks(values) -> List[str]:
+    return [getattr(v, "__name__", None) or str(v) for v in values or []]
+
+
+def _initial_name(initial) -> Optional[str]:
+    if initial is None or isinstance(initial, list):
+        return None
+    return getattr(initial, "name", None) or str(initial)
+
+
+def extract_machine(machine) -> MachineSpec:
+    """遍历 machine 的 markup, 得到状态和转移的结构化描述.
+
+    与 transitions 生成 graphviz label 时读取的是同一份数据, 但不经过
+    label 字符串, 回调和条件里出现 ``&`` ``+`` 也不会被拆错.
+    """
+    with _markup_lock:
+        markup = machine.get_markup_config()
+    separator = machine.state_cls.separator
+    spec = MachineSpec(separator, _initial_name(markup.get("initial")))
+
+    # 与 transitions 的 _get_elements 相同, 按层广度优先, 先转移后子状态
+    queue = [([], None, markup)]
+    while queue:
+        prefix, parent, scope = queue.pop(0)
+        for tran in scope.get("transitions", []):
+            source = separator.join(prefix + [tran["source"]])
+            internal = "dest" not in tran
+            dest = source if internal else separator.join(prefix + [tran["dest"]])
+            spec.transitions.append(
+                TransitionSpec(
+                    source,
+                    dest,
+                    tran.get("label", tran["trigger"]),
+                    _callbacks(tran.get("conditions")),
+                    _callbacks(tran.get("unless")),
+                    internal,
+                )
+            )
+        for state in scope.get("children", []) + scope.get("states", []):
+            path = prefix + [state["name"]]
+            name = separator.join(path)
+            node = StateSpec(
+                name,
+                state.get("label", state["name"]),
+                _callbacks(state.get("on_enter")),
+                _callbacks(state.get("on_exit")),
+                parent,
+                _initial_name(state.get("initial")),
+                final=bool(state.get("final")),
+            )
+            spec.states.append(node)
+            if state.get("children"):
+                queue.append((path, name, state))
+
+    states = spec.state_map()
+    for state in spec.states:
+        if state.parent is not None:
+            states[state.parent].children.append(state.name)
+    return spec
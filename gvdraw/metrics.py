@@ -0,0 +1,194 @@
+"""label 的尺寸估计, 不需要调用 graphviz.
+
+字宽表随包发布在 ``data/fonts.json``: 各字体 ASCII 可见字符的 advance,
+取自 Adobe 核心字体的 AFM, 单位为 1/1000 em. 全角字符按 ``wide``,
+表中没有的其它字符按 ``default`` (ASCII 字宽的平均值).
+
+graphviz 默认的字体是 14pt 的 Times-Roman, 节点的尺寸按它的规则计算:
+文字加上 ``NODE_MARGIN``, 不小于 0.75 x 0.5 英寸. 这样可以在布局之前
+给出节点的尺寸, dot 只需要运行一次.
+
+测过的字符串按字体缓存.
+"""
+
+import os
+import json
+import logging
+import unicodedata
+from dataclasses import InitVar, dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from gvdraw.dotgraph import DotAttrs, DotGraph, DotNode
+from gvdraw.dpi import GRAPHVIZ_DEFAULT_DPI, point2pixel
+
+logger = logging.getLogger(__name__)
+
+Size = Tuple[float, float]
+
+FONTS_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "fonts.json"
+)
+DEFAULT_FONT = "Times-Roman"
+DEFAULT_FONTSIZE = 14
+LINE_HEIGHT = 1.2
+# graphviz 的默认值, 单位 point
+MIN_NODE_WIDTH = 54
+MIN_NODE_HEIGHT = 36
+NODE_MARGIN = (16, 8)
+NEWLINE = "\\l"
+LINE_BREAKS = ("\\n", "\\r")
+POINTS_PER_INCH = GRAPHVIZ_DEFAULT_DPI
+# 已经给出尺寸, 或者不显示文字的节点
+SIZE_ATTRS = {"width", "height", "fixedsize"}
+TEXTLESS_SHAPES = ("point",)
+
+
+class CharWidths(dict):
+    """字符宽度 (em) 的缓存, 表外的字符第一次用到时计算"""
+
+    def __init__(self, widths: Dict[str, float], default: float, wide: float):
+        super().__init__(widths)
+        self.default = default
+        self.wide = wide
+
+    def __missing__(self, ch: str) -> float:
+        width = self[ch] = (
+            self.wide if unicodedata.east_asian_width(ch) in "WF" else self.default
+        )
+        return width
+
+
+class LineWidths(dict):
+    """单行文字宽度 (em) 的缓存"""
+
+    def __init__(self, chars: CharWidths):
+        super().__init__()
+        self.chars = chars
+
+    def __missing__(self, line: str) -> float:
+        width = self[line] = sum(map(self.chars.__getitem__, line))
+        return width
+
+
+def split_lines(text: str) -> List[str]:
+    """按 graphviz 的换行符 ``\\l`` ``\\n`` ``\\r`` 拆行, 去掉末尾的空行"""
+    for mark in LINE_BREAKS:
+        text = text.replace(mark, NEWLINE)
+    lines = text.split(NEWLINE)
+    while len(lines) > 1 and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+@dataclass
+class FontMetrics:
+    name: str
+    widths: InitVar[Dict[str, float]]
+    default: float
+    wide: float = 1.0
+    chars: CharWidths = field(init=False, repr=False)
+    lines: LineWidths = field(init=False, repr=False)
+
+    def __post_init__(self, widths: Dict[str, float]):
+        self.chars = CharWidths(widths, self.default, self.wide)
+        self.lines = LineWidths(self.chars)
+
+    def text_size(self, text: str, fontsize: float = DEFAULT_FONTSIZE) -> Size:
+        """多行文字的宽和高, 单位与 fontsize 相同"""
+        if "\\" not in text:
+            # 单行 label 是绝大多数
+            return self.lines[text] * fontsize, fontsize * LINE_HEIGHT
+        lines = split_lines(text)
+        width = max(self.lines[line] for line in lines)
+        return width * fontsize, len(lines) * fontsize * LINE_HEIGHT
+
+    def node_size(self, label: str, fontsize: float = DEFAULT_FONTSIZE) -> Size:
+        """按 graphviz 的规则, label 对应的节点尺寸, 单位 point"""
+        width, height = self.text_size(label, fontsize)
+        return (
+            max(MIN_NODE_WIDTH, width + NODE_MARGIN[0]),
+            max(MIN_NODE_HEIGHT, height + NODE_MARGIN[1]),
+        )
+
+
+@lru_cache(maxsize=None)
+def load_fonts(filename: str = FONTS_FILE) -> Dict[str, FontMetrics]:
+    """字体名和别名 (小写) => FontMetrics, 同一个字体的别名共用缓存"""
+    with open(filename, encoding="utf8") as f:
+        table = json.load(f)
+    scale = 1 / table["units_per_em"]
+    fonts: Dict[str, FontMetrics] = dict()
+    for name, entry in table["fonts"].items():
+        first = entry["first"]
+        font = FontMetrics(
+            name,
+            {chr(first + i): w * scale for i, w in enumerate(entry["widths"])},
+            entry["default"] * scale,
+            entry["wide"] * scale,
+        )
+        for alias in [name] + entry.get("aliases", []):
+            fonts[alias.lower()] = font
+    return fonts
+
+
+def get_font(name: Optional[str] = None) -> FontMetrics:
+    """未知的字体按默认字体计算"""
+    fonts = load_fonts()
+    font = fonts.get((name or DEFAULT_FONT).lower())
+    if font is None:
+        logger.debug(f"没有字体 {name} 的字宽, 按 {DEFAULT_FONT} 计算")
+        font = fonts[DEFAULT_FONT.lower()]
+    return font
+
+
+def text_size(
+    text: str, fontsize: float = DEFAULT_FONTSIZE, font: Optional[str] = None
+) -> Size:
+    return get_font(font).text_size(text, fontsize)
+
+
+def node_size(
+    label: str, fontsize: float = DEFAULT_FONTSIZE, font: Optional[str] = None
+) -> Size:
+    return get_font(font).node_size(label, fontsize)
+
+
+def text_pixels(
+    text: str, fontsize: float = DEFAULT_FONTSIZE, font: Optional[str] = None
+) -> Tuple[int, int]:
+    """文字的像素尺寸, fontsize 单位为 point"""
+    width, height = text_size(text, fontsize, font)
+    return point2pixel(width), point2pixel(height)
+
+
+def apply_sizes(graph: DotGraph, defaults: Optional[Dict[str, str]] = None) -> DotGraph:
+    """给显式声明且没有指定尺寸的节点写上固定尺寸, dot 不再测量文字.
+
+    考虑节点自身和 ``node [...]`` 中的 label / fontname / fontsize;
+    HTML label 和 point 等不带文字的形状保持原样.
+    """
+    defaults = dict(defaults or dict())
+    for stmt in graph.body:
+        if isinstance(stmt, DotAttrs) and stmt.kind == "node":
+            defaults.update(stmt.attrs)
+        elif isinstance(stmt, DotGraph):
+            apply_sizes(stmt, defaults)
+        elif isinstance(stmt, DotNode):
+            attrs = {**defaults, **stmt.attrs}
+            if SIZE_ATTRS & attrs.keys() or attrs.get("shape") in TEXTLESS_SHAPES:
+                continue
+            label = attrs.get("label", "\\N")
+            if label.startswith("<"):
+                continue
+            font = get_font(attrs.get("fontname"))
+            width, height = font.node_size(
+                label.replace("\\N", stmt.name),
+                float(attrs.get("fontsize", DEFAULT_FONTSIZE)),
+            )
+            stmt.attrs.update(
+                width=f"{width / POINTS_PER_INCH:.4f}",
+                height=f"{height / POINTS_PER_INCH:.4f}",
+                fixedsize="true",
+            )
+    return graph
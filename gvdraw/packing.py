@@ -0,0 +1,94 @@
+"""嵌套矩形的装箱布局, 用于很深的状态机的总览图.
+
+只排布状态树: 每个复合状态内部用按高度降序的货架 (shelf) 算法摆放
+子状态, 行宽取子状态总面积的平方根乘以 ``ASPECT``, 使结果接近横向
+的矩形. 叶子状态的尺寸按 label 计算. 转移不参与布局, 画成两端状态
+之间的直线 (json0 的 ``splines=line``).
+
+整个过程是线性的, 不递归, 十万个状态也能在一秒内完成.
+"""
+
+import math
+import logging
+from operator import attrgetter
+from typing import Dict, List, Optional, Tuple
+
+from gvdraw.layered import (
+    Box,
+    MachineLayout,
+    CLUSTER_MARGIN,
+    NODESEP,
+    node_size,
+    text_size,
+)
+from gvdraw.machine import MachineSpec
+
+logger = logging.getLogger(__name__)
+
+# 行宽与高度之比的目标值
+ASPECT = 1.6
+
+
+class PackedLayout(MachineLayout):
+    """MachineSpec => json0, 只排布状态树"""
+
+    # 深层级时汇总后代节点的代价是 O(状态数 x 深度), cluster 只列直接子节点
+    NESTED_NODES = False
+
+    def lift(self, states) -> Dict[Optional[str], List[Tuple[int, str, str]]]:
+        return dict()
+
+    def build(self, name: Optional[str], children: List[str], states) -> Box:
+        root = Box(name or "", "" if name is None else states[name].label)
+        pending = [(root, children)]
+        boxes = self.boxes
+        # pending 在遍历中增长, 得到按层的顺序
+        for box, names in pending:
+            append = box.children.append
+            for child in names:
+                state = states[child]
+                if state.children:
+                    sub = Box(child, state.label, compound=True)
+                    pending.append((sub, state.children))
+                else:
+                    sub = Box(child, state.label, *node_size(state.label))
+                boxes[child] = sub
+                append(sub)
+        for box, _ in reversed(pending):
+            shelf_pack(box)
+        return root
+
+    def xdot(self) -> dict:
+        xdot = super().xdot()
+        xdot["splines"] = "line"
+        return xdot
+
+
+def shelf_pack(box: Box):
+    """货架算法摆放 box 的子节点, 坐标相对 box 的左上角, 并据此确定 box 的尺寸"""
+    label_width, label_height = text_size(box.label) if box.label else (0.0, 0.0)
+    top = CLUSTER_MARGIN + label_height
+    area = sum(child.width * child.height for child in box.children)
+    widest = max((child.width for child in box.children), default=0.0)
+    limit = max(widest, math.sqrt(area * ASPECT))
+    x, y, shelf, right = 0.0, 0.0, 0.0, NODESEP
+    # 按高度降序, 每个货架的第一个子状态最高
+    for child in sorted(box.children, key=attrgetter("height"), reverse=True):
+        if not x:
+            shelf = child.height
+        elif x + child.width > limit:
+            right = max(right, x)
+            x, y, shelf = 0.0, y + shelf + NODESEP, child.height
+        child.x = x + CLUSTER_MARGIN
+        child.y = y + top
+        x += child.width + NODESEP
+    width = max(right, x) - NODESEP
+    box.width = max(width, label_width) + 2 * CLUSTER_MARGIN
+    box.height = y + shelf + 2 * CLUSTER_MARGIN + label_height
+
+
+def packed_layout(
+    spec: MachineSpec, rankdir: str = "LR", title: str = "State Machine"
+) -> dict:
+    """rankdir 对装箱布局没有意义, 只为与其它引擎的参数一致"""
+    return PackedLayout(spec, rankdir=rankdir, title=title).xdot()
@@ -0,0 +1,134 @@
+"""布局的速度档位.
+
+``fast`` / ``balanced`` / ``quality`` 对应不同的 graphviz 属性: 限制
+network simplex (nslimit, nslimit1) 和交叉最小化 (mclimit, searchsize,
+remincross) 的迭代次数, ``fast`` 另外用直线代替样条. ``quality`` 即 dot
+的默认设置. ``auto`` 按节点数和边数在三者中选择, 阈值可以配置.
+
+sfdp 更快, 但忽略 cluster, 状态的嵌套会丢失, 所以各档位都用 dot.
+
+每次布局都记录所用的档位和耗时: 写日志, 并放在 json0 的 ``gvdraw_layout`` 中.
+"""
+
+import logging
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Optional, Tuple
+
+from gvdraw.dotgraph import DotAttrs, DotGraph
+
+logger = logging.getLogger(__name__)
+
+AUTO = "auto"
+DEFAULT_PROFILE = "default"
+RUN_KEY = "gvdraw_layout"
+
+
+@dataclass
+class Profile:
+    name: str
+    prog: str = "dot"
+    graph_attr: Dict[str, str] = field(default_factory=dict)
+
+
+PROFILES: Dict[str, Profile] = {
+    "fast": Profile(
+        "fast",
+        graph_attr=dict(
+            nslimit="1",
+            nslimit1="1",
+            mclimit="0.1",
+            searchsize="10",
+            remincross="false",
+            splines="line",
+        ),
+    ),
+    "balanced": Profile(
+        "balanced",
+        graph_attr=dict(nslimit="5", nslimit1="5", mclimit="0.5", searchsize="30"),
+    ),
+    "quality": Profile("quality"),
+}
+
+PROFILE_CHOICES = tuple(PROFILES) + (AUTO,)
+
+
+@dataclass
+class Thresholds:
+    """auto 的阈值: 节点数或边数达到 fast 的阈值用 fast, 达到 balanced 的用 balanced"""
+
+    balanced_nodes: int = 300
+    balanced_edges: int = 1000
+    fast_nodes: int = 2000
+    fast_edges: int = 6000
+
+    @classmethod
+    def parse(cls, text: str) -> "Thresholds":
+        """``balanced=300/1000,fast=2000/6000``, 未给出的档位沿用默认值"""
+        thresholds = cls()
+        for item in filter(None, (part.strip() for part in text.split(","))):
+            name, _, value = item.partition("=")
+            nodes, _, edges = value.partition("/")
+            if name not in ("balanced", "fast") or not nodes.isdigit():
+                raise ValueError(f"无法解析的阈值: {item}")
+            setattr(thresholds, f"{name}_nodes", int(nodes))
+            if edges:
+                setattr(thresholds, f"{name}_edges", int(edges))
+        return thresholds
+
+
+@dataclass
+class LayoutRun:
+    profile: str
+    prog: str
+    nodes: int
+    edges: int
+    seconds: float = 0.0
+
+    def record(self, xdot: dict) -> dict:
+        logger.info(
+            f"layout: profile={self.profile} prog={self.prog} "
+            f"nodes={self.nodes} edges={self.edges} {self.seconds:.3f}s"
+        )
+        xdot[RUN_KEY] = asdict(self)
+        return xdot
+
+
+def choose_profile(
+    nodes: int, edges: int, thresholds: Optional[Thresholds] = None
+) -> Profile:
+    thresholds = thresholds or Thresholds()
+    if nodes >= thresholds.fast_nodes or edges >= thresholds.fast_edges:
+        return PROFILES["fast"]
+    if nodes >= thresholds.balanced_nodes or edges >= thresholds.balanced_edges:
+        return PROFILES["balanced"]
+    return PROFILES["quality"]
+
+
+def resolve_profile(
+    name: Optional[str],
+    nodes: int,
+    edges: int,
+    thresholds: Optional[Thresholds] = None,
+    prog: str = "dot",
+) -> Profile:
+    """name 为空时保持原来的行为: 用 ``prog``, 不加任何属性"""
+    if name is None:
+        return Profile(DEFAULT_PROFILE, prog)
+    if name == AUTO:
+        return choose_profile(nodes, edges, thresholds)
+    if name not in PROFILES:
+        raise ValueError(f"未知的布局档位 {name}, 可选: {', '.join(PROFILE_CHOICES)}")
+    return PROFILES[name]
+
+
+def apply_profile(graph: DotGraph, profile: Profile) -> DotGraph:
+    """把档位的属性放在图的最前面, 源码中显式写出的属性优先"""
+    if profile.graph_attr:
+        graph.body.insert(0, DotAttrs("graph", dict(profile.graph_attr)))
+    return graph
+
+
+def count_json0(xdot: dict) -> Tuple[int, int]:
+    """json0 中的节点数和边数"""
+    nodes = sum("bb" not in obj for obj in xdot.get("objects", []))
+    return nodes, len(xdot.get("edges", []))
@@ -0,0 +1,99 @@
+import logging
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+Arc = Tuple[int, int]
+
+
+def strongly_connected_components(n: int, succ: Sequence[Sequence[int]]) -> List[int]:
+    """迭代版 Tarjan, 返回每个顶点的分量编号.
+
+    分量按逆拓扑序编号: 0 号分量没有指向其他分量的边.
+    """
+    index = [-1] * n
+    low = [0] * n
+    comp = [-1] * n
+    stack: List[int] = list()
+    counter = ncomp = 0
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        work = [(root, 0)]
+        while work:
+            v, i = work[-1]
+            if i < len(succ[v]):
+                work[-1] = (v, i + 1)
+                w = succ[v][i]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    work.append((w, 0))
+                elif comp[w] == -1 and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+            work.pop()
+            if work:
+                u = work[-1][0]
+                if low[v] < low[u]:
+                    low[u] = low[v]
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    comp[w] = ncomp
+                    if w == v:
+                        break
+                ncomp += 1
+    return comp
+
+
+def transitive_reduction(n: int, arcs: Sequence[Arc]) -> List[bool]:
+    """计算有向图的传递约简, 返回与 ``arcs`` 等长的保留标记.
+
+    先把强连通分量收缩成 DAG, 再按拓扑序用 int 位图累积可达集:
+    一条分量间的边若其终点已经可以经由更近的后继到达, 即为冗余边.
+    分量内部的边与自环原样保留, 重复的分量间边只保留第一条.
+    """
+    succ: List[List[int]] = [list() for _ in range(n)]
+    for tail, head in arcs:
+        succ[tail].append(head)
+    comp = strongly_connected_components(n, succ)
+    ncomp = max(comp, default=-1) + 1
+
+    # 分量间的边, 记录代表它的第一条原始边
+    csucc: List[Dict[int, int]] = [dict() for _ in range(ncomp)]
+    for idx, (tail, head) in enumerate(arcs):
+        ct, ch = comp[tail], comp[head]
+        if ct != ch:
+            csucc[ct].setdefault(ch, idx)
+
+    keep = [comp[tail] == comp[head] for tail, head in arcs]
+    reach = [0] * ncomp
+    # 分量编号是逆拓扑序, 从汇点开始向上累积
+    for c in range(ncomp):
+        covered = 0
+        # 编号大的后继离 c 更近, 先处理
+        for d in sorted(csucc[c], reverse=True):
+            bit = 1 << d
+            if covered & bit:
+                continue
+            keep[csucc[c][d]] = True
+            covered |= reach[d] | bit
+        reach[c] = covered
+    return keep
+
+
+def reduce_edges(edges: Sequence[Tuple[Hashable, Hashable]]) -> List[bool]:
+    """对以任意可哈希节点表示的边做传递约简"""
+    ids: Dict[Hashable, int] = dict()
+    arcs = [
+        (ids.setdefault(tail, len(ids)), ids.setdefault(head, len(ids)))
+        for tail, head in edges
+    ]
+    keep = transitive_reduction(len(ids), arcs)
+    logger.info(f"transitive reduction: {len(arcs)} => {sum(keep)} edges")
+    return keep
@@ -0,0 +1,372 @@
+"""增量布局: 沿用上一次的位置, 只摆放新增或改动的状态.
+
+上一次的几何可以来自 json0, 也可以来自 drawio 或 sketchpad 导出的
+GraphIR. 仍然存在且 label 不变的状态原样保留, 相当于 neato -n 下的
+``pos="x,y!"``. 新增的子树先在内部用货架算法排好, 再整体放到父状态
+里与它有转移相连的状态旁边的空位上. 父状态因此变大时, 只把与它重叠
+的兄弟状态连同子树推开.
+
+除了逐个比对状态, 耗时只与改动的规模有关.
+"""
+
+import time
+import logging
+from typing import Dict, List, Optional, Set
+
+from gvdraw.dpi import DEFAULT_DPI, GRAPHVIZ_DEFAULT_DPI
+from gvdraw.ir import GraphIR
+from gvdraw.json2xml import StateLabel, is_cluster_root, state_of
+from gvdraw.layered import (
+    Box,
+    MachineLayout,
+    CLUSTER_MARGIN,
+    NEWLINE,
+    NODESEP,
+    POINTS_PER_INCH,
+    node_size,
+    text_size,
+)
+from gvdraw.machine import MachineSpec
+from gvdraw.packing import shelf_pack
+from gvdraw.profiles import LayoutRun
+
+logger = logging.getLogger(__name__)
+
+RELAYOUT_PROFILE = "incremental"
+
+Boxes = Dict[str, Box]
+
+
+def boxes_from_json0(xdot: dict) -> Boxes:
+    """json0 => 状态全名到外框的映射, 坐标为左上角, y 向下, 单位 point"""
+    height = float(xdot["bb"].split(",")[3])
+    boxes: Boxes = dict()
+    for obj in xdot["objects"]:
+        if is_cluster_root(obj["name"]) or obj.get("shape") == "point":
+            continue
+        name = state_of(obj["name"])
+        label, _, _ = StateLabel(obj.get("label", name)).parse()
+        if "bb" in obj:
+            llx, lly, urx, ury = (float(v) for v in obj["bb"].split(","))
+            boxes[name] = Box(
+                name, label, urx - llx, ury - lly, llx, height - ury, compound=True
+            )
+            continue
+        cx, cy = (float(v) for v in obj["pos"].split(","))
+        width = float(obj["width"]) * POINTS_PER_INCH
+        height_ = float(obj["height"]) * POINTS_PER_INCH
+        boxes[name] = Box(
+            name, label, width, height_, cx - width / 2, height - cy - height_ / 2
+        )
+    return boxes
+
+
+def boxes_from_ir(ir: GraphIR) -> Boxes:
+    """GraphIR 的像素坐标 => point, 没有几何信息的状态视为新增"""
+    if not ir.has_geometry:
+        return dict()
+    scale = GRAPHVIZ_DEFAULT_DPI / DEFAULT_DPI
+    children = ir.children()
+    boxes: Boxes = dict()
+    for idx in range(ir.state_count):
+        x, y, width, height = ir.bounds(idx)
+        if not width or not height:
+            continue
+        name = ir.state_name(idx)
+        boxes[name] = Box(
+            name,
+            ir.state_label(idx),
+            width * scale,
+            height * scale,
+            x * scale,
+            y * scale,
+            compound=bool(children[idx]),
+        )
+    return boxes
+
+
+def inch_with_bias(inches: float) -> float:
+    return (round(inches * DEFAULT_DPI) + 0.5) / DEFAULT_DPI
+
+
+def overlaps(a: Box, b: Box, gap: float = NODESEP / 2) -> bool:
+    return (
+        a.x < b.x + b.width + gap
+        and b.x < a.x + a.width + gap
+        and a.y < b.y + b.height + gap
+        and b.y < a.y + a.height + gap
+    )
+
+
+def translate(box: Box, dx: float, dy: float):
+    stack = [box]
+    while stack:
+        box = stack.pop()
+        box.x += dx
+        box.y += dy
+        stack.extend(box.children)
+
+
+def label_height(box: Box) -> float:
+    return text_size(box.label)[1] if box.label else 0.0
+
+
+class Relayout(MachineLayout):
+    """MachineSpec + 上一次的几何 => json0"""
+
+    def __init__(
+        self,
+        spec: MachineSpec,
+        previous: Boxes,
+        rankdir: str = "LR",
+        title: str = "State Machine",
+    ):
+        self.previous = previous
+        self.parents: Dict[str, Box] = dict()
+        self.settled: Set[str] = set()
+        self.units: List[Box] = list()
+        super().__init__(spec, rankdir=rankdir, title=title)
+
+    def lift(self, states):
+        return dict()
+
+    def place(self, box: Box, dx: float, dy: float):
+        """build 给出的已经是绝对坐标"""
+
+    def build(self, name: Optional[str], children: List[str], states) -> Box:
+        root = Box("", "")
+        pending = [(root, children)]
+        for box, names in pending:
+            for child in names:
+                state = states[child]
+                sub = Box(child, state.label, compound=bool(state.children))
+                if state.children:
+                    pending.append((sub, state.children))
+                self.boxes[child] = sub
+                self.parents[child] = box
+                box.children.append(sub)
+
+        dirty: Set[str] = {root.name}
+        fresh: Set[str] = set()
+        resized: List[Box] = list()
+        for box, _ in pending:
+            for child in box.children:
+                old = self.previous.get(child.name)
+                if box.name in fresh:
+                    fresh.add(child.name)
+                elif old is None or old.compound != child.compound:
+                    fresh.add(child.name)
+                    self.units.append(child)
+                    dirty.update(self.ancestors_of(child))
+                if child.name in fresh:
+                    if not child.compound:
+                        child.width, child.height = node_size(child.label + NEWLINE)
+                    continue
+                self.settled.add(child.name)
+                if child.compound or old.label == child.label:
+                    child.x, child.y = old.x, old.y
+                    child.width, child.height = old.width, old.height
+                else:
+                    # label 变了, 中心不动
+                    child.width, child.height = node_size(child.label + NEWLINE)
+                    child.x = old.x + (old.width - child.width) / 2
+                    child.y = old.y + (old.height - child.height) / 2
+                    resized.append(child)
+                    dirty.update(self.ancestors_of(child))
+
+        neighbours = self.neighbours(fresh)
+        for unit in self.units:
+            self.pack_unit(unit)
+            self.settle(unit, neighbours.get(unit.name, []))
+        for box in resized:
+            self.push_siblings(box)
+        for box, _ in reversed(pending):
+            if box.name in dirty:
+                self.fit(box)
+        logger.info(
+            f"relayout: {len(self.units)} new subtrees, {len(resized)} resized, "
+            f"{len(self.settled) - len(self.units)} pinned"
+        )
+        return root
+
+    def ancestors_of(self, box: Box) -> List[str]:
+        names = list()
+        while box.name in self.parents:
+            box = self.parents[box.name]
+            names.append(box.name)
+        return names
+
+    def sibling_of(self, name: str, parent: Box) -> Optional[Box]:
+        """name 在 parent 中对应的直接子状态"""
+        box = self.boxes.get(name)
+        while box is not None and self.parents.get(box.name) is not parent:
+            box = self.parents.get(box.name)
+        return box
+
+    def neighbours(self, fresh: Set[str]) -> Dict[str, List[str]]:
+        """新增子树的根 => 与子树内状态有转移相连的已固定状态"""
+        roots = {unit.name: unit for unit in self.units}
+
+        def unit_of(name: str) -> Optional[str]:
+            box = self.boxes[name]
+            while box.name not in roots and box.name in self.parents:
+                box = self.parents[box.name]
+            return box.name if box.name in roots else None
+
+        result: Dict[str, List[str]] = dict()
+        for tran in self.spec.transitions:
+            for this, other in ((tran.source, tran.dest), (tran.dest, tran.source)):
+                if this in fresh and other not in fresh:
+                    unit = unit_of(this)
+                    if unit is not None:
+                        result.setdefault(unit, list()).append(other)
+        return result
+
+    def pack_unit(self, unit: Box):
+        """新增子树内部用货架算法排好, 坐标相对 unit, 随后再整体平移"""
+        if not unit.compound:
+            return
+        order = [unit]
+        for box in order:
+            order.extend(child for child in box.children if child.compound)
+        for box in reversed(order):
+            shelf_pack(box)
+        # shelf_pack 给出的是相对父状态的坐标, 自顶向下换成相对 unit 的
+        for box in order[1:]:
+            for child in box.children:
+                child.x += box.x
+                child.y += box.y
+
+    def settle(self, unit: Box, neighbours: List[str]):
+        """把 unit 放到父状态中与它相连的状态旁边不与兄弟重叠的地方"""
+        parent = self.parents[unit.name]
+        siblings = [
+            child
+            for child in parent.children
+            if child is not unit and child.name in self.settled
+        ]
+        left, top = CLUSTER_MARGIN, CLUSTER_MARGIN
+        if parent.name:
+            left += parent.x
+            top += parent.y + label_height(parent)
+        anchors = [self.sibling_of(name, parent) for name in neighbours]
+        anchors = [
+            box for box in anchors if box is not None and box.name in self.settled
+        ]
+        if not anchors and siblings:
+            # 没有相连的状态, 以所有兄弟的外框为锚
+            x = min(box.x for box in siblings)
+            y = min(box.y for box in siblings)
+            right = max(box.x + box.width for box in siblings)
+            bottom = max(box.y + box.height for box in siblings)
+            anchors = [Box("", "", right - x, bottom - y, x, y)]
+        candidates = [(left, top)]
+        for box in anchors[:1]:
+            candidates = [
+                (box.x + box.width + NODESEP, box.y),
+                (box.x, box.y + box.height + NODESEP),
+                (box.x - NODESEP - unit.width, box.y),
+                (box.x, box.y - NODESEP - unit.height),
+            ]
+        candidates = [(x, y) for x, y in candidates if x >= left and y >= top]
+        dx, dy = unit.x, unit.y
+        for x, y in candidates:
+            unit.x, unit.y = x, y
+            if not any(overlaps(unit, box) for box in siblings):
+                break
+        else:
+            # 都被占了, 从首选位置向右挪到不重叠为止
+            unit.x, unit.y = candidates[0] if candidates else (left, top)
+            while True:
+                hit = [box for box in siblings if overlaps(unit, box)]
+                if not hit:
+                    break
+                unit.x = max(box.x + box.width for box in hit) + NODESEP
+        for child in unit.children:
+            translate(child, unit.x - dx, unit.y - dy)
+        self.settled.add(unit.name)
+
+    def push_siblings(self, box: Box):
+        """把与 box 重叠的兄弟状态向右或向下推开, 取位移小的方向"""
+        parent = self.parents.get(box.name)
+        if parent is None:
+            return
+        queue = [box]
+        while queue:
+            pusher = queue.pop()
+            for sibling in parent.children:
+                if sibling is pusher or sibling.name not in self.settled:
+                    continue
+                if not overlaps(sibling, pusher):
+                    continue
+                dx = pusher.x + pusher.width + NODESEP - sibling.x
+                dy = pusher.y + pusher.height + NODESEP - sibling.y
+                if dx <= dy:
+                    translate(sibling, dx, 0.0)
+                else:
+                    translate(sibling, 0.0, dy)
+                queue.append(sibling)
+
+    def fit(self, box: Box):
+        """只扩大不缩小, 保证包住所有子状态; 扩大后推开重叠的兄弟"""
+        if not box.children:
+            return
+        margin_top = CLUSTER_MARGIN + label_height(box)
+        left = min(child.x for child in box.children) - CLUSTER_MARGIN
+        top = min(child.y for child in box.children) - margin_top
+        right = max(child.x + child.width for child in box.children) + CLUSTER_MARGIN
+        bottom = max(child.y + child.height for child in box.children) + CLUSTER_MARGIN
+        if not box.name:
+            box.x, box.y = 0.0, 0.0
+            box.width, box.height = max(box.width, right), max(box.height, bottom)
+            return
+        if box.width and box.height:
+            left, top = min(left, box.x), min(top, box.y)
+            right = max(right, box.x + box.width)
+            bottom = max(bottom, box.y + box.height)
+        grown = (left, top, right - left, bottom - top) != (
+            box.x,
+            box.y,
+            box.width,
+            box.height,
+        )
+        box.x, box.y, box.width, box.height = left, top, right - left, bottom - top
+        if grown:
+            self.push_siblings(box)
+
+    def xdot(self) -> dict:
+        xdot = super().xdot()
+        xdot["splines"] = "line"
+        # 保留的状态尺寸来自上次的像素, json2xml 以 int(inch * 96) 取整,
+        # 与 GraphIR.to_xdot 一样多加半个像素, 否则每次增量布局都小一个像素.
+        # 中心点随之移动, json2xml 由中心点算出的左下角保持不变
+        for obj in xdot["objects"]:
+            if "width" not in obj:
+                continue
+            width, height = float(obj["width"]), float(obj["height"])
+            biased_width, biased_height = inch_with_bias(width), inch_with_bias(height)
+            cx, cy = (float(v) for v in obj["pos"].split(","))
+            cx += (biased_width - width) * POINTS_PER_INCH / 2
+            cy += (biased_height - height) * POINTS_PER_INCH / 2
+            obj["pos"] = f"{cx:.15g},{cy:.15g}"
+            obj["width"], obj["height"] = repr(biased_width), repr(biased_height)
+        return xdot
+
+
+def relayout(
+    spec: MachineSpec,
+    previous: Boxes,
+    rankdir: str = "LR",
+    title: str = "State Machine",
+) -> dict:
+    """在 previous 的基础上布局 spec, 返回 json0"""
+    start = time.perf_counter()
+    xdot = Relayout(spec, previous, rankdir=rankdir, title=title).xdot()
+    run = LayoutRun(
+        RELAYOUT_PROFILE,
+        "relayout",
+        len(spec.states),
+        len(spec.transitions),
+        time.perf_counter() - start,
+    )
+    return run.record(xdot)
@@ -4,9 +4,12 @@ from abc import abstractmethod
 import pprint
 import logging
 import textwrap
+import itertools
 from io import StringIO
 from gvdraw.spline import draw_smooth_curve
 from gvdraw.bezier import cubic_bezier_points
+from gvdraw.ir import GraphIR, NO_STATE
+from gvdraw.metrics import text_pixels
 from functools import wraps, partial
 from dataclasses import InitVar, dataclass, field
 from collections import defaultdict, deque
@@ -263,6 +266,7 @@ class NodeAttributor:
                 self.node.add_on_exit(s)
 
             popup.destroy()  # 关闭弹出框
+            fit_label(self.node)
             self.node.draw()
 
         submit_button = tk.Button(popup, text="确认", command=submit)
@@ -461,7 +465,8 @@ UNIQUE_CODES = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
 
 
 class Node(Region):
-    sequence_id = 0
+    # next() 在 CPython 里是原子的, 并发创建节点也不会拿到重复的编号
+    _sequence = itertools.count()
 
     def __init__(
         self,
@@ -481,15 +486,15 @@ class Node(Region):
         self.state_name: str = ""
         self.state_label: Optional[str] = None
 
-        n = Node.sequence_id // len(UNIQUE_CODES)
-        l = Node.sequence_id % len(UNIQUE_CODES)
+        sequence_id = next(Node._sequence)
+        n = sequence_id // len(UNIQUE_CODES)
+        l = sequence_id % len(UNIQUE_CODES)
         self.unique_id = UNIQUE_CODES[l]
         while n:
             n = n // len(UNIQUE_CODES)
             l = n % len(UNIQUE_CODES)
             self.unique_id += UNIQUE_CODES[l]
 
-        Node.sequence_id += 1
         logger.info(f"UNIQUE ID: {self.unique_id}")
 
     @property
@@ -755,6 +760,16 @@ mp = MousePoint()
 
 NODE_LABEL_X_OFFSET = 20
 NODE_LABEL_Y_OFFSET = 7
+LABEL_FONT = "Arial Bold"
+
+
+def fit_label(node: Node):
+    """label 放不下时放大节点, 字宽用 gvdraw.metrics 估计, 不需要 Tk 测量"""
+    width, height = text_pixels(node.label, runtime.fontsize, LABEL_FONT)
+    node.resize(
+        max(node.width, width + 2 * NODE_LABEL_X_OFFSET),
+        max(node.height, height + 2 * NODE_LABEL_Y_OFFSET),
+    )
 
 
 event_registry = defaultdict()
@@ -1368,11 +1383,17 @@ class LayoutExportVisitor:
     from transitions.extensions.nesting import NestedState
     from transitions.extensions.diagrams import HierarchicalGraphMachine
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        tree: Optional[Node] = None,
+        transitions: Optional[List[Transition]] = None,
+    ) -> None:
         self.states = list()
         self.transitions = list()
-        self.visit(runtime.tree)
-        self.visit_transition()
+        self.visit(tree or runtime.tree)
+        self.visit_transition(
+            transition_registry if transitions is None else transitions
+        )
         self.machine = HierarchicalGraphMachine(
             states=self.states,
             show_conditions=True,
@@ -1392,8 +1413,8 @@ class LayoutExportVisitor:
                 self.states.append(state)
             self.visit(child, state)
 
-    def visit_transition(self):
-        for tx in transition_registry:
+    def visit_transition(self, transitions: List[Transition]):
+        for tx in transitions:
             self.transitions.append(
                 dict(
                     source=tx.src,
@@ -1413,6 +1434,74 @@ class LayoutExportVisitor:
         return layout
 
 
+class IRImportVisitor:
+    """GraphIR => Node 树和 Transition, 只建立模型, 不绘制也不注册"""
+
+    def __init__(self, ir: GraphIR, tree: Optional[Node] = None):
+        tree = tree or runtime.tree
+        self.nodes: List[Node] = list()
+        self.transitions: List[Transition] = list()
+        for idx in range(ir.state_count):
+            x, y, width, height = ir.bounds(idx) if ir.has_geometry else (0, 0, 0, 0)
+            node = Node(int(x), int(y), int(width), int(height))
+            node.unique_id = ir.state_name(idx)
+            node.state_name = ir.short_name(idx)
+            node.state_label = ir.state_label(idx)
+            node.on_enter = set(ir.callbacks(ir.on_enter, idx))
+            node.on_exit = set(ir.callbacks(ir.on_exit, idx))
+            parent = ir.parent[idx]
+            (tree if parent == NO_STATE else self.nodes[parent]).add_child(node)
+            self.nodes.append(node)
+
+        for idx in range(ir.transition_count):
+            self.transitions.append(
+                Transition(
+                    Port(self.nodes[ir.source[idx]], Pole.South),
+                    Port(self.nodes[ir.dest[idx]], Pole.North),
+                    set(ir.callbacks(ir.conditions, idx)),
+                    set(ir.callbacks(ir.unless, idx)),
+                )
+            )
+
+
+class IRExportVisitor(BFSVisitor):
+    """Node 树和 Transition => GraphIR, 几何信息取自画布坐标"""
+
+    def __init__(
+        self,
+        tree: Optional[Node] = None,
+        transitions: Optional[List[Transition]] = None,
+    ) -> None:
+        self.tree = tree or runtime.tree
+        self.ir = GraphIR()
+        self.index: Dict[int, int] = dict()
+        self.visit(self.tree)
+        for tx in transition_registry if transitions is None else transitions:
+            self.ir.add_transition(
+                self.index[id(tx.src_port.node)],
+                self.index[id(tx.dst_port.node)],
+                "next",
+                sorted(tx.conditions),
+                sorted(tx.unless),
+            )
+
+    def visit_node(self, node: Node):
+        if node is self.tree:
+            return
+        parent = self.index.get(id(node.parent), NO_STATE)
+        name = node.name or node.label
+        if parent != NO_STATE:
+            name = f"{self.ir.state_name(parent)}{CHILD_SEP}{name}"
+        self.index[id(node)] = self.ir.add_state(
+            name,
+            node.label,
+            parent,
+            sorted(node.on_enter),
+            sorted(node.on_exit),
+            (node.x, node.y, node.width, node.height),
+        )
+
+
 class PortVisitor(DFSVisitor):
     def __init__(self, show: bool = False):
         self.show = show
@@ -1539,5 +1628,21 @@ def import_json(filename: str):
     runtime.run()
 
 
+@cli.command
+@click.argument("filename", type=str)
+def import_ir(filename: str):
+    config_layout(runtime)
+
+    visitor = IRImportVisitor(GraphIR.load(filename))
+    logger.info(f"Import : {filename}: {len(visitor.nodes)} states")
+    for node in visitor.nodes:
+        node.draw()
+    for trx in visitor.transitions:
+        register_transition(trx)
+        trx.draw()
+
+    runtime.run()
+
+
 if __name__ == "__main__":
     cli()
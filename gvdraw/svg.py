@@ -0,0 +1,206 @@
+"""从 json2xml.Layout 直接写出 SVG 预览, 不需要 drawio 或第二次调用 graphviz.
+
+坐标与 drawio 相同: 像素, 左上角为原点. 元素逐个写入文件, 不在内存里
+构造 DOM, 大图也只占用与 Layout 本身相当的内存.
+
+依次写 cluster, 状态, 转移, 后写的在上层. 有 graphviz 给出的路径时按
+三次 B 样条画, 否则 (如来自 IR 的 Layout) 画连接两个状态中心的直线.
+"""
+
+import logging
+from html import escape
+from typing import Dict, Iterable, List, Optional, TextIO, Tuple
+
+from gvdraw.bundle import Bundle
+from gvdraw.dpi import point2pixel
+from gvdraw.json2xml import Edge, GhostEdge, Layout, Node, Point
+from gvdraw.metrics import DEFAULT_FONTSIZE, LINE_HEIGHT
+
+logger = logging.getLogger(__name__)
+
+SVG_SUFFIX = ".svg"
+# 与 metrics 的默认字体 Times-Roman 对应, 浏览器不认 PostScript 名字
+FONT_FAMILY = "Times,serif"
+FONT_SIZE = point2pixel(DEFAULT_FONTSIZE)
+LINE_PIXELS = round(FONT_SIZE * LINE_HEIGHT)
+# 与 drawio 默认的样式接近
+STROKE = "#000000"
+CLUSTER_FILL = "#ffffff"
+NODE_FILL = "#ffffff"
+GHOST_STROKE = "#999999"
+ARROW_ID = "arrow"
+ELLIPSE_SHAPES = frozenset(["ellipse", "oval", "circle", "doublecircle"])
+
+HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}" font-family="{font}" font-size="{size}">
+<title>{title}</title>
+<defs><marker id="{arrow}" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="8" markerHeight="8" orient="auto-start-reverse"><path d="M0,0 L10,5 L0,10 z" fill="{stroke}"/></marker></defs>
+<rect width="100%" height="100%" fill="#ffffff"/>
+"""
+FOOTER = "</svg>\n"
+
+
+def node_lines(node: Node) -> List[str]:
+    lines = [node.label]
+    if node.on_enter:
+        lines.append("- enter: " + " + ".join(node.on_enter))
+    if node.on_exit:
+        lines.append("- exit: " + " + ".join(node.on_exit))
+    return lines
+
+
+def edge_text(edge: Edge) -> str:
+    guards = edge.conditions + ["!" + name for name in edge.unless]
+    if not guards:
+        return edge.label
+    return f"{edge.label} [{' & '.join(guards)}]"
+
+
+def text(x: float, y: float, lines: List[str], anchor: str = "middle") -> str:
+    """y 为第一行基线"""
+    if len(lines) == 1:
+        line = escape(lines[0])
+        return f'<text x="{x}" y="{y}" text-anchor="{anchor}">{line}</text>\n'
+    spans = "".join(
+        f'<tspan x="{x}" dy="{0 if idx == 0 else LINE_PIXELS}">{escape(line)}</tspan>'
+        for idx, line in enumerate(lines)
+    )
+    return f'<text x="{x}" y="{y}" text-anchor="{anchor}">{spans}</text>\n'
+
+
+def cluster_element(node: Node) -> str:
+    return (
+        f'<g id="{node.cell_id}"><rect x="{node.x_pos}" y="{node.y_pos}" '
+        f'width="{node.width}" height="{node.height}" fill="{CLUSTER_FILL}" '
+        f'stroke="{STROKE}"/>'
+        + text(node.x_pos + node.width / 2, node.y_pos + FONT_SIZE, node_lines(node))
+        + "</g>\n"
+    )
+
+
+def node_element(node: Node) -> str:
+    if node.shape in ELLIPSE_SHAPES:
+        shape = (
+            f'<ellipse cx="{node.x_pos + node.width / 2}" '
+            f'cy="{node.y_pos + node.height / 2}" rx="{node.width / 2}" '
+            f'ry="{node.height / 2}" fill="{NODE_FILL}" stroke="{STROKE}"/>'
+        )
+    else:
+        shape = (
+            f'<rect x="{node.x_pos}" y="{node.y_pos}" width="{node.width}" '
+            f'height="{node.height}" fill="{NODE_FILL}" stroke="{STROKE}"/>'
+        )
+    lines = node_lines(node)
+    # 文字块垂直居中, 基线比行的中线低约 0.35 个字号
+    top = node.y_pos + (node.height - len(lines) * LINE_PIXELS) / 2
+    baseline = round(top + LINE_PIXELS / 2 + FONT_SIZE * 0.35)
+    return (
+        f'<g id="{node.cell_id}">{shape}'
+        + text(node.x_pos + node.width / 2, baseline, lines)
+        + "</g>\n"
+    )
+
+
+def center(node: Node) -> Point:
+    return node.x_pos + node.width // 2, node.y_pos + node.height // 2
+
+
+def spline_path(points: List[Point], arrow: Optional[Point]) -> str:
+    """graphviz 的控制点 p0 (p1 p2 p3)* => SVG path, 尖端单独连一段"""
+    (x, y), rest = points[0], points[1:]
+    parts = [f"M{x},{y}"]
+    for idx in range(0, len(rest) - len(rest) % 3, 3):
+        (ax, ay), (bx, by), (cx, cy) = rest[idx : idx + 3]
+        parts.append(f"C{ax},{ay} {bx},{by} {cx},{cy}")
+    if arrow is not None:
+        parts.append(f"L{arrow[0]},{arrow[1]}")
+    return " ".join(parts)
+
+
+def edge_element(edge: Edge, centers: Dict[str, Point]) -> str:
+    if edge.spline:
+        path = spline_path(edge.spline, edge.arrow)
+        anchor = edge.label_pos
+    elif edge.source in centers and edge.target in centers:
+        (sx, sy), (tx, ty) = centers[edge.source], centers[edge.target]
+        path = f"M{sx},{sy} L{tx},{ty}"
+        anchor = edge.label_pos or ((sx + tx) // 2, (sy + ty) // 2)
+    else:
+        return ""
+    label = edge_text(edge)
+    return (
+        f'<g id="{edge.cell_id}"><path d="{path}" fill="none" stroke="{STROKE}" '
+        f'marker-end="url(#{ARROW_ID})"/>'
+        + (text(anchor[0], anchor[1], [label]) if label and anchor else "")
+        + "</g>\n"
+    )
+
+
+def bundle_element(bundle: Bundle, centers: Dict[str, Point]) -> str:
+    if bundle.source not in centers or bundle.target not in centers:
+        return ""
+    points = [centers[bundle.source], *bundle.points, centers[bundle.target]]
+    path = " ".join(
+        f"{'M' if idx == 0 else 'L'}{x},{y}" for idx, (x, y) in enumerate(points)
+    )
+    return (
+        f'<path id="{bundle.cell_id}" d="{path}" fill="none" stroke="{STROKE}" '
+        f'marker-end="url(#{ARROW_ID})"/>\n'
+    )
+
+
+def ghost_element(ghost: GhostEdge, centers: Dict[str, Point]) -> str:
+    if ghost.hidden or ghost.source not in centers or ghost.target not in centers:
+        return ""
+    (sx, sy), (tx, ty) = centers[ghost.source], centers[ghost.target]
+    return (
+        f'<path id="{ghost.cell_id}" d="M{sx},{sy} L{tx},{ty}" fill="none" '
+        f'stroke="{GHOST_STROKE}" stroke-dasharray="6 4" '
+        f'marker-end="url(#{ARROW_ID})"/>\n'
+    )
+
+
+def elements(layout: Layout) -> Iterable[str]:
+    yield HEADER.format(
+        width=layout.width,
+        height=layout.height,
+        font=FONT_FAMILY,
+        size=FONT_SIZE,
+        title=escape(layout.title),
+        arrow=ARROW_ID,
+        stroke=STROKE,
+    )
+    centers: Dict[str, Tuple[int, int]] = dict()
+    # json0 中 cluster 在前, 父 cluster 先于子 cluster, 按原顺序画即可嵌套
+    for node in layout.nodes:
+        centers[node.cell_id] = center(node)
+        if node.is_cluster:
+            yield cluster_element(node)
+    for node in layout.nodes:
+        if not node.is_cluster:
+            yield node_element(node)
+    for edge in layout.edges:
+        if edge.cell_id not in layout.merged:
+            yield edge_element(edge, centers)
+    for bundle in layout.bundles:
+        yield bundle_element(bundle, centers)
+    for ghost in layout.ghosts:
+        yield ghost_element(ghost, centers)
+    yield FOOTER
+
+
+def write_svg(layout: Layout, f: TextIO) -> int:
+    """逐个元素写入 f, 返回写入的元素个数 (不含头尾)"""
+    count = -2
+    for element in elements(layout):
+        if element:
+            f.write(element)
+            count += 1
+    return count
+
+
+def save_svg(layout: Layout, filename: str) -> int:
+    with open(filename, "w", encoding="utf8") as f:
+        count = write_svg(layout, f)
+    logger.info(f"{filename}: {count} elements")
+    return count
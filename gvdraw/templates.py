@@ -0,0 +1,21 @@
+import os
+from functools import lru_cache
+from typing import Optional, Tuple
+from jinja2 import Environment, FileSystemLoader, Template
+
+# 先找当前目录下的 templates/, 再找源码树里的 templates/
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_DIRS: Tuple[str, ...] = ("templates/", os.path.join(ROOT_DIR, "templates"))
+
+
+@lru_cache(maxsize=None)
+def environment(search_path: Optional[Tuple[str, ...]] = None) -> Environment:
+    """模板加载后只读, 同一个 Environment 可以被多个线程同时使用"""
+    return Environment(
+        loader=FileSystemLoader(list(search_path or TEMPLATE_DIRS)),
+        auto_reload=False,
+    )
+
+
+def get_template(name: str, search_path: Optional[Tuple[str, ...]] = None) -> Template:
+    return environment(search_path).get_template(name)
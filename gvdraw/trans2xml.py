@@ -0,0 +1,263 @@
+#! /usr/bin/env python
+
+import os
+import re
+import sys
+import hashlib
+import logging
+import argparse
+import importlib.util
+from types import ModuleType
+from typing import Optional, Sequence, Tuple
+
+from gvdraw import __version__
+from gvdraw.batch import layout_machines
+from gvdraw.convert import machine_to_drawio
+from gvdraw.engine import ENGINES
+from gvdraw.json2xml import Layout
+from gvdraw.machine import extract_machine
+from gvdraw.profiles import PROFILE_CHOICES, Thresholds
+from gvdraw.watch import watch, write_if_changed
+
+logger = logging.getLogger(__name__)
+
+# 写在输出文件末尾, 下次运行时据此判断是否需要重新生成
+DIGEST_COMMENT = "<!-- gvdraw-digest: {digest} -->\n"
+DIGEST_PATTERN = re.compile(r"<!-- gvdraw-digest: ([0-9a-f]{64}) -->\s*$")
+DIGEST_TAIL = 256
+
+
+def source_digest(
+    filename: str,
+    machine_name: Optional[str] = None,
+    prog: str = "dot",
+    profile: Optional[str] = None,
+    thresholds: Optional[Thresholds] = None,
+    split: bool = False,
+    incremental: bool = False,
+) -> str:
+    """模块源码, 影响输出的选项与 gvdraw 版本共同决定输出"""
+    digest = hashlib.sha256(__version__.encode("utf8") + b"\0")
+    options = (machine_name, prog, profile, thresholds or Thresholds())
+    digest.update(repr(options + (split, incremental)).encode("utf8") + b"\0")
+    with open(filename, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def cached_digest(filename: str) -> Optional[str]:
+    """上次输出中记录的 digest, 只读文件末尾"""
+    if not os.path.exists(filename):
+        return None
+    with open(filename, "rb") as f:
+        f.seek(max(0, os.path.getsize(filename) - DIGEST_TAIL))
+        tail = f.read().decode("utf8", errors="ignore")
+    matched = DIGEST_PATTERN.search(tail)
+    return matched.group(1) if matched else None
+
+
+def load_module(filename: str) -> ModuleType:
+    """按路径导入用户模块, 模块所在目录临时加入 sys.path 以便其内部导入"""
+    name, _ = os.path.splitext(os.path.basename(filename))
+    spec = importlib.util.spec_from_file_location(name, filename)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"无法导入 {filename}")
+    module = importlib.util.module_from_spec(spec)
+    folder = os.path.dirname(os.path.abspath(filename))
+    sys.path.insert(0, folder)
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(folder)
+    return module
+
+
+def find_machine(module: ModuleType, name: Optional[str] = None):
+    from transitions.extensions import HierarchicalGraphMachine
+
+    if name:
+        machine = getattr(module, name, None)
+        if not isinstance(machine, HierarchicalGraphMachine):
+            raise ValueError(f"{module.__name__}.{name} 不是 HierarchicalGraphMachine")
+        return machine
+    found = {
+        key: value
+        for key, value in vars(module).items()
+        if isinstance(value, HierarchicalGraphMachine)
+    }
+    if len(found) != 1:
+        names = ", ".join(found) or "无"
+        raise ValueError(
+            f"{module.__name__} 中的 HierarchicalGraphMachine: {names}, 请用 --machine 指定"
+        )
+    (machine,) = found.values()
+    return machine
+
+
+def trans2xml(
+    src: str,
+    output: str,
+    machine_name: Optional[str] = None,
+    prog: str = "dot",
+    force: bool = False,
+    split: bool = False,
+    profile: Optional[str] = None,
+    thresholds: Optional[Thresholds] = None,
+    incremental: bool = False,
+) -> bool:
+    """生成 drawio xml, 源码, 选项和版本都没变时跳过, 返回是否重新生成.
+
+    ``incremental`` 且 output 已存在时, 沿用其中状态的位置, 只摆放新增或改动的状态.
+    """
+    digest = source_digest(
+        src, machine_name, prog, profile, thresholds, split, incremental
+    )
+    if not force and cached_digest(output) == digest:
+        logger.info(f"{src} 未改变, 跳过 {output}")
+        return False
+    machine = find_machine(load_module(src), machine_name)
+    previous = None
+    if incremental and os.path.exists(output):
+        with open(output, encoding="utf8") as f:
+            previous = f.read()
+    result = machine_to_drawio(
+        machine,
+        prog=prog,
+        split=split,
+        profile=profile,
+        thresholds=thresholds,
+        previous=previous,
+    )
+    logger.info(f"{src} => {output}")
+    return write_if_changed(output, result + "\n" + DIGEST_COMMENT.format(digest=digest))
+
+
+def trans2xml_many(
+    jobs: Sequence[Tuple[str, str]],
+    machine_name: Optional[str] = None,
+    prog: str = "dot",
+    force: bool = False,
+    profile: Optional[str] = None,
+    thresholds: Optional[Thresholds] = None,
+) -> int:
+    """批量版的 trans2xml, jobs 为 (src, output).
+
+    需要重新生成的 machine 合并起来调用 graphviz, 而不是每个启动一次;
+    某个模块导入或布局失败只跳过它自己. 返回写入的文件个数.
+    """
+    pending = list()
+    for src, output in jobs:
+        digest = source_digest(src, machine_name, prog, profile, thresholds)
+        if not force and cached_digest(output) == digest:
+            logger.info(f"{src} 未改变, 跳过 {output}")
+            continue
+        try:
+            machine = find_machine(load_module(src), machine_name)
+            spec = extract_machine(machine)
+        except Exception:
+            logger.exception(f"加载 {src} 失败")
+            continue
+        pending.append((src, output, digest, machine, spec))
+
+    results = layout_machines(
+        [machine for *_, machine, _ in pending],
+        prog=prog,
+        specs=[spec for *_, spec in pending],
+        profile=profile,
+        thresholds=thresholds,
+    )
+    written = 0
+    for (src, output, digest, _, spec), result in zip(pending, results):
+        if not result.ok:
+            logger.error(f"布局 {src} 失败: {result.error}")
+            continue
+        content = Layout(result.xdot, spec=spec).render()
+        logger.info(f"{src} => {output}")
+        written += write_if_changed(
+            output, content + "\n" + DIGEST_COMMENT.format(digest=digest)
+        )
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "src", nargs="+", help="定义了 HierarchicalGraphMachine 的 python 模块"
+    )
+    parser.add_argument("-o", "--output", help="默认与 src 同名的 .xml, 仅限单个 src")
+    parser.add_argument("--machine", help="模块中 machine 的变量名")
+    parser.add_argument(
+        "--prog",
+        default="dot",
+        help="布局引擎: graphviz 的程序名, 或进程内的 "
+        + " / ".join(ENGINES)
+        + " (packed 只排布状态树, 适合很大的状态机总览)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="忽略缓存; 只有模块自身的源码和布局选项参与 digest, 它导入的模块不参与",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=PROFILE_CHOICES,
+        help="布局档位, 给出时忽略 --prog; auto 按状态和转移的个数选择",
+    )
+    parser.add_argument(
+        "--thresholds",
+        type=Thresholds.parse,
+        default=Thresholds(),
+        help="auto 的阈值, 如 balanced=300/1000,fast=2000/6000 (状态数/转移数)",
+    )
+    parser.add_argument(
+        "--split",
+        action="store_true",
+        help="按顶层状态拆开, 多进程分别布局后拼到一起, 用于单个很大的状态机",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="输出已存在时沿用其中状态的位置, 只摆放新增或改动的状态",
+    )
+    parser.add_argument(
+        "--watch", action="store_true", help="监视模块源码, 变化后重新生成"
+    )
+    args = parser.parse_args()
+    if args.output and len(args.src) > 1:
+        parser.error("--output 只能用于单个 src")
+
+    def output_of(src: str) -> str:
+        filebasename, _ = os.path.splitext(src)
+        return args.output or f"{filebasename}.xml"
+
+    def convert_file(src: str):
+        trans2xml(
+            src,
+            output_of(src),
+            args.machine,
+            prog=args.prog,
+            force=args.force,
+            split=args.split,
+            profile=args.profile,
+            thresholds=args.thresholds,
+            incremental=args.incremental,
+        )
+
+    if args.split or args.incremental:
+        for src in args.src:
+            convert_file(src)
+    else:
+        trans2xml_many(
+            [(src, output_of(src)) for src in args.src],
+            args.machine,
+            prog=args.prog,
+            force=args.force,
+            profile=args.profile,
+            thresholds=args.thresholds,
+        )
+    if args.watch:
+        watch({src: convert_file for src in args.src})
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,56 @@
 from collections import deque
+import io
+import os
+import sys
+import math
+import time
+import json
 import logging
-import ast
-from jinja2 import Environment, FileSystemLoader
-from typing import List, Optional
+import re
+from functools import lru_cache, partial
+from gvdraw.templates import get_template
+from typing import (
+    IO,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+    Union,
+)
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field, InitVar
 from argparse import ArgumentParser
-from xml.etree.ElementTree import fromstring, Element
+from xml.etree.ElementTree import iterparse, Element, SubElement
+from gvdraw.ir import GraphIR, NO_STATE
+from gvdraw.watch import watch, write_chunks_if_changed
 
-env = Environment(loader=FileSystemLoader("templates/"))
+
+# 回调名之间的分隔: json2xml 写出的 "['a', 'b']", 或手填的 "a, b" / "a b"
+NAME_SEPARATOR = re.compile(r"[\s,;]+")
+NAME_QUOTES = "'\""
+
+
+# 回调列表属性值的缓存上限, 足够一张大图 (bench-attrs 中 3 万个属性, 1.4 万个不同值) 使用
+NAME_CACHE_SIZE = 1 << 16
+
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def split_names(value: str) -> Tuple[str, ...]:
+    """属性值 => 回调名, 同一个值在大图里会反复出现, 结果缓存"""
+    text = value.strip()
+    if text.startswith("[") and text.endswith("]"):
+        text = text[1:-1]
+    names = (item.strip(NAME_QUOTES) for item in NAME_SEPARATOR.split(text))
+    return tuple(name for name in names if name)
+
+
+def parse_names(value: str) -> List[str]:
+    """on_enter / on_exit / conditions / unless 属性 => 回调名列表"""
+    return list(split_names(value))
 
 
 def is_edge(obj: Element) -> bool:
@@ -24,6 +67,17 @@ def is_vertex(obj: Element) -> bool:
     return bool(children[0].get("vertex", False))
 
 
+XML_SUFFIXES = (".xml", ".drawio")
+# json2xml --bundle 合并的 edge cell 上记录成员转移的属性
+BUNDLE_ATTR = "transitions"
+STATUS_WRITTEN = "written"
+STATUS_UNCHANGED = "unchanged"
+STATUS_FAILED = "failed"
+
+# 裸 mxCell 的 (x, y, parent)
+Frame = Tuple[int, int, str]
+
+
 @dataclass
 class XMLNode:
     xdata: InitVar[Element]
@@ -37,6 +91,10 @@ class XMLNode:
     width: int = field(init=False)
     height: int = field(init=False)
     children: List["XMLNode"] = field(init=False)
+    # mxCell 的 parent, 是另一个状态时坐标相对于它
+    parent_id: str = field(init=False)
+    # 以 "." 连接的全名, 建好状态树后由 XMLLayout 填写
+    qualified: str = field(init=False)
     parent: Optional["XMLNode"] = None
 
     def __post_init__(self, xdata: Element):
@@ -45,8 +103,10 @@ class XMLNode:
         self.label = xdata.get("label", "")
         self.name = xdata.get("name", "")
         self.cell_id = xdata.get("id", "")
-        self.on_enter = ast.literal_eval(xdata.get("on_enter", "[]"))
-        self.on_exit = ast.literal_eval(xdata.get("on_exit", "[]"))
+        self.parent_id = mxcell.get("parent", "")
+        self.qualified = self.name
+        self.on_enter = parse_names(xdata.get("on_enter", ""))
+        self.on_exit = parse_names(xdata.get("on_exit", ""))
         self.x_pos = int(mxgeo.get("x", 0))
         self.y_pos = int(mxgeo.get("y", 0))
         self.height = int(mxgeo.get("height", 0))
@@ -66,9 +126,6 @@ class XMLNode:
             return False
         if self.y_pos + self.height < node.y_pos + node.height:
             return False
-        logging.info(
-            f"{node.label}@{node.pos}[{node.size}] in {self.label}@{self.pos}[{self.size}]"
-        )
         return True
 
     @property
@@ -100,13 +157,173 @@ class XMLNode:
         return repr(self)
 
 
-def full_state_name(n: XMLNode) -> str:
-    name = n.name
-    parent = n.parent
-    while parent:
-        name = f"{parent.name}.{name}"
-        parent = parent.parent
-    return name
+class ContainmentGrid:
+    """均匀网格, 每个矩形登记在它覆盖的所有格子里.
+
+    格子大小按约 n 个格子铺满画布来取. 包含某个状态的矩形一定覆盖它的
+    左上角, 所以只需要检查左上角所在格子里登记的矩形. 状态互不相交或
+    互相嵌套时, 一个格子里只有嵌套链上的几个矩形, 总开销约为
+    O(n * 嵌套深度).
+    """
+
+    def __init__(self, nodes: List[XMLNode]):
+        self.nodes = nodes
+        self.cells: Dict[Tuple[int, int], List[int]] = dict()
+        if not nodes:
+            self.left = self.top = 0
+            self.cell = 1.0
+            return
+        self.left = min(n.x_pos for n in nodes)
+        self.top = min(n.y_pos for n in nodes)
+        right = max(n.x_pos + n.width for n in nodes)
+        bottom = max(n.y_pos + n.height for n in nodes)
+        area = max(right - self.left, 1) * max(bottom - self.top, 1)
+        self.cell = max(1.0, math.sqrt(area / len(nodes)))
+
+    def cell_of(self, x: int, y: int) -> Tuple[int, int]:
+        return int((x - self.left) // self.cell), int((y - self.top) // self.cell)
+
+    def insert(self, idx: int):
+        node = self.nodes[idx]
+        x0, y0 = self.cell_of(node.x_pos, node.y_pos)
+        x1, y1 = self.cell_of(node.x_pos + node.width, node.y_pos + node.height)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                self.cells.setdefault((cx, cy), list()).append(idx)
+
+    def smallest_container(self, node: XMLNode) -> Optional[int]:
+        """已登记的矩形中包含 node 的下标最小者"""
+        found = None
+        for idx in self.cells.get(self.cell_of(node.x_pos, node.y_pos), ()):
+            if (found is None or idx < found) and node in self.nodes[idx]:
+                found = idx
+        return found
+
+
+def group_offsets(frames: Dict[str, Frame]) -> Dict[str, Tuple[int, int]]:
+    """不是状态的容器 (drawio 的 group 等裸 mxCell) 的绝对坐标"""
+    offsets: Dict[str, Tuple[int, int]] = dict()
+    for cell_id in frames:
+        chain = list()
+        while cell_id in frames and cell_id not in offsets and cell_id not in chain:
+            chain.append(cell_id)
+            cell_id = frames[cell_id][2]
+        base = offsets.get(cell_id, (0, 0))
+        for cell_id in reversed(chain):
+            x, y, _ = frames[cell_id]
+            base = offsets[cell_id] = (base[0] + x, base[1] + y)
+    return offsets
+
+
+def bare_frame(cell: Element) -> Optional[Frame]:
+    """裸 mxCell 的 (x, y, parent), 不是带几何信息的 vertex 时为 None"""
+    geometry = cell.find("mxGeometry")
+    if cell.get("id") is None or not cell.get("vertex") or geometry is None:
+        return None
+    x, y = int(float(geometry.get("x", 0))), int(float(geometry.get("y", 0)))
+    return x, y, cell.get("parent", "")
+
+
+def link_parents(
+    nodes: List[XMLNode], groups: Optional[Dict[str, Tuple[int, int]]] = None
+) -> List[XMLNode]:
+    """按 mxCell 的 parent 建立父子关系, 并把相对坐标累加成绝对坐标.
+
+    返回 parent 不是状态的结点, 它们的位置还要靠几何关系判断; 其中在
+    group 里的先加上 group 的偏移. parent 链成环时环上的结点也算在内,
+    坐标当作绝对坐标.
+    """
+    groups = groups or dict()
+    nmap = {node.cell_id: node for node in nodes}
+    free = list()
+    for node in nodes:
+        container = nmap.get(node.parent_id)
+        if container is None or container is node:
+            if node.parent_id in groups:
+                dx, dy = groups[node.parent_id]
+                node.x_pos += dx
+                node.y_pos += dy
+            free.append(node)
+            continue
+        container.add_child(node)
+
+    reached: Set[int] = set()
+
+    def reach(roots: List[XMLNode]):
+        pending = deque(roots)
+        while pending:
+            node = pending.popleft()
+            reached.add(id(node))
+            pending.extend(node.children)
+
+    reach(free)
+    for node in nodes:
+        if id(node) in reached:
+            continue
+        # 到不了任何 free 结点, 沿 parent 向上必然走进一个环, 把环拆开
+        seen: Set[int] = set()
+        while id(node) not in seen:
+            seen.add(id(node))
+            node = node.parent
+        cycle = [node]
+        while node.parent is not cycle[0]:
+            node = node.parent
+            cycle.append(node)
+        logging.warning(
+            "mxCell parent 成环, 按几何关系判断: "
+            + ", ".join(member.name or member.cell_id for member in cycle)
+        )
+        for member in cycle:
+            siblings = member.parent.children
+            siblings[:] = [child for child in siblings if child is not member]
+        for member in cycle:
+            member.parent = None
+        free.extend(cycle)
+        reach(cycle)
+
+    # 自顶向下累加偏移
+    pending = deque(free)
+    while pending:
+        node = pending.popleft()
+        for child in node.children:
+            child.x_pos += node.x_pos
+            child.y_pos += node.y_pos
+            pending.append(child)
+    return free
+
+
+def build_tree(
+    nodes: List[XMLNode], free: Optional[List[XMLNode]] = None
+) -> List[XMLNode]:
+    """按几何包含关系建立状态树, 返回顶层状态.
+
+    只为 ``free`` 中的结点 (默认为全部) 找父状态, 其余结点已经有父状态,
+    但仍可以作为容器. 父状态是包含它的面积最小的状态, 面积相同时取排序
+    靠后的一个. 从大到小登记到网格里, 查询时网格中只有排在后面的状态.
+    """
+    order = sorted(nodes, key=lambda n: n.size)
+    pending = {id(node) for node in (nodes if free is None else free)}
+    grid = ContainmentGrid(order)
+    parents: List[Optional[int]] = [None] * len(order)
+    for idx in range(len(order) - 1, -1, -1):
+        if id(order[idx]) in pending:
+            parents[idx] = grid.smallest_container(order[idx])
+        grid.insert(idx)
+    tree = list()
+    for node, parent in zip(order, parents):
+        if id(node) not in pending:
+            continue
+        if parent is None:
+            tree.append(node)
+            continue
+        logging.debug(f"{node.label} => {order[parent].label}")
+        order[parent].add_child(node)
+    if free is not None:
+        # 子状态统一按面积排序, 与是否在 drawio 中嵌套无关
+        rank = {id(node): idx for idx, node in enumerate(order)}
+        for node in order:
+            node.children.sort(key=lambda child: rank[id(child)])
+    return tree
 
 
 @dataclass
@@ -125,82 +342,396 @@ class XMLEdge:
         mxcell = list(xdata)[0]
         self.source = mxcell.get("source", "")
         self.target = mxcell.get("target", "")
-        self.conditions = ast.literal_eval(xdata.get("conditions", "[]"))
-        self.unless = ast.literal_eval(xdata.get("unless", "[]"))
+        self.conditions = parse_names(xdata.get("conditions", ""))
+        self.unless = parse_names(xdata.get("unless", ""))
+
+
+def bundle_members(obj: Element) -> List[Element]:
+    """json2xml --bundle 合并的 edge cell => 各成员转移, 结构与普通的边相同"""
+    elements = list()
+    for member in json.loads(obj.get(BUNDLE_ATTR)):
+        elem = Element(
+            "object",
+            id=member["id"],
+            label=member["label"],
+            conditions=str(member.get("conditions", [])),
+            unless=str(member.get("unless", [])),
+        )
+        SubElement(
+            elem, "mxCell", edge="1", source=member["source"], target=member["target"]
+        )
+        elements.append(elem)
+    return elements
+
+
+def read_cells(
+    source: Union[str, IO],
+) -> Tuple[List[XMLNode], List[XMLEdge], Dict[str, Frame]]:
+    """用 iterparse 逐个读出状态, 转移和裸 mxCell.
+
+    每个 ``<object>`` 读完就换成 XMLNode / XMLEdge 并从树上摘掉,
+    内存只与状态数有关, 不随 XML 的体积 (mxGeometry 等) 增长.
+    """
+    nodes: List[XMLNode] = list()
+    edges: List[XMLEdge] = list()
+    frames: Dict[str, Frame] = dict()
+    # 打开着的元素, 读完的元素要从父元素上摘掉
+    stack: List[Element] = list()
+    in_object = 0
+    for event, elem in iterparse(source, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            in_object += elem.tag == "object"
+            continue
+        stack.pop()
+        if elem.tag == "object":
+            in_object -= 1
+            if is_vertex(elem):
+                nodes.append(XMLNode(elem))
+            elif is_edge(elem) and elem.get(BUNDLE_ATTR) is not None:
+                edges.extend(XMLEdge(obj) for obj in bundle_members(elem))
+            elif is_edge(elem):
+                edges.append(XMLEdge(elem))
+            else:
+                logging.warning(f"Unknown type element: {elem}")
+        elif elem.tag == "mxCell" and not in_object:
+            frame = bare_frame(elem)
+            if frame is not None:
+                frames[elem.get("id")] = frame
+        else:
+            continue
+        if stack:
+            stack[-1].remove(elem)
+        elem.clear()
+    return nodes, edges, frames
+
+
+def ir_node_element(ir: GraphIR, idx: int) -> Element:
+    """IR 中的状态 => 与 drawio 相同结构的 object 元素"""
+    obj = Element(
+        "object",
+        label=ir.state_label(idx),
+        name=ir.short_name(idx),
+        id=str(idx),
+        on_enter=str(ir.callbacks(ir.on_enter, idx)),
+        on_exit=str(ir.callbacks(ir.on_exit, idx)),
+    )
+    cell = SubElement(obj, "mxCell", vertex="1")
+    x, y, width, height = ir.bounds(idx) if ir.has_geometry else (0, 0, 0, 0)
+    SubElement(
+        cell,
+        "mxGeometry",
+        x=str(int(x)),
+        y=str(int(y)),
+        width=str(int(width)),
+        height=str(int(height)),
+    )
+    return obj
+
+
+def ir_edge_element(ir: GraphIR, idx: int) -> Element:
+    obj = Element(
+        "object",
+        label=ir.strings[ir.trigger[idx]],
+        conditions=str(ir.callbacks(ir.conditions, idx)),
+        unless=str(ir.callbacks(ir.unless, idx)),
+    )
+    SubElement(
+        obj,
+        "mxCell",
+        edge="1",
+        source=ir.state_name(ir.source[idx]),
+        target=ir.state_name(ir.dest[idx]),
+    )
+    return obj
 
 
 def unmarshal_states(nodes: List[XMLNode], root: List[XMLNode]) -> str:
-    template = env.get_template("State.tmpl")
-    return template.render(states=nodes, tree=[state for state in root])
+    return "".join(generate_states(nodes, root))
 
 
 def unmarshal_transitions(edges: List[XMLEdge]) -> str:
-    template = env.get_template("Transition.tmpl")
-    return template.render(edges=edges)
+    return "".join(generate_transitions(edges))
+
+
+def generate_states(nodes: List[XMLNode], root: List[XMLNode]) -> Iterator[str]:
+    """逐段产出 State.tmpl 的渲染结果, 拼起来与 render 完全相同"""
+    template = get_template("State.tmpl")
+    return template.generate(states=nodes, tree=[state for state in root])
+
+
+def generate_transitions(edges: List[XMLEdge]) -> Iterator[str]:
+    template = get_template("Transition.tmpl")
+    return template.generate(edges=edges)
 
 
 @dataclass
 class XMLLayout:
-    xdata: InitVar[str]
+    # drawio xml 的内容, 或者打开的文件
+    xdata: InitVar[Union[str, IO, None]]
     tree: List[XMLNode] = field(init=False)
     edges: List[XMLEdge] = field(init=False)
     nodes: List[XMLNode] = field(init=False)
+    ir: InitVar[Optional[GraphIR]] = None
 
-    def __post_init__(self, xdata: str):
-        root = fromstring(xdata)
+    def __post_init__(self, xdata: Union[str, IO, None], ir: Optional[GraphIR]):
         self.edges, self.nodes, self.tree = list(), list(), list()
-
-        nodes, nmap = list(), dict()
-        
-        for obj in root.iter("object"):
-            if is_vertex(obj):
-                n = XMLNode(obj)
-                nodes.append(n)
-                nmap[n.cell_id] = n
-                continue
-            if is_edge(obj):
-                self.edges.append(XMLEdge(obj))
-                continue
-            logging.warning(f"Unknown type element: {obj}")
-
-        # order by size => nodes
-        nodes = sorted(nodes, key=lambda x: x)
-        while nodes:
-            n = nodes.pop(0)
-            for p in nodes:
-                if n not in p:
+        if ir is not None:
+            self.load_ir(ir)
+            return
+        if isinstance(xdata, str):
+            xdata = io.StringIO(xdata)
+        nodes, self.edges, frames = read_cells(xdata)
+
+        # drawio 中的嵌套 (mxCell parent) 优先, 其余的按几何包含关系判断
+        self.tree = build_tree(nodes, link_parents(nodes, group_offsets(frames)))
+        self.walk_tree()
+
+        # 边的两端从 cell id 换成状态全名, 问题一次报完
+        names = {node.cell_id: node.qualified for node in self.nodes}
+        errors = self.duplicate_names()
+        for edg in self.edges:
+            for end in ("source", "target"):
+                cell_id = getattr(edg, end)
+                if cell_id not in names:
+                    errors.append(f"transition {edg.label} 的 {end} {cell_id} 不是状态")
                     continue
-                logging.info(f"{n.label} => {p.label}")
-                p.add_child(n)
-                break
-            else:
-                self.tree.append(n)
+                setattr(edg, end, names[cell_id])
+        if errors:
+            raise ValueError("\n".join(errors))
 
-        # BFS => self.nodes
+    def walk_tree(self):
+        """BFS => self.nodes, 顺便算出每个状态的全名"""
         lifo = deque(self.tree)
         while lifo:
             state = lifo.popleft()
             self.nodes.append(state)
             for child in state.children:
+                child.qualified = f"{state.qualified}.{child.name}"
                 lifo.append(child)
-        
-        for edg in self.edges:
-            edg.source = full_state_name(nmap[edg.source])
-            edg.target = full_state_name(nmap[edg.target])
+
+    def duplicate_names(self) -> List[str]:
+        counts: Dict[str, int] = dict()
+        for node in self.nodes:
+            counts[node.qualified] = counts.get(node.qualified, 0) + 1
+        return [
+            f"状态 {name} 重复出现 {count} 次"
+            for name, count in counts.items()
+            if count > 1
+        ]
+
+    @classmethod
+    def load(cls, filename: str) -> "XMLLayout":
+        """边读边解析, 不把整个文件读进内存"""
+        with open(filename, "rb") as f:
+            return cls(f)
+
+    @classmethod
+    def from_ir(cls, ir: GraphIR) -> "XMLLayout":
+        return cls(None, ir=ir)
+
+    def load_ir(self, ir: GraphIR):
+        """状态树直接取自 IR 的父子关系, 不再做包含关系判断"""
+        nodes = [XMLNode(ir_node_element(ir, idx)) for idx in range(ir.state_count)]
+        for idx, parent in enumerate(ir.parent):
+            if parent == NO_STATE:
+                self.tree.append(nodes[idx])
+            else:
+                nodes[parent].add_child(nodes[idx])
+        self.walk_tree()
+        self.edges = [
+            XMLEdge(ir_edge_element(ir, idx)) for idx in range(ir.transition_count)
+        ]
+
+    def to_ir(self) -> GraphIR:
+        ir = GraphIR()
+        for node in self.nodes:
+            parent = node.parent
+            ir.add_state(
+                node.qualified,
+                node.label,
+                NO_STATE if parent is None else ir.state_index(parent.qualified),
+                node.on_enter,
+                node.on_exit,
+                (node.x_pos, node.y_pos, node.width, node.height),
+            )
+        for edge in self.edges:
+            ir.add_transition(
+                ir.state_index(edge.source),
+                ir.state_index(edge.target),
+                edge.label,
+                edge.conditions,
+                edge.unless,
+            )
+        return ir
 
     def unmarshal(self):
-        result = unmarshal_states(self.nodes, self.tree)
-        result += unmarshal_transitions(self.edges)
-        return result
+        return "".join(self.generate())
+
+    def generate(self) -> Iterator[str]:
+        """生成的源码, 逐段产出, 不拼成完整的字符串"""
+        yield from generate_states(self.nodes, self.tree)
+        yield from generate_transitions(self.edges)
+
+    def write(self, f: TextIO):
+        for chunk in self.generate():
+            f.write(chunk)
+
+
+@dataclass
+class ConvertResult:
+    """一个 drawio 文件的转换结果, 在进程间传递, 只带汇总需要的信息"""
+
+    src: str
+    output: str
+    status: str = STATUS_FAILED
+    states: int = 0
+    transitions: int = 0
+    seconds: float = 0.0
+    error: str = ""
+
+
+def collect_sources(paths: Sequence[str]) -> List[Tuple[str, str]]:
+    """展开目录, 返回 (src, 相对路径); 目录下按 XML_SUFFIXES 递归查找"""
+    sources = list()
+    for path in paths:
+        if not os.path.isdir(path):
+            sources.append((path, os.path.basename(path)))
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith(XML_SUFFIXES):
+                    src = os.path.join(dirpath, filename)
+                    sources.append((src, os.path.relpath(src, path)))
+    return sources
+
+
+def output_of(src: str, relpath: str, output_dir: Optional[str] = None) -> str:
+    """默认写在 src 旁边, 给出 output_dir 时保持目录下的相对路径"""
+    if output_dir is None:
+        return os.path.splitext(src)[0] + ".py"
+    return os.path.join(output_dir, os.path.splitext(relpath)[0] + ".py")
+
+
+def output_collisions(jobs: Sequence[Tuple[str, str]]) -> List[str]:
+    """不同的 src 映射到同一个输出, 并行时会互相覆盖"""
+    sources: Dict[str, List[str]] = dict()
+    for src, output in jobs:
+        key = os.path.normcase(os.path.abspath(output))
+        same = sources.setdefault(key, list())
+        if os.path.abspath(src) not in map(os.path.abspath, same):
+            same.append(src)
+    return [
+        f"{', '.join(srcs)} 都会写到 {output}"
+        for output, srcs in sources.items()
+        if len(srcs) > 1
+    ]
+
+
+def convert_one(src: str, output: str) -> ConvertResult:
+    """转换并写入一个文件, 异常记在结果里, 不影响其它文件"""
+    result = ConvertResult(src, output)
+    start = time.perf_counter()
+    try:
+        layout = XMLLayout.load(src)
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        written = write_chunks_if_changed(output, layout.generate())
+    except Exception as e:
+        logging.exception(f"转换 {src} 失败")
+        result.error = f"{type(e).__name__}: {e}"
+    else:
+        result.status = STATUS_WRITTEN if written else STATUS_UNCHANGED
+        result.states, result.transitions = len(layout.nodes), len(layout.edges)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def convert_many(
+    jobs: Sequence[Tuple[str, str]], workers: int = 1
+) -> List[ConvertResult]:
+    """jobs 为 (src, output), workers > 1 时在进程池中并行, 结果按输入顺序"""
+    if workers <= 1 or len(jobs) <= 1:
+        return [convert_one(src, output) for src, output in jobs]
+    sources, outputs = zip(*jobs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(convert_one, sources, outputs))
+
+
+def format_summary(results: Sequence[ConvertResult]) -> str:
+    header = ("src", "output", "status", "states", "transitions", "seconds")
+    rows = [
+        (
+            r.src,
+            r.output,
+            r.status,
+            str(r.states),
+            str(r.transitions),
+            f"{r.seconds:.3f}",
+        )
+        for r in results
+    ]
+    widths = [max(len(row[col]) for row in [header] + rows) for col in range(6)]
+    lines = list()
+    for row in [header] + rows:
+        cells = [
+            cell.ljust(width) if col < 3 else cell.rjust(width)
+            for col, (cell, width) in enumerate(zip(row, widths))
+        ]
+        lines.append("  ".join(cells).rstrip())
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    counts = {
+        status: sum(r.status == status for r in results)
+        for status in (STATUS_WRITTEN, STATUS_UNCHANGED, STATUS_FAILED)
+    }
+    lines.append(", ".join(f"{count} {status}" for status, count in counts.items()))
+    for r in results:
+        if r.error:
+            lines.append(f"{r.src}: {r.error}")
+    return "\n".join(lines)
+
+
+def convert_file(src: str, write: bool = False):
+    if write:
+        convert_one(src, output_of(src, os.path.basename(src)))
+        return
+    XMLLayout.load(src).write(sys.stdout)
 
 
 def main():
     parser = ArgumentParser()
-    parser.add_argument("src", type=str)
+    parser.add_argument("src", type=str, nargs="+", help="drawio 文件或目录")
+    parser.add_argument(
+        "--write", action="store_true", help="写入与 src 同名的 .py, 默认只打印"
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        help="写到这个目录下, 保持相对于输入目录的路径 (隐含 --write)",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="并行转换的进程数 (隐含 --write)"
+    )
+    parser.add_argument(
+        "--watch", action="store_true", help="监视输入文件, 变化后重新生成 (隐含 --write)"
+    )
     args = parser.parse_args()
-    with open(f"{args.src}", "r") as f:
-        layout = XMLLayout(f.read())
-        logging.info(f"\n{layout.unmarshal()}")
+    write = args.write or args.watch or args.output_dir or args.jobs > 1
+    sources = collect_sources(args.src)
+    if not write:
+        for src, _ in sources:
+            convert_file(src)
+        return
+    jobs = [(src, output_of(src, rel, args.output_dir)) for src, rel in sources]
+    collisions = output_collisions(jobs)
+    if collisions:
+        parser.error("输出文件冲突:\n" + "\n".join(collisions))
+    results = convert_many(jobs, args.jobs)
+    print(format_summary(results))
+    if args.watch:
+        watch({src: partial(convert_one, output=output) for src, output in jobs})
+    elif any(r.status == STATUS_FAILED for r in results):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -29,6 +29,7 @@ setup(
     long_description_content_type="text/markdown",
     author="zhang.xuyi",
     packages=find_packages(exclude=[".github", "gvdraw.egg-info"]),  # 找到 src 目录下的所有包
+    package_data={"gvdraw": ["data/*.json"]},  # 字宽表
     # package_dir={'': 'gvdraw'},  # 指定包的根目录
     classifiers=[
         'Programming Language :: Python :: 3',
@@ -38,7 +39,11 @@ setup(
     python_requires='>=3.6',    
     install_requires=read_requirements("requirements.txt"),
     entry_points={
-        "console_scripts": ["json2xml = gvdraw.json2xml:main", "trans2xml = gvdraw.trans2xml:main"],
+        "console_scripts": [
+            "json2xml = gvdraw.json2xml:main",
+            "trans2xml = gvdraw.trans2xml:main",
+            "gvdraw = gvdraw.cli:main",
+        ],
     },
     extras_require={"test": read_requirements("requirements-test.txt")},
 )
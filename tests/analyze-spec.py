@@ -0,0 +1,76 @@
+#! /usr/bin/env python
+
+from gvdraw.analysis import analyze
+from gvdraw.machine import MachineSpec, StateSpec, TransitionSpec
+
+
+def state(name: str, **kwargs) -> StateSpec:
+    return StateSpec(name=name, label=name, **kwargs)
+
+
+def problems() -> MachineSpec:
+    """每一项检查都有且只有预期的状态被报出来"""
+    return MachineSpec(
+        separator=".",
+        initial="Init",
+        states=[
+            state("Init"),
+            state("Work", initial="A", children=["Work.A", "Work.B"]),
+            state("Work.A", parent="Work"),
+            state("Work.B", parent="Work"),
+            state("Done", final=True),
+            state("Orphan"),
+            state("Trap"),
+            state("Loop1"),
+            state("Loop2"),
+        ],
+        transitions=[
+            TransitionSpec("Init", "Work", "go"),
+            TransitionSpec("Work.A", "Work.B", "next"),
+            TransitionSpec("Work.B", "Done", "finish"),
+            # 定义在父状态上, Work.A 和 Work.B 都能离开
+            TransitionSpec("Work", "Trap", "fail"),
+            TransitionSpec("Init", "Loop1", "spin", conditions=["ready"]),
+            TransitionSpec("Loop1", "Loop2", "ping", conditions=["busy"]),
+            TransitionSpec("Loop2", "Loop1", "pong", unless=["idle"]),
+        ],
+    )
+
+
+def clean() -> MachineSpec:
+    """没有记录 initial; 没有 initial 的复合状态本身就是落点"""
+    return MachineSpec(
+        separator=".",
+        states=[
+            state("Start"),
+            state("Group", children=["Group.X"]),
+            state("Group.X", parent="Group"),
+            state("End", final=True),
+        ],
+        transitions=[
+            TransitionSpec("Start", "Group", "enter"),
+            TransitionSpec("Group", "End", "leave"),
+            TransitionSpec("Group", "Group.X", "dive"),
+        ],
+    )
+
+
+def main():
+    report = analyze(problems())
+    assert report.starts == ["Init"]
+    assert report.unreachable == ["Orphan"]
+    assert report.dead_ends == ["Orphan", "Trap"]
+    assert [sorted(c) for c in report.cycles] == [["Loop1", "Loop2"]]
+    assert report.targets == "final"
+    assert report.stuck == ["Trap", "Loop1", "Loop2"]
+    assert [sorted(c) for c in report.guard_cycles] == [["Loop1", "Loop2"]]
+    assert not report.ok
+
+    report = analyze(clean())
+    assert report.starts == ["Start"], report.starts
+    assert report.ok, report.format()
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
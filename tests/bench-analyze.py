@@ -0,0 +1,68 @@
+#! /usr/bin/env python
+
+import random
+import logging
+from argparse import ArgumentParser
+from gvdraw.machine import MachineSpec, StateSpec, TransitionSpec
+from gvdraw.analysis import MachineGraph, analyze
+from benchlib import timeit
+
+logger = logging.getLogger(__name__)
+
+
+def random_spec(states: int, fanout: int = 8, degree: float = 1.5, seed: int = 0) -> MachineSpec:
+    """随机状态树, 复合状态带 initial, 约 1/3 的转移带条件, 少数状态标记为 final"""
+    rnd = random.Random(seed)
+    spec = MachineSpec(separator=".")
+    compound = [None]
+    for idx in range(states):
+        parent = rnd.choice(compound)
+        name = f"S{idx}" if parent is None else f"{parent.name}.S{idx}"
+        state = StateSpec(
+            name=name,
+            label=f"S{idx}",
+            parent=parent and parent.name,
+            final=rnd.random() < 0.01,
+        )
+        spec.states.append(state)
+        if parent is not None:
+            parent.children.append(name)
+            if parent.initial is None:
+                parent.initial = f"S{idx}"
+        if rnd.random() < 1 / fanout:
+            compound.append(state)
+    names = [s.name for s in spec.states]
+    for idx in range(int(states * degree)):
+        spec.transitions.append(
+            TransitionSpec(
+                rnd.choice(names),
+                rnd.choice(names),
+                trigger=f"t{idx}",
+                conditions=["ok"] if rnd.random() < 0.3 else [],
+            )
+        )
+    # 从一个有出边的状态开始, 随机图的大部分状态可达
+    spec.initial = spec.transitions[0].source
+    return spec
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--states", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    for count in args.states:
+        spec = random_spec(count)
+        logger.info(f"{len(spec.states)} states, {len(spec.transitions)} transitions")
+        timeit("  index", MachineGraph.from_spec, spec)
+        report = timeit("  analyze", analyze, spec)
+        logger.info(
+            f"  unreachable {len(report.unreachable)}, dead ends {len(report.dead_ends)}, "
+            f"cycles {len(report.cycles)}, stuck {len(report.stuck)}, "
+            f"guard-only cycles {len(report.guard_cycles)}"
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
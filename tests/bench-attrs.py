@@ -0,0 +1,76 @@
+#! /usr/bin/env python
+
+import os
+import ast
+import random
+import tempfile
+import logging
+from argparse import ArgumentParser
+from gvdraw.json2xml import Layout
+from gvdraw.packing import PackedLayout
+from gvdraw.xml2src import XMLLayout, iterparse, parse_names, split_names
+from benchlib import best_of, timeit, tree_spec
+
+logger = logging.getLogger(__name__)
+
+LIST_ATTRS = ("on_enter", "on_exit", "conditions", "unless")
+CALLBACKS = [f"callback_{idx}" for idx in range(200)]
+
+
+def with_callbacks(spec, seed: int = 0):
+    """给一半的状态和转移挂上随机的回调"""
+    rnd = random.Random(seed)
+    for state in spec.states:
+        if rnd.random() < 0.5:
+            state.on_enter = rnd.sample(CALLBACKS, rnd.randint(1, 3))
+            state.on_exit = rnd.sample(CALLBACKS, rnd.randint(0, 2))
+    for tran in spec.transitions:
+        if rnd.random() < 0.5:
+            tran.conditions = rnd.sample(CALLBACKS, rnd.randint(1, 2))
+            tran.unless = rnd.sample(CALLBACKS, rnd.randint(0, 1))
+    return spec
+
+
+def attribute_values(filename: str):
+    values = list()
+    for _, elem in iterparse(filename):
+        if elem.tag == "object":
+            values.extend(elem.get(attr) for attr in LIST_ATTRS if attr in elem.attrib)
+    return values
+
+
+def parse_each(func, values):
+    for value in values:
+        func(value)
+
+
+def elapsed_ms(func, values) -> float:
+    return best_of(1, parse_each, func, values)[0] * 1000
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--states", type=int, default=20000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    spec = with_callbacks(tree_spec(args.states))
+    with tempfile.NamedTemporaryFile("w", suffix=".xml", delete=False) as f:
+        f.write(Layout(PackedLayout(spec).xdot(), spec=spec).render())
+    values = attribute_values(f.name)
+    assert all(ast.literal_eval(value) == parse_names(value) for value in values)
+    logging.disable(logging.NOTSET)
+
+    logger.info(f"{len(values)} list attributes, {len(set(values))} distinct")
+    logger.info(f"literal_eval: {elapsed_ms(ast.literal_eval, values):.1f}ms")
+    split_names.cache_clear()
+    logger.info(f"parse_names, cold: {elapsed_ms(parse_names, values):.1f}ms")
+    logger.info(f"parse_names, warm: {elapsed_ms(parse_names, values):.1f}ms")
+    split_names.cache_clear()
+    timeit("XMLLayout.load", XMLLayout.load, f.name)
+    os.remove(f.name)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,49 @@
+#! /usr/bin/env python
+
+import random
+import shutil
+import logging
+import graphviz
+from argparse import ArgumentParser
+from gvdraw.batch import layout_many
+from benchlib import timeit
+
+logger = logging.getLogger(__name__)
+
+
+def small_graph(idx: int, states: int, rnd: random.Random) -> str:
+    lines = [f'digraph "machine {idx}" {{', " rankdir=LR;"]
+    for state in range(states):
+        lines.append(f' s{state} [shape=rectangle, label="状态{state}\\l"];')
+    for state in range(states):
+        lines.append(f" s{state} -> s{rnd.randrange(states)} [label=t{state}];")
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--graphs", type=int, default=300)
+    parser.add_argument("--states", type=int, default=8)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--jobs", type=int, default=None)
+    args = parser.parse_args()
+    if not shutil.which("dot"):
+        logger.error("没有找到 dot")
+        return
+
+    rnd = random.Random(0)
+    sources = [small_graph(idx, args.states, rnd) for idx in range(args.graphs)]
+    timeit(
+        "one dot per graph",
+        lambda: [graphviz.Source(src).pipe(format="json0") for src in sources],
+    )
+    results = timeit(
+        "batched", layout_many, sources, "dot", args.chunk_size, args.jobs
+    )
+    logger.info(f"{sum(r.ok for r in results)}/{len(results)} ok")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
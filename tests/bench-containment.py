@@ -0,0 +1,56 @@
+#! /usr/bin/env python
+
+import logging
+from argparse import ArgumentParser
+from xml.etree.ElementTree import fromstring
+from gvdraw.json2xml import Layout
+from gvdraw.packing import PackedLayout
+from gvdraw.xml2src import XMLNode, build_tree, is_vertex
+from benchlib import best_of, tree_spec
+
+logger = logging.getLogger(__name__)
+
+
+def quadratic_tree(nodes):
+    """原来的做法: 按面积排序, 每个状态逐个检查比它大的状态"""
+    nodes = sorted(nodes, key=lambda x: x)
+    tree = list()
+    while nodes:
+        n = nodes.pop(0)
+        for p in nodes:
+            if n in p:
+                p.add_child(n)
+                break
+        else:
+            tree.append(n)
+    return tree
+
+
+def parents(nodes):
+    return {n.cell_id: n.parent and n.parent.cell_id for n in nodes}
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--states", type=int, nargs="+", default=[500, 2000, 5000])
+    args = parser.parse_args()
+
+    for count in args.states:
+        logging.disable(logging.INFO)
+        spec = tree_spec(count)
+        root = fromstring(Layout(PackedLayout(spec).xdot(), spec=spec).render())
+        objects = [obj for obj in root.iter("object") if is_vertex(obj)]
+        logging.disable(logging.NOTSET)
+
+        results = list()
+        for name, func in (("quadratic", quadratic_tree), ("grid", build_tree)):
+            nodes = [XMLNode(obj) for obj in objects]
+            elapsed, _ = best_of(1, func, nodes)
+            results.append(parents(nodes))
+            logger.info(f"{count} states, {name}: {elapsed * 1000:.1f}ms")
+        assert results[0] == results[1], "两种做法得到的状态树不同"
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,37 @@
+#! /usr/bin/env python
+
+import json
+import logging
+from argparse import ArgumentParser
+from gvdraw.json2xml import Layout
+from gvdraw.ir import GraphIR
+from benchlib import best_of, synthetic_xdot
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=20000)
+    parser.add_argument("--edges", type=int, default=60000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    xdot = synthetic_xdot(args.nodes, args.edges)
+    text = json.dumps(xdot, indent=4)
+    layout = Layout(xdot)
+    data = layout.to_ir().dumps()
+    logging.disable(logging.NOTSET)
+    assert GraphIR.loads(data).to_spec() == layout.to_ir().to_spec()
+
+    json0, _ = best_of(args.repeat, json.loads, text)
+    ir, _ = best_of(args.repeat, GraphIR.loads, data)
+    logger.info(f"json0: {len(text)} bytes, json.loads {json0 * 1000:.1f}ms")
+    logger.info(
+        f"gvir: {len(data)} bytes, GraphIR.loads {ir * 1000:.1f}ms, x{json0 / ir:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
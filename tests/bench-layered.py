@@ -0,0 +1,94 @@
+#! /usr/bin/env python
+
+import random
+import shutil
+import logging
+from argparse import ArgumentParser
+from itertools import combinations
+from typing import List, Tuple
+from gvdraw.machine import MachineSpec, StateSpec, TransitionSpec
+from gvdraw.engine import layout_spec
+from benchlib import best_of
+
+logger = logging.getLogger(__name__)
+
+Segment = Tuple[Tuple[float, float], Tuple[float, float]]
+
+
+def random_spec(states: int, depth: int = 3, seed: int = 0) -> MachineSpec:
+    """随机的层次状态机: 每个状态以一定概率挂在已有的复合状态下, 转移约为状态数的 1.5 倍"""
+    rnd = random.Random(seed)
+    spec = MachineSpec(separator=".")
+    levels = {None: 0}
+    for idx in range(states):
+        parents = [None] + [s.name for s in spec.states if levels[s.name] < depth]
+        parent = rnd.choice(parents)
+        name = f"S{idx}" if parent is None else f"{parent}.S{idx}"
+        spec.states.append(StateSpec(name=name, label=f"状态{idx}", parent=parent))
+        levels[name] = levels[parent] + 1
+        if parent is not None:
+            spec.state_map()[parent].children.append(name)
+    spec.initial = spec.states[0].name
+    names = [s.name for s in spec.states]
+    for idx in range(states * 3 // 2):
+        source, dest = rnd.choice(names), rnd.choice(names)
+        spec.transitions.append(TransitionSpec(source, dest, trigger=f"t{idx}"))
+    return spec
+
+
+def edge_segments(pos: str) -> List[Segment]:
+    """json0 的样条控制点连成的折线"""
+    points = [
+        tuple(float(v) for v in p.split(","))
+        for p in pos.split()
+        if not p.startswith(("e,", "s,"))
+    ]
+    return list(zip(points, points[1:]))
+
+
+def intersect(a: Segment, b: Segment) -> bool:
+    def cross(o, p, q):
+        return (p[0] - o[0]) * (q[1] - o[1]) - (p[1] - o[1]) * (q[0] - o[0])
+
+    (p1, p2), (p3, p4) = a, b
+    d1, d2 = cross(p3, p4, p1), cross(p3, p4, p2)
+    d3, d4 = cross(p1, p2, p3), cross(p1, p2, p4)
+    return d1 * d2 < 0 and d3 * d4 < 0
+
+
+def count_crossings(xdot: dict) -> int:
+    """端点不相同的两条边之间的交点个数"""
+    edges = [
+        (e["tail"], e["head"], edge_segments(e["pos"]))
+        for e in xdot.get("edges", [])
+        if "pos" in e
+    ]
+    count = 0
+    for (t1, h1, s1), (t2, h2, s2) in combinations(edges, 2):
+        if {t1, h1} & {t2, h2}:
+            continue
+        count += sum(intersect(a, b) for a in s1 for b in s2)
+    return count
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 50, 100, 200])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dot", action="store_true", help="同时比较 dot 的耗时与交叉数")
+    args = parser.parse_args()
+    progs = ["layered"] + (["dot"] if args.dot and shutil.which("dot") else [])
+
+    for size in args.sizes:
+        spec = random_spec(size)
+        for prog in progs:
+            elapsed, xdot = best_of(args.repeat, layout_spec, spec, prog)
+            logger.info(
+                f"{size} states, {len(spec.transitions)} transitions, {prog}: "
+                f"{elapsed * 1000:.1f}ms, {count_crossings(xdot)} crossings"
+            )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,61 @@
+#! /usr/bin/env python
+
+import time
+import random
+import logging
+from argparse import ArgumentParser
+from gvdraw.machine import MachineSpec, StateSpec, TransitionSpec
+from gvdraw.packing import PackedLayout
+from gvdraw.json2xml import Layout
+from benchlib import timeit
+
+logger = logging.getLogger(__name__)
+
+
+def deep_spec(states: int, fanout: int = 8, chain: int = 0, seed: int = 0) -> MachineSpec:
+    """随机状态树: 每个状态挂在随机一个已有复合状态下, 前 ``chain`` 个状态连成一条深链"""
+    rnd = random.Random(seed)
+    spec = MachineSpec(separator=".")
+    compound = [None]
+    for idx in range(states):
+        if idx < chain:
+            parent = spec.states[-1] if spec.states else None
+        else:
+            parent = rnd.choice(compound)
+        name = f"S{idx}" if parent is None else f"{parent.name}.S{idx}"
+        state = StateSpec(name=name, label=f"状态{idx}", parent=parent and parent.name)
+        spec.states.append(state)
+        if parent is not None:
+            parent.children.append(name)
+        if idx < chain or rnd.random() < 1 / fanout:
+            compound.append(state)
+    names = [s.name for s in spec.states]
+    for idx in range(states):
+        spec.transitions.append(
+            TransitionSpec(rnd.choice(names), rnd.choice(names), trigger=f"t{idx}")
+        )
+    return spec
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--states", type=int, default=100000)
+    parser.add_argument("--chain", type=int, default=100, help="最深一条链的长度")
+    parser.add_argument("--render", action="store_true", help="同时计时 json2xml 的渲染")
+    args = parser.parse_args()
+
+    spec = deep_spec(args.states, chain=args.chain)
+    logger.info(f"{len(spec.states)} states, {len(spec.transitions)} transitions")
+    layout = timeit("pack", PackedLayout, spec)
+    xdot = timeit("json0", layout.xdot)
+    if args.render:
+        logging.disable(logging.INFO)
+        start = time.perf_counter()
+        Layout(xdot, spec=spec).render()
+        logging.disable(logging.NOTSET)
+        logger.info(f"render: {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+
+import random
+import shutil
+import logging
+import graphviz
+from argparse import ArgumentParser
+from gvdraw.dotgraph import parse_dot
+from gvdraw.reduction import reduce_edges
+from benchlib import timeit
+
+logger = logging.getLogger(__name__)
+
+
+def package_graph(packages: int, imports: int, seed: int = 0) -> str:
+    """模拟 go 包依赖: 每个包导入若干排在它后面的包, 以及这些包的部分依赖"""
+    rnd = random.Random(seed)
+    deps = [set() for _ in range(packages)]
+    for pkg in reversed(range(packages - 1)):
+        direct = rnd.sample(range(pkg + 1, packages), min(imports, packages - pkg - 1))
+        for dep in direct:
+            deps[pkg].add(dep)
+            # 直接导入间接依赖, 制造大量传递边
+            deps[pkg].update(rnd.sample(sorted(deps[dep]), min(imports, len(deps[dep]))))
+    lines = ["digraph packages {"]
+    for pkg in range(packages):
+        lines.append(f' n{pkg} [label="pkg/{pkg}", URL="https://godoc.org/pkg/{pkg}"];')
+    for pkg, targets in enumerate(deps):
+        for dep in sorted(targets):
+            lines.append(f" n{pkg} -> n{dep};")
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def bench(source: str, layout: bool):
+    graph = timeit("parse", parse_dot, source)
+    edges = graph.edges
+    keep = timeit("reduce", reduce_edges, [(e.tail, e.head) for e in edges])
+    logger.info(f"nodes: {len(graph.nodes)}, edges: {len(edges)} => {sum(keep)}")
+    if not layout:
+        return
+    timeit("dot (full)", graphviz.Source(source).pipe, "json0")
+    graph.remove_edges([e for e, kept in zip(edges, keep) if not kept])
+    timeit("dot (reduced)", graphviz.Source(graph.source).pipe, "json0")
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--packages", type=int, default=20000)
+    parser.add_argument("--imports", type=int, default=4)
+    parser.add_argument("--layout", action="store_true", help="同时比较 dot 布局耗时")
+    args = parser.parse_args()
+    layout = args.layout and bool(shutil.which("dot"))
+
+    with open("dots/go-package.dot", "r") as f:
+        logger.info("dots/go-package.dot")
+        bench(f.read(), layout)
+
+    logger.info(f"generated: {args.packages} packages")
+    bench(package_graph(args.packages, args.imports), layout)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
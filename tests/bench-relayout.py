@@ -0,0 +1,51 @@
+#! /usr/bin/env python
+
+import copy
+import random
+import logging
+from argparse import ArgumentParser
+from gvdraw.machine import MachineSpec, StateSpec, TransitionSpec
+from gvdraw.layered import MachineLayout
+from gvdraw.packing import PackedLayout
+from gvdraw.relayout import Relayout, boxes_from_json0
+from benchlib import timeit, tree_spec
+
+logger = logging.getLogger(__name__)
+
+
+def grow(spec: MachineSpec, count: int, seed: int = 1) -> MachineSpec:
+    """复制 spec 并新增 ``count`` 个叶子状态, 各带一条连向已有状态的转移"""
+    rnd = random.Random(seed)
+    spec = copy.deepcopy(spec)
+    old = [s.name for s in spec.states]
+    compound = [s for s in spec.states if s.children]
+    for idx in range(count):
+        parent = rnd.choice(compound)
+        state = StateSpec(name=f"{parent.name}.N{idx}", label=f"新状态{idx}", parent=parent.name)
+        spec.states.append(state)
+        parent.children.append(state.name)
+        spec.transitions.append(TransitionSpec(state.name, rnd.choice(old), trigger=f"n{idx}"))
+    return spec
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--states", type=int, default=3000)
+    parser.add_argument("--packed", action="store_true", help="与装箱布局比较, 默认为分层布局")
+    parser.add_argument("--changes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    args = parser.parse_args()
+
+    spec = tree_spec(args.states)
+    logger.info(f"{len(spec.states)} states, {len(spec.transitions)} transitions")
+    full = PackedLayout if args.packed else MachineLayout
+    previous = boxes_from_json0(timeit("full layout", full, spec).xdot())
+    for count in args.changes:
+        changed = grow(spec, count)
+        # 只计摆放; 生成 json0 的耗时与整张图成正比, 两种方式相同
+        timeit(f"full layout, {count} new", full, changed)
+        timeit(f"relayout, {count} new", Relayout, changed, previous)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
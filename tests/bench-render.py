@@ -0,0 +1,39 @@
+#! /usr/bin/env python
+
+import os
+import time
+import logging
+from argparse import ArgumentParser
+from gvdraw.json2xml import Layout
+from benchlib import synthetic_xdot
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=20000)
+    parser.add_argument("--edges", type=int, default=60000)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--generic", action="store_true")
+    args = parser.parse_args()
+
+    # Layout 会逐个对象打日志, 构造期间先关掉
+    logging.disable(logging.INFO)
+    layout = Layout(synthetic_xdot(args.nodes, args.edges), generic=args.generic)
+    logging.disable(logging.NOTSET)
+
+    start = time.perf_counter()
+    single = layout.render()
+    serial = time.perf_counter() - start
+    logger.info(f"jobs=1: {serial:.3f}s")
+
+    start = time.perf_counter()
+    chunked = layout.render(jobs=args.jobs)
+    parallel = time.perf_counter() - start
+    logger.info(f"jobs={args.jobs}: {parallel:.3f}s, speedup x{serial / parallel:.2f}")
+    assert single == chunked, "并行渲染结果与单进程不一致"
+
+
+if __name__ == "__main__":
+    main()
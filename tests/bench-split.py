@@ -0,0 +1,58 @@
+#! /usr/bin/env python
+
+import random
+import shutil
+import logging
+from argparse import ArgumentParser
+from gvdraw.machine import MachineSpec, StateSpec, TransitionSpec
+from gvdraw.engine import layout_spec
+from gvdraw.compose import split_layout
+from benchlib import timeit
+
+logger = logging.getLogger(__name__)
+
+
+def clustered_spec(clusters: int, states: int, cross: float, seed: int = 0) -> MachineSpec:
+    """``clusters`` 个顶层复合状态, 各含 ``states`` 个子状态; 比例为 ``cross`` 的转移跨顶层状态"""
+    rnd = random.Random(seed)
+    spec = MachineSpec(separator=".")
+    groups = list()
+    for top in range(clusters):
+        parent = StateSpec(name=f"P{top}", label=f"模块{top}")
+        spec.states.append(parent)
+        group = list()
+        for idx in range(states):
+            name = f"P{top}.S{idx}"
+            spec.states.append(StateSpec(name=name, label=f"状态{idx}", parent=parent.name))
+            parent.children.append(name)
+            group.append(name)
+        groups.append(group)
+    for idx in range(clusters * states * 2):
+        group = rnd.choice(groups)
+        other = rnd.choice(groups) if rnd.random() < cross else group
+        spec.transitions.append(
+            TransitionSpec(rnd.choice(group), rnd.choice(other), trigger=f"t{idx}")
+        )
+    return spec
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--clusters", type=int, default=8)
+    parser.add_argument("--states", type=int, default=60)
+    parser.add_argument("--cross", type=float, default=0.05)
+    parser.add_argument("--prog", default="dot" if shutil.which("dot") else "layered")
+    parser.add_argument("--jobs", type=int, default=None)
+    args = parser.parse_args()
+
+    spec = clustered_spec(args.clusters, args.states, args.cross)
+    logger.info(
+        f"{args.prog}: {len(spec.states)} states, {len(spec.transitions)} transitions"
+    )
+    timeit("whole", layout_spec, spec, args.prog)
+    timeit("split", split_layout, spec, args.prog, jobs=args.jobs)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
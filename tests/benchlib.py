@@ -0,0 +1,85 @@
+"""tests 下 bench 和检查脚本共用的计时函数与测试数据生成.
+
+脚本以 ``python tests/xxx.py`` 运行时 tests 目录就在 sys.path 上,
+直接 ``from benchlib import ...`` 即可.
+"""
+
+import time
+import random
+import logging
+from typing import Any, Callable, Tuple
+from gvdraw.machine import MachineSpec, StateSpec, TransitionSpec
+
+logger = logging.getLogger(__name__)
+
+
+def timeit(title: str, func: Callable, *args, **kwargs) -> Any:
+    """调用一次并记录耗时, 返回 func 的结果"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    logger.info(f"{title}: {time.perf_counter() - start:.3f}s")
+    return result
+
+
+def best_of(repeat: int, func: Callable, *args) -> Tuple[float, Any]:
+    """调用 repeat 次, 返回最短耗时和最后一次的结果"""
+    timings, result = list(), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def synthetic_xdot(nodes: int, edges: int, seed: int = 0) -> dict:
+    """网格排列的状态和随机转移, 与 graphviz json0 的结构相同"""
+    rnd = random.Random(seed)
+    objects = list()
+    for gvid in range(nodes):
+        objects.append(
+            {
+                "_gvid": gvid,
+                "name": f"S{gvid}",
+                "label": f"S{gvid}\\l- enter:\\l  + on_enter_{gvid}\\l",
+                "pos": f"{gvid % 500 * 120},{gvid // 500 * 80}",
+                "width": "1.2",
+                "height": "0.6",
+                "shape": "rectangle",
+            }
+        )
+    transitions = list()
+    for gvid in range(edges):
+        transitions.append(
+            {
+                "_gvid": gvid,
+                "tail": rnd.randrange(nodes),
+                "head": rnd.randrange(nodes),
+                "label": f"next [is_{gvid} & !not_{gvid}]",
+            }
+        )
+    width, height = 500 * 120, (nodes // 500 + 1) * 80
+    return dict(
+        name="bench", bb=f"0,0,{width},{height}", objects=objects, edges=transitions
+    )
+
+
+def tree_spec(states: int, fanout: int = 8, seed: int = 0) -> MachineSpec:
+    """随机状态树, 每个状态挂在随机一个已有复合状态下"""
+    rnd = random.Random(seed)
+    spec = MachineSpec(separator=".")
+    compound = [None]
+    for idx in range(states):
+        parent = rnd.choice(compound)
+        name = f"S{idx}" if parent is None else f"{parent.name}.S{idx}"
+        state = StateSpec(name=name, label=f"状态{idx}", parent=parent and parent.name)
+        spec.states.append(state)
+        if parent is not None:
+            parent.children.append(name)
+        if rnd.random() < 1 / fanout:
+            compound.append(state)
+    names = [s.name for s in spec.states]
+    for idx in range(states):
+        spec.transitions.append(
+            TransitionSpec(rnd.choice(names), rnd.choice(names), trigger=f"t{idx}")
+        )
+    return spec
@@ -0,0 +1,60 @@
+#! /usr/bin/env python
+
+import os
+import sys
+import json
+import tempfile
+import subprocess
+from xml.etree.ElementTree import fromstring
+from gvdraw.json2xml import Layout
+
+XDOT = {
+    "name": "G",
+    "directed": True,
+    "strict": False,
+    "bb": "0,0,100,120",
+    "_subgraph_cnt": 0,
+    "objects": [
+        {"_gvid": 0, "name": "a", "pos": "50,95", "width": "0.75", "height": "0.5"},
+        {"_gvid": 1, "name": "b", "pos": "50,25", "width": "0.75", "height": "0.5"},
+    ],
+    "edges": [{"_gvid": 0, "tail": 0, "head": 1, "label": "go"}],
+}
+# URL, href 和自定义的 link 都对应 drawio 的 link 属性
+LINKS = {"URL": "http://a", "href": "http://b", "link": "http://c", "dot_id": "x"}
+
+
+def main():
+    layout = Layout(XDOT, generic=True)
+    assert "go" in layout.render()
+    try:
+        layout.to_ir()
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("通用模式的布局不应导出 IR")
+
+    linked = dict(XDOT, objects=[dict(XDOT["objects"][0], id="n0", **LINKS)])
+    linked["objects"].append(XDOT["objects"][1])
+    root = fromstring(Layout(linked, generic=True).render())
+    cells = {obj.get("name"): obj for obj in root.iter("object")}
+    assert cells["a"].get("link") == "http://a", cells["a"].attrib
+    assert cells["a"].get("dot_id") == "n0", cells["a"].attrib
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "generic.json0")
+        with open(src, "w") as f:
+            json.dump(XDOT, f)
+        proc = subprocess.run(
+            [sys.executable, "-m", "gvdraw.json2xml", src, "--generic", "--ir"],
+            capture_output=True,
+            text=True,
+        )
+        assert proc.returncode == 2, proc.stderr
+        assert "--generic" in proc.stderr, proc.stderr
+        assert not os.path.exists(os.path.join(tmp, "generic.xml"))
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#! /usr/bin/env python
+
+import logging
+from xml.etree.ElementTree import SubElement, fromstring, tostring
+from gvdraw.json2xml import Layout
+from gvdraw.packing import PackedLayout
+from gvdraw.xml2src import XMLLayout
+from benchlib import tree_spec
+
+GROUP_ID = "group-1"
+GROUP_OFFSET = (40, 30)
+
+
+def geometry(layout: XMLLayout) -> dict:
+    return {
+        node.qualified: (node.x_pos, node.y_pos, node.width, node.height)
+        for node in layout.nodes
+    }
+
+
+def source(layout: XMLLayout) -> str:
+    return "".join(layout.generate())
+
+
+def nest(flat: str, layout: XMLLayout) -> str:
+    """按 layout 的状态树改成 drawio 的嵌套: mxCell parent 指向父状态, 坐标相对于它.
+
+    第一个顶层状态另外放进一个 group, 坐标相对于 group.
+    """
+    parents = {
+        child.cell_id: node
+        for node in layout.nodes
+        for child in node.children
+    }
+    root = fromstring(flat)
+    for obj in root.iter("object"):
+        cell = obj.find("mxCell")
+        parent = parents.get(obj.get("id"))
+        if parent is None or cell.get("vertex") != "1":
+            continue
+        cell.set("parent", parent.cell_id)
+        geo = cell.find("mxGeometry")
+        geo.set("x", str(int(geo.get("x")) - parent.x_pos))
+        geo.set("y", str(int(geo.get("y")) - parent.y_pos))
+
+    top = layout.tree[0]
+    group = SubElement(root.find(".//root"), "mxCell", id=GROUP_ID, vertex="1")
+    group.set("parent", "1")
+    SubElement(
+        group,
+        "mxGeometry",
+        x=str(GROUP_OFFSET[0]),
+        y=str(GROUP_OFFSET[1]),
+        width=str(top.width),
+        height=str(top.height),
+    ).set("as", "geometry")
+    for obj in root.iter("object"):
+        if obj.get("id") == top.cell_id:
+            cell = obj.find("mxCell")
+            cell.set("parent", GROUP_ID)
+            geo = cell.find("mxGeometry")
+            geo.set("x", str(top.x_pos - GROUP_OFFSET[0]))
+            geo.set("y", str(top.y_pos - GROUP_OFFSET[1]))
+    return tostring(root, encoding="unicode")
+
+
+def link_cycle(flat: str, layout: XMLLayout) -> str:
+    """两个叶子状态的 mxCell parent 互相指向对方, 坐标不变"""
+    first, second = [node for node in layout.nodes if not node.children][:2]
+    parents = {first.cell_id: second.cell_id, second.cell_id: first.cell_id}
+    root = fromstring(flat)
+    for obj in root.iter("object"):
+        if obj.get("id") in parents:
+            obj.find("mxCell").set("parent", parents[obj.get("id")])
+    return tostring(root, encoding="unicode")
+
+
+def main():
+    logging.disable(logging.INFO)
+    for states in (50, 500):
+        spec = tree_spec(states)
+        flat = Layout(PackedLayout(spec).xdot(), spec=spec).render()
+        by_geometry = XMLLayout(flat)
+        nested = nest(flat, by_geometry)
+        assert nested != flat
+        by_links = XMLLayout(nested)
+        assert geometry(by_links) == geometry(by_geometry), "嵌套与几何包含得到的状态树不同"
+        assert source(by_links) == source(by_geometry)
+        # 成环的结点不能丢, 按几何关系放回原处
+        by_cycle = XMLLayout(link_cycle(flat, by_geometry))
+        assert geometry(by_cycle) == geometry(by_geometry), "parent 成环的状态丢失"
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+#! /usr/bin/env python
+
+import ast
+from gvdraw.xml2src import parse_names, split_names
+
+CASES = [
+    ("", []),
+    ("[]", []),
+    ("[ ]", []),
+    ("a", ["a"]),
+    ("a, b", ["a", "b"]),
+    ("a,b;c  d", ["a", "b", "c", "d"]),
+    ("['a', 'b']", ["a", "b"]),
+    ('["a", "b"]', ["a", "b"]),
+    ("[\"on_enter_x\",'on_exit_y']", ["on_enter_x", "on_exit_y"]),
+    ("  ['is_ready']  ", ["is_ready"]),
+    ("[a, , b,]", ["a", "b"]),
+]
+
+
+def main():
+    split_names.cache_clear()
+    for value, expected in CASES:
+        assert parse_names(value) == expected, (value, parse_names(value))
+        # 第二次取自缓存, 返回的列表不能与缓存共享
+        names = parse_names(value)
+        names.append("mutated")
+        assert parse_names(value) == expected, value
+    # drawio 中由 repr(list) 写出的属性与 literal_eval 一致
+    for names in ([], ["a"], ["on_enter_a", "on_enter_b"]):
+        assert parse_names(repr(names)) == ast.literal_eval(repr(names)) == names
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@ from dataclasses import dataclass, field, asdict
 from typing import Optional, List
 from argparse import ArgumentParser
 from enum import Enum, EnumMeta
+from gvdraw.machine import extract_machine
+from gvdraw.metrics import node_size
 
 NestedState.separator = "."
 
@@ -117,7 +119,10 @@ def draw2json(machine, filename: str):
     graph = model.get_graph()
     graph.attr(rankdir="BT")
     graph.node_attr["shape"] = "box"
-    breakpoint()
+    # 与 json0 中 dot 测出的尺寸对照
+    for state in extract_machine(machine).states:
+        width, height = node_size(state.label + "\\l")
+        print(f"{state.name}: {width / 72:.4f} x {height / 72:.4f} in")
     graph.draw(f"{filename}.json0", prog="dot")
     graph.draw(f"{filename}.png", prog="dot")
     
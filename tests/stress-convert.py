@@ -0,0 +1,69 @@
+#! /usr/bin/env python
+
+import os
+import sys
+import time
+import logging
+import importlib.util
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from gvdraw.convert import json_to_drawio, drawio_to_source, machine_to_drawio
+from benchlib import synthetic_xdot
+
+logger = logging.getLogger(__name__)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+
+def load_script(name: str):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def hammer(jobs: list, threads: int, rounds: int) -> int:
+    """每个 job 是 (函数, 参数, 期望结果), 多线程反复调用并比对结果"""
+
+    def check(job) -> int:
+        func, arg, expected = job
+        return int(func(arg) != expected)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return sum(pool.map(check, jobs * rounds))
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=8)
+    parser.add_argument("--no-machine", action="store_true", help="不跑需要 dot 的用例")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    jobs = list()
+    for size in (10, 200, 1000):
+        xdot = synthetic_xdot(size, size * 2, seed=size)
+        xml = json_to_drawio(xdot)
+        jobs.append((json_to_drawio, xdot, xml))
+        jobs.append((drawio_to_source, xml, drawio_to_source(xml)))
+    if not args.no_machine:
+        for name in ("hier2", "sizing"):
+            machine = load_script(name).machine
+            jobs.append((machine_to_drawio, machine, machine_to_drawio(machine)))
+
+    start = time.perf_counter()
+    failures = hammer(jobs, args.threads, args.rounds)
+    elapsed = time.perf_counter() - start
+    logging.disable(logging.NOTSET)
+    logger.info(
+        f"{len(jobs) * args.rounds} calls on {args.threads} threads: "
+        f"{elapsed:.3f}s, {failures} mismatches"
+    )
+    assert not failures, "并发调用的结果与单线程不一致"
+
+
+if __name__ == "__main__":
+    main()